@@ -0,0 +1,144 @@
+# app/admin_stats.py
+"""Agrégats du dashboard admin : une seule requête, servie depuis un snapshot.
+
+Vue d'ensemble et qualité du contenu sont calculées ensemble : un passage par
+table (utilisateurs, evenements + 1re occurrence, participations, avis) avec
+des count(*) FILTER (WHERE …).
+
+Le snapshot vit dans le worker : au-delà de ADMIN_STATS_TTL_S il est servi
+tel quel et recalculé en tâche de fond (un seul recalcul à la fois) ; il n'est
+calculé de façon bloquante qu'au premier appel ou sur demande (refresh).
+"""
+import logging, os, threading, time
+from datetime import datetime, timedelta
+
+from sqlalchemy import select, func, case, or_
+
+from app import models
+from app.db_router import read_session
+
+log = logging.getLogger(__name__)
+
+ADMIN_STATS_TTL_S = float(os.getenv("ADMIN_STATS_TTL_S", "60"))
+
+
+def _count(*conditions):
+    return func.count().filter(*conditions) if conditions else func.count()
+
+
+def compute(db) -> dict:
+    now = datetime.utcnow()
+    d7 = now - timedelta(days=7)
+    U, E, O, P, R = (models.Utilisateur, models.Evenement, models.Occurrence,
+                     models.Participation, models.EventRating)
+
+    users = select(
+        _count().label("users_total"),
+        _count(U.created_at >= d7).label("users_new_7d"),
+        _count(U.role == "organizer").label("organizers"),
+        _count(U.role == "admin").label("admins"),
+        _count(U.is_abonne.is_(True)).label("premium_active"),
+    ).select_from(U).subquery()
+
+    # 1re occurrence par événement (index-only scan sur (evenement_id, debut))
+    first_occ = (select(O.evenement_id, func.min(O.debut).label("first_debut"))
+                 .group_by(O.evenement_id).subquery())
+    kw_len = case((func.jsonb_typeof(E.keywords) == "array", func.jsonb_array_length(E.keywords)), else_=0)
+    events = select(
+        _count().label("events_total"),
+        _count(first_occ.c.first_debut >= now).label("events_upcoming"),
+        _count(E.image_url.isnot(None)).label("with_img"),
+        _count(E.latitude.isnot(None), E.longitude.isnot(None)).label("with_geo"),
+        _count(or_(E.image_url.is_(None), func.length(func.trim(E.image_url)) == 0)).label("missing_image"),
+        _count(or_(E.latitude.is_(None), E.longitude.is_(None))).label("missing_geo"),
+        _count(or_(E.keywords.is_(None), kw_len == 0)).label("missing_keywords"),
+        _count(first_occ.c.evenement_id.is_(None)).label("missing_occurrences"),
+    ).select_from(E).outerjoin(first_occ, first_occ.c.evenement_id == E.id).subquery()
+
+    parts = select(
+        _count().label("participations_total"),
+        _count(P.created_at >= d7).label("participations_7d"),
+    ).select_from(P).subquery()
+
+    ratings = select(
+        func.avg(R.rating).label("rating_avg"),
+        _count().label("ratings_count"),
+    ).select_from(R).subquery()
+
+    row = db.execute(select(users, events, parts, ratings)).mappings().one()
+
+    total = row["events_total"]
+    pct = lambda n: round(100.0 * n / total, 1) if total else 0.0
+    return {
+        "computed_at": now,
+        "overview": {
+            "users_total": row["users_total"],
+            "users_new_7d": row["users_new_7d"],
+            "organizers": row["organizers"],
+            "admins": row["admins"],
+            "premium_active": row["premium_active"],
+            "events_total": total,
+            "events_upcoming": row["events_upcoming"],
+            "events_past": total - row["events_upcoming"],
+            "events_with_image_pct": pct(row["with_img"]),
+            "events_with_geo_pct": pct(row["with_geo"]),
+            "participations_total": row["participations_total"],
+            "participations_7d": row["participations_7d"],
+            "rating_avg_global": round(float(row["rating_avg"]), 2) if row["rating_avg"] is not None else None,
+            "ratings_count": row["ratings_count"],
+            "computed_at": now,
+        },
+        "content_quality": {
+            "total_events": total,
+            "missing_image": row["missing_image"],
+            "missing_geo": row["missing_geo"],
+            "missing_keywords": row["missing_keywords"],
+            "missing_occurrences": row["missing_occurrences"],
+            "computed_at": now,
+        },
+    }
+
+
+class StatsSnapshot:
+    """Dernier résultat de compute() + rafraîchissement stale-while-revalidate."""
+
+    def __init__(self, ttl_s: float):
+        self.ttl_s = ttl_s
+        self.value: dict | None = None
+        self.computed_at_mono = 0.0
+        self._lock = threading.Lock()
+        self._refreshing = False
+
+    def _refresh(self, db=None):
+        own = db is None
+        db = db or read_session()
+        try:
+            value = compute(db)
+        finally:
+            if own:
+                db.close()
+        with self._lock:
+            self.value, self.computed_at_mono = value, time.monotonic()
+        return value
+
+    def _refresh_in_background(self):
+        try:
+            self._refresh()
+        except Exception:
+            log.exception("rafraîchissement des stats admin impossible")
+        finally:
+            self._refreshing = False
+
+    def get(self, db, force: bool = False) -> dict:
+        if force or self.value is None:
+            return self._refresh(db)
+        if time.monotonic() - self.computed_at_mono > self.ttl_s:
+            with self._lock:
+                start = not self._refreshing
+                self._refreshing = True
+            if start:
+                threading.Thread(target=self._refresh_in_background, name="admin-stats", daemon=True).start()
+        return self.value
+
+
+snapshot = StatsSnapshot(ADMIN_STATS_TTL_S)
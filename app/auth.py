@@ -6,8 +6,10 @@ from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from jose import JWTError, jwt
 from passlib.context import CryptContext
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.database import SessionLocal
+from app.database import get_db
+from app.db_router import get_async_read_db
 from app.models import Utilisateur
 
 # --- Config ---
@@ -18,32 +20,37 @@ ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", "120"
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/login")  # route de login qui renvoie un token
 
-# --- Helpers DB ---
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
-def get_current_user(token: str = Depends(oauth2_scheme), db=Depends(get_db)) -> Utilisateur:
-    credentials_exception = HTTPException(
+# --- Dépendances ---
+def _credentials_exception() -> HTTPException:
+    return HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Token invalide ou expiré",
         headers={"WWW-Authenticate": "Bearer"},
     )
+
+def _user_id_from_token(token: str) -> int:
     try:
         payload = decode_token(token)
         sub = payload.get("sub")
         if sub is None:
-            raise credentials_exception
-        user_id = int(sub)
+            raise _credentials_exception()
+        return int(sub)
     except (JWTError, ValueError):
-        raise credentials_exception
+        raise _credentials_exception()
+
+def get_current_user(token: str = Depends(oauth2_scheme), db=Depends(get_db)) -> Utilisateur:
+    user = db.query(Utilisateur).get(_user_id_from_token(token))
+    if not user:
+        raise _credentials_exception()
+    return user
 
-    user = db.query(Utilisateur).get(user_id)
+async def get_current_user_async(token: str = Depends(oauth2_scheme),
+                                 db: AsyncSession = Depends(get_async_read_db)) -> Utilisateur:
+    # variante pour les routes async : même session (lecture) que la route, pas de threadpool ;
+    # get_async_read_db respecte l'épinglage read-your-writes de l'utilisateur du jeton
+    user = await db.get(Utilisateur, _user_id_from_token(token))
     if not user:
-        raise credentials_exception
+        raise _credentials_exception()
     return user
 
 def require_organizer(user: Utilisateur = Depends(get_current_user)) -> Utilisateur:
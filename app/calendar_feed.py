@@ -0,0 +1,219 @@
+# app/calendar_feed.py
+"""Flux iCalendar des participations "going" d'un utilisateur.
+
+URL à jeton (HMAC de l'id utilisateur avec JWT_SECRET) : les clients calendrier
+n'envoient pas d'en-tête Authorization. Le flux est gardé en mémoire du worker
+avec son ETag / Last-Modified :
+- un poll avec If-None-Match / If-Modified-Since à jour → 304 sans requête SQL ;
+- les écritures (participations, et suppression / mise à jour d'événements pour
+  leurs participants) appellent notify_changed(db, user_ids) dans leur transaction :
+  NOTIFY calendar_changed, reçu au COMMIT par le thread LISTEN de chaque worker
+  (app/response_cache.py) qui invalide ces utilisateurs (ou tous : "*") ;
+  le worker de l'écriture invalide en plus localement, sans attendre ;
+- ICS_CACHE_TTL_S borne l'obsolescence si une notification est perdue ;
+- après une invalidation, le flux est re-rendu depuis le primaire (un réplica
+  en retard serait gardé ICS_CACHE_TTL_S).
+
+Le corps ne dépend que des données (DTSTAMP = updated_at de la participation) :
+un re-rendu à contenu égal garde le même ETag, sur n'importe quel worker.
+"""
+import calendar, hashlib, hmac, os, threading, time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from email.utils import formatdate
+
+from sqlalchemy import func, text
+
+from app import models
+from app.auth import SECRET_KEY
+
+ICS_CACHE_TTL_S = float(os.getenv("ICS_CACHE_TTL_S", "300"))
+ICS_CACHE_MAX_USERS = int(os.getenv("ICS_CACHE_MAX_USERS", "10000"))
+ICS_PAST_DAYS = int(os.getenv("ICS_PAST_DAYS", "30"))
+APP_PUBLIC_URL = os.getenv("APP_PUBLIC_URL", "http://localhost:4200")
+CALENDAR_CHANNEL = "calendar_changed"
+NOTIFY_CHUNK = 1000   # ids par notification (payload NOTIFY < 8000 octets)
+
+
+# --- Jeton ----------------------------------------------------------------
+def feed_token(user_id: int) -> str:
+    return hmac.new(SECRET_KEY.encode(), f"ics:{user_id}".encode(), hashlib.sha256).hexdigest()[:32]
+
+
+def check_token(user_id: int, token: str) -> bool:
+    return hmac.compare_digest(feed_token(user_id), token or "")
+
+
+# --- Génération -------------------------------------------------------------
+def _escape(value: str) -> str:
+    return (value.replace("\\", "\\\\").replace(";", "\\;").replace(",", "\\,")
+                 .replace("\r\n", "\\n").replace("\n", "\\n"))
+
+
+def _fold(line: str) -> str:
+    # RFC 5545 : lignes de 75 octets max, continuation par CRLF + espace
+    raw = line.encode("utf-8")
+    if len(raw) <= 75:
+        return line
+    parts, cur = [], b""
+    for ch in line:
+        b = ch.encode("utf-8")
+        if len(cur) + len(b) > (75 if not parts else 74):
+            parts.append(cur.decode("utf-8"))
+            cur = b""
+        cur += b
+    parts.append(cur.decode("utf-8"))
+    return "\r\n ".join(parts)
+
+
+def _utc(dt: datetime) -> str:
+    return dt.strftime("%Y%m%dT%H%M%SZ")
+
+
+def build_ics(db, user_id: int) -> tuple[bytes, datetime | None]:
+    """→ (corps .ics, updated_at le plus récent des participations de l'utilisateur)."""
+    P, O, E = models.Participation, models.Occurrence, models.Evenement
+    since = datetime.utcnow() - timedelta(days=ICS_PAST_DAYS)
+    rows = (
+        db.query(P.id, P.updated_at, O.debut, O.fin, O.all_day, E.id.label("ev_id"), E.titre,
+                 func.concat_ws(", ", E.lieu, E.adresse, E.commune).label("location"), E.description)
+          .join(O, O.id == P.occurrence_id)
+          .join(E, E.id == O.evenement_id)
+          .filter(P.user_id == user_id, P.status == "going", O.debut >= since)
+          .order_by(O.debut)
+          .all()
+    )
+    lines = ["BEGIN:VCALENDAR", "VERSION:2.0", "PRODID:-//CultureRadar//Participations//FR",
+             "CALSCALE:GREGORIAN", "METHOD:PUBLISH", "X-WR-CALNAME:CultureRadar",
+             f"X-PUBLISHED-TTL:PT{max(1, int(ICS_CACHE_TTL_S // 60))}M"]
+    for r in rows:
+        lines += ["BEGIN:VEVENT", f"UID:participation-{r.id}@cultureradar", f"DTSTAMP:{_utc(r.updated_at)}",
+                  f"LAST-MODIFIED:{_utc(r.updated_at)}"]
+        if r.all_day:
+            day = r.debut.date()
+            lines += [f"DTSTART;VALUE=DATE:{day:%Y%m%d}", f"DTEND;VALUE=DATE:{day + timedelta(days=1):%Y%m%d}"]
+        else:
+            lines += [f"DTSTART:{_utc(r.debut)}", f"DTEND:{_utc(r.fin or r.debut + timedelta(hours=2))}"]
+        lines.append(f"SUMMARY:{_escape(r.titre or '')}")
+        if r.location:
+            lines.append(f"LOCATION:{_escape(r.location)}")
+        if r.description:
+            lines.append(f"DESCRIPTION:{_escape(r.description[:1000])}")
+        lines += [f"URL:{APP_PUBLIC_URL}/event/{r.ev_id}", "END:VEVENT"]
+    lines.append("END:VCALENDAR")
+    # toutes les participations (annulées comprises) : une annulation avance Last-Modified
+    modified = db.query(func.max(P.updated_at)).filter(P.user_id == user_id).scalar()
+    return ("\r\n".join(_fold(l) for l in lines) + "\r\n").encode("utf-8"), modified
+
+
+# --- Cache ----------------------------------------------------------------
+class FeedCache:
+    """LRU de ICS_CACHE_MAX_USERS flux."""
+
+    def __init__(self, ttl_s: float, max_users: int):
+        self.ttl_s, self.max_users = ttl_s, max_users
+        self._entries: OrderedDict[int, dict] = OrderedDict()
+        self._epoch = 0
+        self._lock = threading.Lock()
+
+    def get(self, user_id: int) -> dict | None:
+        with self._lock:
+            e = self._entries.get(user_id)
+            if e is None or e["epoch"] != self._epoch or time.monotonic() - e["at"] > self.ttl_s:
+                return None
+            self._entries.move_to_end(user_id)
+            return e
+
+    def stale(self, user_id: int) -> bool:
+        """Entrée invalidée (et non simplement expirée) : à re-rendre depuis le primaire."""
+        e = self._entries.get(user_id)
+        return e is not None and (e["epoch"] != self._epoch or e["at"] == float("-inf"))
+
+    def put(self, user_id: int, body: bytes, epoch: int, modified: datetime | None) -> dict:
+        # Last-Modified = dernière participation modifiée, pas l'heure du rendu :
+        # identique d'un worker à l'autre pour un même contenu
+        ts = int(calendar.timegm(modified.timetuple())) if modified else 0
+        entry = {"body": body, "etag": '"' + hashlib.sha1(body).hexdigest() + '"',
+                 "last_modified": formatdate(ts, usegmt=True),
+                 "last_modified_ts": ts, "at": time.monotonic(), "epoch": epoch}
+        with self._lock:
+            prev = self._entries.get(user_id)
+            if prev is None and len(self._entries) >= self.max_users:
+                self._entries.popitem(last=False)   # le moins récemment servi
+            if prev and prev["etag"] == entry["etag"]:
+                # contenu identique : on garde Last-Modified pour les If-Modified-Since
+                entry["last_modified"], entry["last_modified_ts"] = prev["last_modified"], prev["last_modified_ts"]
+            elif prev and entry["last_modified_ts"] <= prev["last_modified_ts"]:
+                # contenu changé sans participation modifiée (titre, horaire…) : avancer
+                now = max(int(time.time()), prev["last_modified_ts"] + 1)
+                entry["last_modified"], entry["last_modified_ts"] = formatdate(now, usegmt=True), now
+            self._entries[user_id] = entry
+            self._entries.move_to_end(user_id)
+        return entry
+
+    @property
+    def epoch(self) -> int:
+        return self._epoch
+
+    def invalidate_user(self, user_id: int):
+        e = self._entries.get(user_id)
+        if e:
+            e["at"] = float("-inf")   # garde etag/Last-Modified pour comparer au prochain rendu
+
+    def invalidate_all(self):
+        with self._lock:
+            self._epoch += 1
+
+
+cache = FeedCache(ICS_CACHE_TTL_S, ICS_CACHE_MAX_USERS)
+
+
+def invalidate_user(user_id: int):
+    cache.invalidate_user(user_id)
+
+
+def invalidate_all():
+    cache.invalidate_all()
+
+
+def notify_changed(db, user_ids=None):
+    """Dans la transaction d'écriture : flux de user_ids (None = tous) invalidés au COMMIT, tous workers."""
+    if user_ids is None:
+        payloads = ["*"]
+    else:
+        ids = sorted(set(user_ids))
+        payloads = [",".join(map(str, ids[i:i + NOTIFY_CHUNK])) for i in range(0, len(ids), NOTIFY_CHUNK)]
+    for payload in payloads:
+        db.execute(text("SELECT pg_notify(:channel, :payload)"), {"channel": CALENDAR_CHANNEL, "payload": payload})
+
+
+def participant_ids(db, event_ids) -> list[int]:
+    """Utilisateurs dont le flux contient une occurrence de event_ids (à lire avant une suppression)."""
+    P, O = models.Participation, models.Occurrence
+    event_ids = list(event_ids)
+    if not event_ids:
+        return []
+    return [u for (u,) in db.query(P.user_id).join(O, O.id == P.occurrence_id)
+                              .filter(O.evenement_id.in_(event_ids)).distinct().all()]
+
+
+def on_notify(payload: str):
+    if payload == "*":
+        invalidate_all()
+        return
+    for user_id in payload.split(","):
+        if user_id.isdigit():
+            invalidate_user(int(user_id))
+
+
+def get_feed(user_id: int, session_factory, primary_factory) -> dict:
+    entry = cache.get(user_id)
+    if entry is not None:
+        return entry
+    epoch = cache.epoch
+    db = primary_factory() if cache.stale(user_id) else session_factory()
+    try:
+        body, modified = build_ics(db, user_id)
+    finally:
+        db.close()
+    return cache.put(user_id, body, epoch, modified)
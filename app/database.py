@@ -1,15 +1,158 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event, exc
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
 from sqlalchemy.orm import sessionmaker, declarative_base
+from sqlalchemy.pool import QueuePool, AsyncAdaptedQueuePool
 from dotenv import load_dotenv
-import os
+import os, time
+
+from app.metrics import (
+    DB_POOL_CHECKOUT_WAIT, DB_POOL_IN_USE, DB_POOL_OVERFLOW, DB_POOL_TIMEOUTS, DB_POOL_CHECKOUT_ERRORS,
+    histogram_snapshot, metric_value, metric_breakdown,
+)
 
 load_dotenv()
-DATABASE_URL = os.getenv("DATABASE_URL")  
+DATABASE_URL = os.getenv("DATABASE_URL")
+
+# --- Pool (valeurs par process : à multiplier par le nb de workers gunicorn) ---
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))        # secondes d'attente max d'une connexion
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))        # secondes, -1 = jamais
+DB_STATEMENT_TIMEOUT_MS = int(os.getenv("DB_STATEMENT_TIMEOUT_MS", "0"))  # 0 = pas de limite
+# pool dédié aux routes async (lecture) : même logique de dimensionnement
+DB_ASYNC_POOL_SIZE = int(os.getenv("DB_ASYNC_POOL_SIZE", str(DB_POOL_SIZE)))
+DB_ASYNC_MAX_OVERFLOW = int(os.getenv("DB_ASYNC_MAX_OVERFLOW", str(DB_MAX_OVERFLOW)))
+
+# label -> engine (sync), pour les métriques et /admin/stats/db-pool
+ENGINES = {}
+
+
+class _CheckoutMetricsMixin:
+    """Mesure le temps d'attente d'un checkout (saturation du pool)."""
+    metrics_label = "primary"
+
+    def _do_get(self):
+        t0 = time.perf_counter()
+        try:
+            return super()._do_get()
+        except exc.TimeoutError:
+            DB_POOL_TIMEOUTS.labels(self.metrics_label).inc()
+            raise
+        except Exception as e:
+            # panne (refus, auth, DNS…) : ne doit pas passer pour une saturation du pool
+            DB_POOL_CHECKOUT_ERRORS.labels(self.metrics_label, type(e).__name__).inc()
+            raise
+        finally:
+            DB_POOL_CHECKOUT_WAIT.labels(self.metrics_label).observe(time.perf_counter() - t0)
+
+    def recreate(self):
+        new = super().recreate()
+        new.metrics_label = self.metrics_label
+        return new
+
+
+class InstrumentedQueuePool(_CheckoutMetricsMixin, QueuePool):
+    pass
+
+
+class InstrumentedAsyncQueuePool(_CheckoutMetricsMixin, AsyncAdaptedQueuePool):
+    pass
+
+
+def _watch_pool(sync_engine, label: str):
+    sync_engine.pool.metrics_label = label
+    ENGINES[label] = sync_engine
+
+    def _refresh_pool_gauges(*_):
+        pool = sync_engine.pool
+        DB_POOL_IN_USE.labels(label).set(pool.checkedout())
+        DB_POOL_OVERFLOW.labels(label).set(max(0, pool.overflow()))
 
-engine = create_engine(DATABASE_URL, pool_pre_ping=True)
+    event.listen(sync_engine, "checkout", _refresh_pool_gauges)
+    event.listen(sync_engine, "checkin", _refresh_pool_gauges)
+
+
+def make_engine(url: str, label: str):
+    options = {}
+    if DB_STATEMENT_TIMEOUT_MS > 0:
+        options["connect_args"] = {"options": f"-c statement_timeout={DB_STATEMENT_TIMEOUT_MS}"}
+    eng = create_engine(
+        url,
+        poolclass=InstrumentedQueuePool,
+        pool_pre_ping=True,
+        pool_size=DB_POOL_SIZE,
+        max_overflow=DB_MAX_OVERFLOW,
+        pool_timeout=DB_POOL_TIMEOUT,
+        pool_recycle=DB_POOL_RECYCLE,
+        **options,
+    )
+    _watch_pool(eng, label)
+    return eng
+
+
+def async_url(url: str) -> str:
+    """postgres(ql)://… → postgresql+asyncpg://… (sslmode → ssl pour asyncpg)."""
+    u = make_url(url.replace("postgres://", "postgresql://", 1))
+    u = u.set(drivername="postgresql+asyncpg")
+    if "sslmode" in u.query:
+        query = dict(u.query)
+        query["ssl"] = query.pop("sslmode")
+        u = u.set(query=query)
+    return u.render_as_string(hide_password=False)
+
+
+def make_async_engine(url: str, label: str):
+    options = {}
+    if DB_STATEMENT_TIMEOUT_MS > 0:
+        options["connect_args"] = {"server_settings": {"statement_timeout": str(DB_STATEMENT_TIMEOUT_MS)}}
+    eng = create_async_engine(
+        async_url(url),
+        poolclass=InstrumentedAsyncQueuePool,
+        pool_pre_ping=True,
+        pool_size=DB_ASYNC_POOL_SIZE,
+        max_overflow=DB_ASYNC_MAX_OVERFLOW,
+        pool_timeout=DB_POOL_TIMEOUT,
+        pool_recycle=DB_POOL_RECYCLE,
+        **options,
+    )
+    _watch_pool(eng.sync_engine, label)
+    return eng
+
+
+engine = make_engine(DATABASE_URL, "primary")
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 
+# Chemin async (routes de lecture chaudes) : pas de threadpool, la concurrence
+# n'est plus bornée par les 40 threads par défaut d'AnyIO.
+async_engine = make_async_engine(DATABASE_URL, "primary_async")
+AsyncSessionLocal = async_sessionmaker(async_engine, class_=AsyncSession,
+                                       autoflush=False, expire_on_commit=False)
+
+
+def pool_status() -> dict:
+    """Instantané des pools de ce worker (utilisé par /admin/stats/db-pool)."""
+    out = {}
+    for label, eng in ENGINES.items():
+        pool = eng.pool
+        out[label] = {
+            "pool_size": pool.size(),
+            "max_overflow": pool._max_overflow,
+            "checked_out": pool.checkedout(),
+            "checked_in": pool.checkedin(),
+            "overflow": max(0, pool.overflow()),
+            "pool_timeout_s": DB_POOL_TIMEOUT,
+            "recycle_s": DB_POOL_RECYCLE,
+            "statement_timeout_ms": DB_STATEMENT_TIMEOUT_MS,
+            "checkout_timeouts": int(metric_value(DB_POOL_TIMEOUTS, "_total", {"pool": label})),
+            "checkout_errors": {k: int(v) for k, v in
+                                metric_breakdown(DB_POOL_CHECKOUT_ERRORS, "_total", {"pool": label}, "error").items()},
+            "checkout_wait": histogram_snapshot(DB_POOL_CHECKOUT_WAIT, {"pool": label}),
+        }
+    return out
+
+
 def get_db():
     db = SessionLocal()
     try:
@@ -17,3 +160,7 @@ def get_db():
     finally:
         db.close()
 
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
@@ -0,0 +1,225 @@
+# app/db_router.py
+"""Routage des lectures vers des réplicas Postgres (optionnel).
+
+DATABASE_REPLICA_URLS="postgresql://…@replica1/db,postgresql://…@replica2/db"
+
+- Les dépendances de lecture (get_read_db / get_async_read_db) choisissent un
+  réplica sain en round-robin ; sans réplica configuré ou si aucun n'est
+  utilisable, elles retombent sur le primaire.
+- Un thread par worker vérifie chaque réplica (SELECT + retard de réplication)
+  toutes les DB_REPLICA_CHECK_INTERVAL_S secondes. Au-delà de
+  DB_REPLICA_MAX_LAG_S de retard, le réplica est écarté jusqu'au prochain check.
+- Read-your-writes : les routes d'écriture appellent pin_primary(response, me.id).
+  L'utilisateur (sub du jeton Bearer) est épinglé au primaire pendant
+  DB_READ_YOUR_WRITES_S : par worker, ou partagé entre workers si
+  DB_PIN_REDIS_URL est défini (paquet `redis` optionnel). Le front et l'app
+  mobile sont cross-origin et n'envoient pas de cookies : le cookie court posé
+  en plus ne sert que de repli (écritures anonymes, clients same-site).
+
+En local, deux instances Postgres ordinaires font office de réplicas : un
+serveur qui n'est pas en recovery rapporte un retard nul.
+"""
+import itertools, logging, math, os, threading, time
+
+from fastapi import Request, Response
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import async_sessionmaker, AsyncSession
+from sqlalchemy.orm import sessionmaker
+
+from app.database import SessionLocal, AsyncSessionLocal, make_engine, make_async_engine
+
+log = logging.getLogger(__name__)
+
+DATABASE_REPLICA_URLS = [u.strip() for u in os.getenv("DATABASE_REPLICA_URLS", "").split(",") if u.strip()]
+DB_REPLICA_MAX_LAG_S = float(os.getenv("DB_REPLICA_MAX_LAG_S", "5"))
+DB_REPLICA_CHECK_INTERVAL_S = float(os.getenv("DB_REPLICA_CHECK_INTERVAL_S", "5"))
+DB_READ_YOUR_WRITES_S = float(os.getenv("DB_READ_YOUR_WRITES_S", "10"))
+DB_PIN_REDIS_URL = os.getenv("DB_PIN_REDIS_URL", "")   # vide : épinglage par worker
+PRIMARY_PIN_COOKIE = "cr_primary_until"
+
+# retard en secondes ; 0 si le serveur n'est pas un standby ou s'il a tout rejoué
+LAG_SQL = text("""
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery() THEN 0
+        WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+    END
+""")
+
+
+class Replica:
+    def __init__(self, idx: int, url: str):
+        self.label = f"replica{idx}"
+        self.engine = make_engine(url, self.label)
+        self.async_engine = make_async_engine(url, f"{self.label}_async")
+        self.Session = sessionmaker(autocommit=False, autoflush=False, bind=self.engine)
+        self.AsyncSession = async_sessionmaker(self.async_engine, class_=AsyncSession,
+                                               autoflush=False, expire_on_commit=False)
+        self.healthy = False        # inconnu tant que le premier check n'a pas tourné
+        self.lag_s: float | None = None
+        self.checked_at: float | None = None
+        self.error: str | None = None
+
+    @property
+    def usable(self) -> bool:
+        return self.healthy and self.lag_s is not None and self.lag_s <= DB_REPLICA_MAX_LAG_S
+
+    def check(self):
+        try:
+            with self.engine.connect() as conn:
+                self.lag_s = float(conn.execute(LAG_SQL).scalar() or 0.0)
+            self.healthy, self.error = True, None
+        except Exception as e:
+            self.healthy, self.lag_s, self.error = False, None, str(e)[:200]
+            log.warning("réplica %s indisponible: %s", self.label, self.error)
+        self.checked_at = time.time()
+
+    def status(self) -> dict:
+        return {"label": self.label, "healthy": self.healthy, "usable": self.usable,
+                "lag_s": self.lag_s, "checked_at": self.checked_at, "error": self.error}
+
+
+class ReadRouter:
+    def __init__(self, urls: list[str]):
+        self.replicas = [Replica(i, u) for i, u in enumerate(urls, start=1)]
+        self._rr = itertools.count()
+        self._lock = threading.Lock()
+        self._thread: threading.Thread | None = None
+        self._stop = threading.Event()
+
+    def _loop(self):
+        while not self._stop.is_set():
+            for r in self.replicas:
+                r.check()
+            self._stop.wait(DB_REPLICA_CHECK_INTERVAL_S)
+
+    def start(self):
+        # démarrage paresseux : le thread doit naître dans le worker, pas avant le fork
+        if not self.replicas or (self._thread and self._thread.is_alive()):
+            return
+        with self._lock:
+            if self._thread and self._thread.is_alive():
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._loop, name="replica-health", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def pick(self) -> Replica | None:
+        if not self.replicas:
+            return None
+        self.start()
+        candidates = [r for r in self.replicas if r.usable]
+        if not candidates:
+            return None
+        return candidates[next(self._rr) % len(candidates)]
+
+    def status(self) -> dict:
+        return {
+            "max_lag_s": DB_REPLICA_MAX_LAG_S,
+            "check_interval_s": DB_REPLICA_CHECK_INTERVAL_S,
+            "replicas": [r.status() for r in self.replicas],
+        }
+
+
+read_router = ReadRouter(DATABASE_REPLICA_URLS)
+
+
+class PrimaryPins:
+    """user_id → échéance de l'épinglage au primaire (mémoire du worker, + redis si configuré)."""
+
+    def __init__(self, redis_url: str):
+        self._until: dict[int, float] = {}
+        self._lock = threading.Lock()
+        self.r = None
+        if redis_url:
+            try:
+                import redis  # dépendance optionnelle
+
+                self.r = redis.Redis.from_url(redis_url, socket_timeout=0.2, socket_connect_timeout=0.2)
+            except ImportError:
+                log.warning("DB_PIN_REDIS_URL sans le paquet redis : épinglage par worker")
+
+    def pin(self, user_id: int, ttl_s: float):
+        now = time.time()
+        with self._lock:
+            if len(self._until) > 10_000:
+                self._until = {u: t for u, t in self._until.items() if t > now}
+            self._until[user_id] = now + ttl_s
+        if self.r is not None:
+            try:
+                self.r.set(f"pin:{user_id}", 1, px=int(ttl_s * 1000))
+            except Exception:
+                log.warning("épinglage redis indisponible", exc_info=True)
+
+    def pinned(self, user_id: int) -> bool:
+        if self._until.get(user_id, 0.0) > time.time():
+            return True
+        if self.r is None:
+            return False
+        try:
+            return bool(self.r.exists(f"pin:{user_id}"))
+        except Exception:
+            return False
+
+
+pins = PrimaryPins(DB_PIN_REDIS_URL)
+
+
+def _bearer_user_id(request: Request) -> int | None:
+    scheme, _, token = request.headers.get("authorization", "").partition(" ")
+    if scheme.lower() != "bearer" or not token:
+        return None
+    from app.auth import decode_token   # import circulaire : auth dépend de ce module
+
+    try:
+        return int(decode_token(token).get("sub"))
+    except Exception:
+        return None
+
+
+def _pinned_to_primary(request: Request) -> bool:
+    if not read_router.replicas:
+        return False
+    user_id = _bearer_user_id(request)
+    if user_id is not None and pins.pinned(user_id):
+        return True
+    try:
+        return float(request.cookies.get(PRIMARY_PIN_COOKIE)) > time.time()
+    except (TypeError, ValueError):
+        return False
+
+
+def pin_primary(response: Response, user_id: int | None = None):
+    """À appeler après une écriture : les lectures suivantes de l'utilisateur restent sur le primaire."""
+    if not read_router.replicas:
+        return
+    if user_id is not None:
+        pins.pin(user_id, DB_READ_YOUR_WRITES_S)
+    until = time.time() + DB_READ_YOUR_WRITES_S
+    response.set_cookie(PRIMARY_PIN_COOKIE, f"{until:.3f}",
+                        max_age=math.ceil(DB_READ_YOUR_WRITES_S), httponly=True, samesite="lax")
+
+
+def read_session():
+    """Session de lecture hors requête HTTP (jobs, rafraîchissements en tâche de fond)."""
+    replica = read_router.pick()
+    return replica.Session() if replica else SessionLocal()
+
+
+def get_read_db(request: Request):
+    replica = None if _pinned_to_primary(request) else read_router.pick()
+    db = replica.Session() if replica else SessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+async def get_async_read_db(request: Request):
+    replica = None if _pinned_to_primary(request) else read_router.pick()
+    maker = replica.AsyncSession if replica else AsyncSessionLocal
+    async with maker() as db:
+        yield db
@@ -0,0 +1,110 @@
+# app/engagement.py
+"""Compteurs maintenus à l'écriture.
+
+- "going" (occurrences.going_count, evenements.going_count) : toute transition de
+  statut vers ou depuis "going" appelle bump_going() dans la même transaction que
+  la participation ; les tops admin et le dashboard organisateur lisent les
+  compteurs au lieu d'agréger participations.
+- notes (evenements.rating_sum / rating_count / rating_comment_count) :
+  upsert_rating() écrit la note et met à jour les agrégats en une instruction ;
+  moyenne et nombre d'avis se lisent sur la ligne de l'événement.
+"""
+from sqlalchemy import update, select, func, text
+from sqlalchemy.orm import Session
+
+from app import models
+
+
+def bump_going(db: Session, occurrence_id: int, evenement_id: int, delta: int):
+    if not delta:
+        return
+    db.execute(update(models.Occurrence)
+               .where(models.Occurrence.id == occurrence_id)
+               .values(going_count=models.Occurrence.going_count + delta)
+               .execution_options(synchronize_session=False))
+    db.execute(update(models.Evenement)
+               .where(models.Evenement.id == evenement_id)
+               .values(going_count=models.Evenement.going_count + delta)
+               .execution_options(synchronize_session=False))
+
+
+def bump_going_many(db: Session, occ_deltas: dict[int, int], ev_deltas: dict[int, int]):
+    """Variante ensembliste (lots de participations) : un UPDATE … FROM unnest par table."""
+    for table, deltas in (("occurrences", occ_deltas), ("evenements", ev_deltas)):
+        deltas = {k: v for k, v in deltas.items() if v}
+        if not deltas:
+            continue
+        db.execute(text(
+            f"UPDATE {table} t SET going_count = t.going_count + d.delta "
+            "FROM unnest(CAST(:ids AS integer[]), CAST(:deltas AS integer[])) AS d(id, delta) "
+            "WHERE t.id = d.id"
+        ), {"ids": list(deltas), "deltas": list(deltas.values())})
+
+
+# avis "avec commentaire" : commentaire non vide une fois trimé (cf. /ratings?include_empty)
+RATING_UPSERT_SQL = text("""
+    WITH prev AS (
+        SELECT rating, length(trim(commentaire)) > 0 AS has_comment
+        FROM event_ratings WHERE user_id = :user_id AND evenement_id = :ev_id
+    ), up AS (
+        INSERT INTO event_ratings (user_id, evenement_id, rating, commentaire, created_at, updated_at)
+        VALUES (:user_id, :ev_id, :rating, :commentaire, now() AT TIME ZONE 'utc', now() AT TIME ZONE 'utc')
+        ON CONFLICT (user_id, evenement_id) DO UPDATE
+            SET rating = EXCLUDED.rating, commentaire = EXCLUDED.commentaire, updated_at = EXCLUDED.updated_at
+        RETURNING rating, length(trim(commentaire)) > 0 AS has_comment
+    )
+    UPDATE evenements e SET
+        rating_sum = e.rating_sum + up.rating - COALESCE(prev.rating, 0),
+        rating_count = e.rating_count + CASE WHEN prev.rating IS NULL THEN 1 ELSE 0 END,
+        rating_comment_count = e.rating_comment_count
+            + COALESCE(up.has_comment::int, 0) - COALESCE(prev.has_comment::int, 0)
+    FROM up LEFT JOIN prev ON true
+    WHERE e.id = :ev_id
+    RETURNING e.rating_sum, e.rating_count, e.rating_comment_count
+""")
+
+RELEASE_RATINGS_SQL = text("""
+    UPDATE evenements e SET
+        rating_sum = e.rating_sum - x.s, rating_count = e.rating_count - x.n,
+        rating_comment_count = e.rating_comment_count - x.c
+    FROM (SELECT evenement_id, sum(rating) AS s, count(*) AS n,
+                 count(*) FILTER (WHERE length(trim(commentaire)) > 0) AS c
+          FROM event_ratings WHERE user_id = :user_id GROUP BY evenement_id) x
+    WHERE e.id = x.evenement_id
+""")
+
+
+def release_user(db: Session, user_id: int):
+    """Avant suppression d'un utilisateur : ses participations "going" et ses notes partent en cascade."""
+    P, O, E = models.Participation, models.Occurrence, models.Evenement
+    per_occ = (select(P.occurrence_id.label("oid"), func.count().label("n"))
+               .where(P.user_id == user_id, P.status == "going")
+               .group_by(P.occurrence_id).subquery())
+    per_ev = (select(O.evenement_id.label("eid"), func.count().label("n"))
+              .join(P, P.occurrence_id == O.id)
+              .where(P.user_id == user_id, P.status == "going")
+              .group_by(O.evenement_id).subquery())
+    db.execute(update(O).where(O.id == per_occ.c.oid)
+               .values(going_count=O.going_count - per_occ.c.n)
+               .execution_options(synchronize_session=False))
+    db.execute(update(E).where(E.id == per_ev.c.eid)
+               .values(going_count=E.going_count - per_ev.c.n)
+               .execution_options(synchronize_session=False))
+    db.execute(RELEASE_RATINGS_SQL, {"user_id": user_id})
+
+
+def upsert_rating(db: Session, user_id: int, evenement_id: int, rating: int, commentaire: str | None):
+    """Écrit la note et renvoie (rating_sum, rating_count, rating_comment_count), None si l'événement n'existe pas.
+
+    La ligne de l'événement est verrouillée d'abord (FOR NO KEY UPDATE, compatible
+    avec les FK des autres tables) : deux premières notes concurrentes du même
+    utilisateur voient ainsi la bonne ligne "prev" et ne comptent pas double.
+    """
+    locked = (db.query(models.Evenement.id)
+                .filter(models.Evenement.id == evenement_id)
+                .with_for_update(key_share=True)
+                .scalar())
+    if locked is None:
+        return None
+    return db.execute(RATING_UPSERT_SQL, {"user_id": user_id, "ev_id": evenement_id,
+                                          "rating": rating, "commentaire": commentaire}).one()
@@ -0,0 +1,176 @@
+# app/event_cards.py
+"""Cartes d'événements pré-rendues pour les listes (/evenements, /home, /reco).
+
+Une carte = EvenementResponse déjà sérialisée en JSON (table event_cards), sans
+les occurrences ni les champs dynamiques (rating_average, rating_count,
+is_promoted). Les listes ne sélectionnent que des colonnes (id, version,
+promotion, compteurs de notes, carte) et collent les octets des cartes dans le
+corps de la réponse après y avoir ajouté les champs dynamiques : ni objets
+ORM, ni validation Pydantic.
+
+Occurrences : seules les LIST_MAX_OCCURRENCES premières de la fenêtre de la
+requête (à venir par défaut), chargées pour toute la page en une requête
+(row_number() par événement), avec occurrences_total = nombre d'occurrences de
+l'événement dans la fenêtre. Le planning complet se lit via
+GET /evenements/{id}/occurrences (paginé).
+
+Fraîcheur : une carte n'est utilisée que si sa version est celle de
+l'événement (evenements.version, triggers de migrations/005). Les écritures et
+l'import appellent refresh() ; une carte absente ou périmée est rendue à la
+volée puis réécrite en tâche de fond (refresh_ids).
+"""
+import json, logging, os
+from datetime import datetime
+
+from sqlalchemy import select, and_, func
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.orm import Session
+from sqlalchemy.orm.attributes import set_committed_value
+
+from app import models, schemas
+
+log = logging.getLogger(__name__)
+
+LIST_MAX_OCCURRENCES = int(os.getenv("LIST_MAX_OCCURRENCES", "5"))
+REFRESH_BATCH = 500
+
+# champs ajoutés à la lecture (overlay), absents des cartes stockées
+DYNAMIC_FIELDS = {"occurrences", "occurrences_total", "rating_average", "rating_count", "is_promoted"}
+
+
+def render(ev: models.Evenement) -> bytes:
+    # pas d'occurrences : from_attributes ne touche pas à la relation (pas de chargement)
+    data = {c.key: getattr(ev, c.key) for c in models.Evenement.__table__.columns}
+    return schemas.EvenementResponse.model_validate(data).model_dump_json(exclude=DYNAMIC_FIELDS).encode()
+
+
+def _occ_json(o) -> dict:
+    return {"debut": o.debut.isoformat(), "fin": o.fin.isoformat() if o.fin else None,
+            "all_day": bool(o.all_day), "id": o.id}
+
+
+def overlay(card: bytes, occurrences: list, occurrences_total: int,
+            rating_sum: int, rating_count: int, promoted: bool) -> bytes:
+    avg = json.dumps(rating_sum / rating_count) if rating_count else "null"
+    occ = json.dumps([_occ_json(o) for o in occurrences], separators=(",", ":"))
+    return card[:-1] + (f',"occurrences":{occ},"occurrences_total":{occurrences_total},'
+                        f'"rating_average":{avg},"rating_count":{rating_count},'
+                        f'"is_promoted":{"true" if promoted else "false"}}}').encode()
+
+
+# --- Lecture ----------------------------------------------------------------
+def columns():
+    """Colonnes à sélectionner (à la place de l'entité Evenement) pour assemble()."""
+    E, C = models.Evenement, models.EventCard
+    return (E.id, E.version, E.promoted_until, E.rating_sum, E.rating_count, C.body.label("card"))
+
+
+def join(qs):
+    E, C = models.Evenement, models.EventCard
+    return qs.outerjoin(C, and_(C.evenement_id == E.id, C.version == E.version))
+
+
+async def load_occurrences(db, ids: list[int], occ_filters: list, n: int) -> dict[int, tuple[list, int]]:
+    """ids → (n premières occurrences de la fenêtre, total dans la fenêtre), une requête pour la page."""
+    if not ids:
+        return {}
+    O = models.Occurrence
+    ranked = (
+        select(O.id, O.evenement_id, O.debut, O.fin, O.all_day,
+               func.row_number().over(partition_by=O.evenement_id, order_by=(O.debut, O.id)).label("rn"),
+               func.count().over(partition_by=O.evenement_id).label("total"))
+          .where(O.evenement_id.in_(ids), *occ_filters)
+          .subquery()
+    )
+    out: dict[int, tuple[list, int]] = {}
+    # au moins rn = 1 : le total de chaque événement même avec n = 0
+    for r in await db.execute(select(ranked).where(ranked.c.rn <= max(n, 1))
+                                .order_by(ranked.c.evenement_id, ranked.c.rn)):
+        occs, _ = out.setdefault(r.evenement_id, ([], r.total))
+        if r.rn <= n:
+            occs.append(r)
+    return out
+
+
+async def assemble(db, rows, now: datetime, occ_filters: list,
+                   n_occ: int = LIST_MAX_OCCURRENCES) -> tuple[list[tuple], bytes, list[int]]:
+    """rows (ordonnées) → (items pour l'ETag, corps JSON de la liste, ids à rafraîchir).
+
+    occ_filters : prédicats sur Occurrence définissant la fenêtre de la requête.
+    """
+    missing = [r.id for r in rows if r.card is None]
+    rendered = {}
+    if missing:
+        evs = (await db.scalars(select(models.Evenement).where(models.Evenement.id.in_(missing)))).all()
+        rendered = {ev.id: render(ev) for ev in evs}
+    occurrences = await load_occurrences(db, [r.id for r in rows], occ_filters, n_occ)
+    items, parts = [], []
+    for r in rows:
+        card = r.card if r.card is not None else rendered.get(r.id)
+        if card is None:   # supprimé entre les deux requêtes
+            continue
+        promoted = bool(r.promoted_until and r.promoted_until >= now)
+        occs, total = occurrences.get(r.id, ([], 0))
+        # l'ETag couvre la version (occurrences comprises) et la page d'occurrences affichée
+        items.append((r.id, r.version, promoted, total, occs[0].id if occs else 0))
+        parts.append(overlay(bytes(card), occs, total, r.rating_sum, r.rating_count, promoted))
+    return items, b"[" + b",".join(parts) + b"]", missing
+
+
+# --- Écriture ---------------------------------------------------------------
+def refresh(db: Session, ids) -> int:
+    """Re-rend les cartes de ids dans la transaction courante (après les écritures de l'événement).
+
+    Flush d'abord (autoflush=False) : les modifications en attente sont rendues et
+    les triggers de version ont tourné ; seule la version est ensuite relue.
+    """
+    ids = list(dict.fromkeys(ids))
+    E, C = models.Evenement, models.EventCard
+    db.flush()
+    now = datetime.utcnow()
+    n = 0
+    for i in range(0, len(ids), REFRESH_BATCH):
+        batch = ids[i:i + REFRESH_BATCH]
+        versions = dict(db.execute(select(E.id, E.version).where(E.id.in_(batch))).all())
+        if not versions:
+            continue
+        # objets de la session tels quels (identity map) : pas de populate_existing
+        evs = db.query(E).filter(E.id.in_(list(versions))).all()
+        for ev in evs:
+            set_committed_value(ev, "version", versions[ev.id])
+        stmt = pg_insert(C).values([
+            {"evenement_id": ev.id, "version": ev.version, "body": render(ev), "rendered_at": now}
+            for ev in evs
+        ])
+        db.execute(stmt.on_conflict_do_update(
+            index_elements=[C.evenement_id],
+            set_={"version": stmt.excluded.version, "body": stmt.excluded.body,
+                  "rendered_at": stmt.excluded.rendered_at},
+            where=C.version <= stmt.excluded.version,   # un rendu concurrent plus ancien n'écrase pas
+        ))
+        n += len(evs)
+    return n
+
+
+def refresh_ids(ids: list[int]):
+    """Tâche de fond des listes : réécrit sur le primaire les cartes rendues à la volée."""
+    from app.database import SessionLocal
+
+    db = SessionLocal()
+    try:
+        refresh(db, ids)
+        db.commit()
+    except Exception:
+        db.rollback()
+        log.warning("rafraîchissement des cartes %s impossible", ids[:10], exc_info=True)
+    finally:
+        db.close()
+
+
+def stale_ids(db: Session, after_id: int, limit: int) -> list[int]:
+    E, C = models.Evenement, models.EventCard
+    return [r[0] for r in db.execute(
+        select(E.id).outerjoin(C, C.evenement_id == E.id)
+          .where(E.id > after_id, (C.evenement_id.is_(None)) | (C.version != E.version))
+          .order_by(E.id).limit(limit)
+    )]
@@ -0,0 +1,248 @@
+# app/export.py
+"""Export admin en streaming : zip écrit au fil de l'eau, mémoire bornée.
+
+Chaque table est lue par un thread producteur sur sa propre connexion
+(COPY … TO STDOUT, CSV avec en-tête) ; les octets passent par une file bornée
+(EXPORT_QUEUE_CHUNKS × EXPORT_CHUNK_BYTES) jusqu'au générateur qui les écrit
+dans l'entrée zip et rend au client ce qui vient d'être compressé. Le premier
+octet part dès le premier bloc de la première table.
+
+parallel > 1 : les tables suivantes sont lues en avance sur d'autres connexions
+(chacune bloquée sur sa file tant que le zip ne l'a pas atteinte). Sans
+parallélisme, les tables restent lues l'une après l'autre ; dans les deux cas
+chaque table a son propre instantané.
+
+Formats colonnes (pyarrow, dépendance optionnelle) : parquet (zstd) ou arrow
+(IPC fichier, zstd), écrits par row groups de EXPORT_ROW_GROUP_ROWS lignes
+depuis un curseur serveur (stream_results). Types issus des modèles :
+entiers, flottants, booléens, dates, timestamps (UTC si timezone=True) ;
+les colonnes JSONB sont du texte JSON (métadonnée de champ encoding=json).
+"""
+import json, logging, os, queue, threading, zipfile
+from concurrent.futures import ThreadPoolExecutor
+
+from sqlalchemy import select, types
+from sqlalchemy.dialects.postgresql import JSONB
+
+from app import models
+from app.database import engine
+from app.db_router import read_router
+
+log = logging.getLogger(__name__)
+
+EXPORT_CHUNK_BYTES = int(os.getenv("EXPORT_CHUNK_BYTES", str(256 * 1024)))
+EXPORT_QUEUE_CHUNKS = int(os.getenv("EXPORT_QUEUE_CHUNKS", "8"))
+EXPORT_MAX_PARALLEL = int(os.getenv("EXPORT_MAX_PARALLEL", "4"))
+EXPORT_ROW_GROUP_ROWS = int(os.getenv("EXPORT_ROW_GROUP_ROWS", "50000"))
+
+_DONE = object()
+
+
+class ExportCancelled(Exception):
+    pass
+
+
+class _QueueWriter:
+    """Fichier en écriture seule qui pousse des blocs de CHUNK octets dans une file bornée."""
+
+    def __init__(self, q: queue.Queue, cancelled: threading.Event):
+        self.q, self.cancelled = q, cancelled
+        self.buf = bytearray()
+        self.pos = 0
+        self.closed = False
+
+    def _put(self, item):
+        while True:
+            if self.cancelled.is_set():
+                raise ExportCancelled()
+            try:
+                self.q.put(item, timeout=0.5)
+                return
+            except queue.Full:
+                continue
+
+    def write(self, data):
+        if isinstance(data, str):
+            data = data.encode("utf-8")
+        self.buf += data
+        self.pos += len(data)
+        if len(self.buf) >= EXPORT_CHUNK_BYTES:
+            self._put(bytes(self.buf))
+            self.buf.clear()
+        return len(data)
+
+    def tell(self) -> int:
+        return self.pos
+
+    def flush(self):
+        pass
+
+    def finish(self):
+        if self.buf:
+            self._put(bytes(self.buf))
+            self.buf.clear()
+
+
+class _ZipSink:
+    """Sortie non seekable du ZipFile : on récupère les octets produits entre deux yields."""
+
+    def __init__(self):
+        self.parts: list[bytes] = []
+
+    def write(self, data):
+        self.parts.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self) -> bytes:
+        out = b"".join(self.parts)
+        self.parts.clear()
+        return out
+
+
+def _read_engine():
+    replica = read_router.pick()
+    return replica.engine if replica else engine
+
+
+def _copy_csv(conn, table: str, out: _QueueWriter):
+    cur = conn.connection.dbapi_connection.cursor()
+    try:
+        cur.copy_expert(f'COPY (SELECT * FROM "{table}") TO STDOUT WITH (FORMAT csv, HEADER)', out)
+    finally:
+        cur.close()
+
+
+def _arrow_schema(pa, table):
+    fields = []
+    for col in table.columns:
+        t = col.type
+        if isinstance(t, JSONB):
+            fields.append(pa.field(col.name, pa.string(), metadata={"encoding": "json"}))
+            continue
+        if isinstance(t, types.Boolean):
+            typ = pa.bool_()
+        elif isinstance(t, types.Integer):
+            typ = pa.int64()
+        elif isinstance(t, types.Float):
+            typ = pa.float64()
+        elif isinstance(t, types.DateTime):
+            typ = pa.timestamp("us", tz="UTC" if t.timezone else None)
+        elif isinstance(t, types.Date):
+            typ = pa.date32()
+        else:
+            typ = pa.string()
+        fields.append(pa.field(col.name, typ))
+    return pa.schema(fields)
+
+
+def _write_columnar(conn, table_name: str, out: _QueueWriter, fmt: str):
+    import pyarrow as pa
+
+    table = models.Base.metadata.tables[table_name]   # via models : tables enregistrées
+    schema = _arrow_schema(pa, table)
+    json_cols = {i for i, col in enumerate(table.columns) if isinstance(col.type, JSONB)}
+    sink = pa.PythonFile(out, mode="w")
+    if fmt == "parquet":
+        import pyarrow.parquet as pq
+        writer = pq.ParquetWriter(sink, schema, compression="zstd")
+        write = lambda batch: writer.write_batch(batch, row_group_size=EXPORT_ROW_GROUP_ROWS)
+    else:
+        writer = pa.ipc.new_file(sink, schema, options=pa.ipc.IpcWriteOptions(compression="zstd"))
+        write = writer.write_batch
+
+    res = (conn.execution_options(stream_results=True, max_row_buffer=EXPORT_ROW_GROUP_ROWS)
+               .execute(select(table)))
+    try:
+        for rows in res.partitions(EXPORT_ROW_GROUP_ROWS):
+            columns = list(zip(*rows))
+            arrays = [
+                pa.array([json.dumps(v) if v is not None else None for v in values] if i in json_cols else values,
+                         type=schema.field(i).type)
+                for i, values in enumerate(columns)
+            ]
+            write(pa.RecordBatch.from_arrays(arrays, schema=schema))
+    finally:
+        res.close()
+        writer.close()
+
+
+def _parquet(conn, table: str, out: _QueueWriter):
+    _write_columnar(conn, table, out, "parquet")
+
+
+def _arrow(conn, table: str, out: _QueueWriter):
+    _write_columnar(conn, table, out, "arrow")
+
+
+# format -> (producteur, extension, compression zip) ; parquet/arrow sont déjà compressés
+FORMATS = {
+    "csv": (_copy_csv, "csv", zipfile.ZIP_DEFLATED),
+    "parquet": (_parquet, "parquet", zipfile.ZIP_STORED),
+    "arrow": (_arrow, "arrow", zipfile.ZIP_STORED),
+}
+
+
+def format_available(fmt: str) -> bool:
+    if fmt == "csv":
+        return True
+    try:
+        import pyarrow  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+def _produce(fmt: str, table: str, q: queue.Queue, cancelled: threading.Event):
+    producer = FORMATS[fmt][0]
+    out = _QueueWriter(q, cancelled)
+    try:
+        with _read_engine().connect() as conn:
+            producer(conn, table, out)
+        out.finish()
+        out._put(_DONE)
+    except ExportCancelled:
+        pass
+    except BaseException as e:
+        log.exception("export de %s impossible", table)
+        try:
+            out._put(e)
+        except ExportCancelled:
+            pass
+
+
+def stream_zip(tables: list[str], fmt: str = "csv", parallel: int = 1):
+    """Générateur d'octets du zip (à passer tel quel à StreamingResponse)."""
+    _, ext, compression = FORMATS[fmt]
+    parallel = max(1, min(parallel, EXPORT_MAX_PARALLEL, len(tables) or 1))
+    cancelled = threading.Event()
+    queues = [queue.Queue(maxsize=EXPORT_QUEUE_CHUNKS) for _ in tables]
+    pool = ThreadPoolExecutor(max_workers=parallel, thread_name_prefix="export")
+    sink = _ZipSink()
+    try:
+        # soumis dans l'ordre du zip : la table en cours de lecture côté zip tourne toujours
+        for table, q in zip(tables, queues):
+            pool.submit(_produce, fmt, table, q, cancelled)
+        with zipfile.ZipFile(sink, "w", compression) as zf:
+            for table, q in zip(tables, queues):
+                with zf.open(f"{table}.{ext}", "w", force_zip64=True) as entry:
+                    while True:
+                        item = q.get()
+                        if item is _DONE:
+                            break
+                        if isinstance(item, BaseException):
+                            raise item
+                        entry.write(item)
+                        data = sink.drain()
+                        if data:
+                            yield data
+                data = sink.drain()
+                if data:
+                    yield data
+        yield sink.drain()
+    finally:
+        # fin normale, erreur ou client parti : les producteurs s'arrêtent au prochain put
+        cancelled.set()
+        pool.shutdown(wait=False, cancel_futures=True)
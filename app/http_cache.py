@@ -0,0 +1,55 @@
+# app/http_cache.py
+"""ETag / GET conditionnels et Cache-Control des lectures d'événements.
+
+evenements.version est incrémentée par triggers (migrations/005) à chaque
+écriture de l'événement, de ses occurrences ou de ses notes : l'ETag d'un
+événement se calcule depuis (id, version) sans charger l'objet ORM. L'état
+"promu" dépend de l'heure : il entre aussi dans l'ETag.
+
+Les routes anonymes (/evenements, /evenements/home, détail, avis) sont
+publiques (CDN) ; max-age court, le client revalide ensuite avec If-None-Match.
+"""
+import hashlib, os
+from datetime import datetime
+
+from fastapi import Response
+
+EVENT_MAX_AGE_S = int(os.getenv("EVENT_MAX_AGE_S", "30"))
+FEED_MAX_AGE_S = int(os.getenv("FEED_MAX_AGE_S", "60"))
+
+
+def public_cache(max_age: int) -> str:
+    return f"public, max-age={max_age}, s-maxage={max_age}, stale-while-revalidate={max_age}"
+
+
+def is_promoted(promoted_until: datetime | None, now: datetime | None = None) -> bool:
+    return bool(promoted_until and promoted_until >= (now or datetime.utcnow()))
+
+
+def event_etag(event_id: int, version: int, promoted: bool = False, kind: str = "ev") -> str:
+    return f'"{kind}-{event_id}-{version}{"-p" if promoted else ""}"'
+
+
+def list_etag(items) -> str:
+    """ETag d'une page de flux : items = [(id, version, promu, …)] dans l'ordre de la réponse."""
+    h = hashlib.sha1(",".join(".".join(str(int(x)) for x in item) for item in items).encode()).hexdigest()
+    return f'"feed-{h[:24]}"'
+
+
+def etag_matches(if_none_match: str | None, etag: str) -> bool:
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    # comparaison faible (RFC 9110 §13.1.2) : W/ ignoré
+    tags = [t.strip().removeprefix("W/") for t in if_none_match.split(",")]
+    return etag in tags
+
+
+def not_modified(etag: str, cache_control: str) -> Response:
+    return Response(status_code=304, headers={"ETag": etag, "Cache-Control": cache_control})
+
+
+def set_cache_headers(response: Response, etag: str, cache_control: str):
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = cache_control
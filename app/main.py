@@ -1,14 +1,39 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 import os
 
-from app.routes import ping, evenements, utilisateurs, login,organizer,participations, weather, evenements_context, utils, admin, cron
-from app.database import engine
-from app import models
+from app.routes import ping, evenements, utilisateurs, login,organizer,participations, weather, evenements_context, utils, admin, cron, metrics, calendar
+from app.database import engine, async_engine
+from app.db_router import read_router
+from app.query_stats import QueryStatsMiddleware
+from app.metrics import RequestMetricsMiddleware
+from app.profiling import ProfilerMiddleware
+from app.response_cache import listener as catalogue_listener
+
+UPLOAD_DIR = "uploads"
+os.makedirs(UPLOAD_DIR, exist_ok=True)  # StaticFiles vérifie le dossier dès le mount
+
+
+# Ressources du worker : les pools (primaire, réplicas) s'ouvrent à la première
+# requête. Le boot démarre deux threads qui se connectent seuls, sans bloquer le
+# démarrage : le LISTEN des invalidations (connexion dédiée, hors pool) et, si
+# des réplicas sont configurés, leur check de santé. bench/startup_profile.py
+# mesure le démarrage avec ces deux threads actifs. Le schéma se gère via
+# `python migrate.py`.
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    read_router.start()
+    catalogue_listener.start()   # LISTEN catalogue_changed / calendar_changed : caches du worker
+    yield
+    catalogue_listener.stop()
+    read_router.stop()
+    await async_engine.dispose()
+    engine.dispose()
 
 # Création de l'app
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
 
 # Configuration CORS
 app.add_middleware(
@@ -17,12 +42,13 @@ app.add_middleware(
     allow_credentials = True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "ETag"],   # lisibles par le front (curseurs, requêtes conditionnelles)
 )
+app.add_middleware(ProfilerMiddleware)     # sous QueryStats : compteurs SQL du profil
+app.add_middleware(QueryStatsMiddleware)
+app.add_middleware(RequestMetricsMiddleware)
 
-# Création des tables
-models.Base.metadata.create_all(bind=engine)
-os.makedirs("uploads", exist_ok=True)
-app.mount("/static/uploads", StaticFiles(directory="uploads"), name="uploads")
+app.mount("/static/uploads", StaticFiles(directory=UPLOAD_DIR), name="uploads")
 
 # Inclusion des routes
 app.include_router(ping.router)
@@ -36,6 +62,8 @@ app.include_router(evenements_context.router)
 app.include_router(utils.router)
 app.include_router(admin.router)
 app.include_router(cron.router)
+app.include_router(metrics.router)
+app.include_router(calendar.router)
 
 app.include_router(login.verify_router)  # ⬅️ AJOUTER CECI
 
@@ -0,0 +1,227 @@
+# app/metrics.py
+"""Métriques applicatives (prometheus_client), exposées sur /metrics.
+
+Toutes les métriques sont déclarées ici pour garder un seul registre par process.
+Sous gunicorn (plusieurs workers), définir PROMETHEUS_MULTIPROC_DIR (dossier vide,
+avant le démarrage) : chaque worker écrit ses valeurs dans ses propres fichiers
+mmap, sans verrou partagé, et /metrics agrège tous les workers à la lecture
+(cf. gunicorn.conf.py pour le nettoyage à la sortie d'un worker).
+"""
+import os, time
+from contextlib import contextmanager
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Gauge, Histogram, REGISTRY,
+    generate_latest, multiprocess,
+)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# --- HTTP ---
+HTTP_REQUESTS = Counter(
+    "http_requests_total",
+    "Requêtes HTTP par gabarit de route, méthode et code",
+    ["route", "method", "status"],
+)
+HTTP_LATENCY = Histogram(
+    "http_request_duration_seconds",
+    "Durée des requêtes HTTP par gabarit de route",
+    ["route", "method"],
+    buckets=LATENCY_BUCKETS,
+)
+HTTP_IN_FLIGHT = Gauge(
+    "http_requests_in_flight",
+    "Requêtes HTTP en cours",
+    multiprocess_mode="livesum",
+)
+
+# --- Appels sortants (Open-Meteo, Nominatim, OpenAgenda, SMTP) ---
+OUTBOUND_LATENCY = Histogram(
+    "outbound_request_duration_seconds",
+    "Durée des appels vers les services externes",
+    ["service"],
+    buckets=LATENCY_BUCKETS,
+)
+OUTBOUND_ERRORS = Counter(
+    "outbound_request_errors_total",
+    "Appels sortants en erreur (exception ou statut HTTP >= 400)",
+    ["service"],
+)
+
+# --- Jobs (import OpenAgenda, digest) ---
+JOB_DURATION = Histogram(
+    "job_duration_seconds",
+    "Durée des jobs",
+    ["job"],
+    buckets=(0.1, 0.5, 1, 5, 10, 30, 60, 120, 300, 600, 1800),
+)
+JOB_ITEMS = Counter(
+    "job_items_total",
+    "Éléments traités par les jobs",
+    ["job", "kind"],
+)
+
+# --- Pool de connexions DB ---
+DB_POOL_CHECKOUT_WAIT = Histogram(
+    "db_pool_checkout_wait_seconds",
+    "Temps d'attente pour obtenir une connexion du pool",
+    ["pool"],
+    buckets=(0.0005, 0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0),
+)
+DB_POOL_TIMEOUTS = Counter(
+    "db_pool_checkout_timeouts_total",
+    "Checkouts abandonnés faute de connexion libre (pool_timeout atteint)",
+    ["pool"],
+)
+DB_POOL_CHECKOUT_ERRORS = Counter(
+    "db_pool_checkout_errors_total",
+    "Checkouts en échec pour une autre raison (connexion refusée, authentification, DNS…)",
+    ["pool", "error"],   # error = classe de l'exception
+)
+DB_POOL_IN_USE = Gauge(
+    "db_pool_connections_in_use",
+    "Connexions actuellement empruntées au pool",
+    ["pool"],
+    multiprocess_mode="livesum",
+)
+DB_POOL_OVERFLOW = Gauge(
+    "db_pool_overflow_connections",
+    "Connexions ouvertes au-delà de pool_size",
+    ["pool"],
+    multiprocess_mode="livesum",
+)
+
+# --- Requêtes SQL par requête HTTP (app/query_stats.py) ---
+REQUEST_DB_QUERIES = Histogram(
+    "http_request_db_queries",
+    "Nombre de requêtes SQL par requête HTTP",
+    ["route"],
+    buckets=(0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 89, 144),
+)
+REQUEST_DB_TIME = Histogram(
+    "http_request_db_seconds",
+    "Temps SQL cumulé par requête HTTP",
+    ["route"],
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0),
+)
+NPLUS1_WARNINGS = Counter(
+    "http_request_nplus1_warnings_total",
+    "Formes de requête répétées au-delà de DB_NPLUS1_THRESHOLD dans une requête HTTP",
+    ["route"],
+)
+
+# par route seulement : les empreintes ne sont pas bornées (chaînes OR de kw_any…).
+# Le détail par empreinte (mêmes bornes) est dans slow_log (/admin/stats/queries).
+DB_STATEMENT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+DB_STATEMENT_SECONDS = Histogram(
+    "db_statement_seconds",
+    "Latence SQL par requête, par route (détail par empreinte : /admin/stats/queries)",
+    ["route"],
+    buckets=DB_STATEMENT_BUCKETS,
+)
+
+
+def _match(sample, labels: dict | None) -> bool:
+    return not labels or all(sample.labels.get(k) == v for k, v in labels.items())
+
+
+def metric_value(metric, suffix: str = "", labels: dict | None = None) -> float:
+    """Valeur courante (process local) d'un Counter/Gauge, ex. suffix='_total'."""
+    for fam in metric.collect():
+        for s in fam.samples:
+            if s.name == fam.name + suffix and _match(s, labels):
+                return s.value
+    return 0.0
+
+
+def metric_breakdown(metric, suffix: str, labels: dict | None, by: str) -> dict:
+    """Valeurs (process local) d'un Counter ventilées par le label `by`."""
+    return {s.labels[by]: s.value for fam in metric.collect() for s in fam.samples
+            if s.name == fam.name + suffix and _match(s, labels)}
+
+
+def histogram_snapshot(hist, labels: dict | None = None) -> dict:
+    """Résumé JSON (process local) d'un Histogram : count, sum et buckets cumulés."""
+    out = {"count": 0, "sum": 0.0, "buckets": {}}
+    for fam in hist.collect():
+        for s in fam.samples:
+            if not _match(s, labels):
+                continue
+            if s.name.endswith("_bucket"):
+                out["buckets"][s.labels["le"]] = int(s.value)
+            elif s.name.endswith("_count"):
+                out["count"] = int(s.value)
+            elif s.name.endswith("_sum"):
+                out["sum"] = round(s.value, 6)
+    return out
+
+
+def route_label(scope) -> str:
+    """Gabarit de la route (ex. /evenements/{event_id}), pas le chemin brut."""
+    route = scope.get("route")
+    return getattr(route, "path", None) or "unmatched"
+
+
+@contextmanager
+def track_outbound(service: str):
+    """Chronomètre un appel sortant ; toute exception est comptée comme erreur."""
+    t0 = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        OUTBOUND_ERRORS.labels(service).inc()
+        raise
+    finally:
+        OUTBOUND_LATENCY.labels(service).observe(time.perf_counter() - t0)
+
+
+@contextmanager
+def track_job(job: str):
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        JOB_DURATION.labels(job).observe(time.perf_counter() - t0)
+
+
+def count_job_items(job: str, **counts: int):
+    for kind, n in counts.items():
+        JOB_ITEMS.labels(job, kind).inc(n or 0)
+
+
+class RequestMetricsMiddleware:
+    """Compteurs / latences par route (ASGI pur, le coût se limite à quelques appels prometheus)."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        status = 500
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        HTTP_IN_FLIGHT.inc()
+        t0 = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            HTTP_IN_FLIGHT.dec()
+            route, method = route_label(scope), scope["method"]
+            HTTP_LATENCY.labels(route, method).observe(time.perf_counter() - t0)
+            HTTP_REQUESTS.labels(route, method, str(status)).inc()
+
+
+def render_latest() -> tuple[bytes, str]:
+    """Exposition texte Prometheus : agrégat de tous les workers en mode multiprocess."""
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry), CONTENT_TYPE_LATEST
@@ -1,5 +1,5 @@
 
-from sqlalchemy import Column, Integer, String, DateTime, Float, Boolean, ForeignKey, UniqueConstraint,Text
+from sqlalchemy import Column, Integer, String, Date, DateTime, Float, Boolean, ForeignKey, UniqueConstraint, Index, Text, LargeBinary
 from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
@@ -39,7 +39,12 @@ class Evenement(Base):
     latitude = Column(Float)
     longitude = Column(Float)
 
-    promoted_until = Column(DateTime, nullable=True)    
+    promoted_until = Column(DateTime, nullable=True, index=True)
+    going_count = Column(Integer, nullable=False, default=0, server_default="0")  # app/engagement.py
+    rating_sum = Column(Integer, nullable=False, default=0, server_default="0")   # idem : moyenne = sum / count
+    rating_count = Column(Integer, nullable=False, default=0, server_default="0")
+    rating_comment_count = Column(Integer, nullable=False, default=0, server_default="0")
+    version = Column(Integer, nullable=False, default=1, server_default="1")  # ETag, triggers migrations/005
     promoted_plan  = Column(String(32), nullable=True) 
 
     owner_id = Column(Integer, ForeignKey("utilisateurs.id"), nullable=True)
@@ -51,6 +56,15 @@ class Evenement(Base):
         cascade="all, delete-orphan",
         order_by="Occurrence.debut.asc()",
     )
+
+    __table_args__ = (
+        # filtres kw_all / kw_any / reco : keywords @> '["…"]'
+        Index("ix_evenements_keywords_gin", "keywords",
+              postgresql_using="gin", postgresql_ops={"keywords": "jsonb_path_ops"}),
+        # top admin : ORDER BY going_count DESC, id DESC LIMIT k (parcours arrière)
+        Index("ix_evenements_going_count", "going_count", "id"),
+    )
+
 class EventRating(Base):
     __tablename__ = "event_ratings"
 
@@ -60,11 +74,12 @@ class EventRating(Base):
     rating = Column(Integer, nullable=False)  
     commentaire = Column(Text, nullable=True) 
     
-    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False, index=True)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
 
     __table_args__ = (
         UniqueConstraint("user_id", "evenement_id", name="uq_user_event_rating"),
+        Index("ix_event_ratings_evenement_created", "evenement_id", "created_at"),
     )
 class WeatherSnapshot(Base):
     __tablename__ = "weather_snapshots"
@@ -94,12 +109,14 @@ class Occurrence(Base):
 
     id = Column(Integer, primary_key=True)
     evenement_id = Column(Integer, ForeignKey("evenements.id", ondelete="CASCADE"), index=True, nullable=False)
-    debut = Column(DateTime, nullable=False)
+    debut = Column(DateTime, nullable=False, index=True)
     fin   = Column(DateTime, nullable=True)
     all_day = Column(Boolean, default=False)
+    going_count = Column(Integer, nullable=False, default=0, server_default="0")  # app/engagement.py
 
     __table_args__ = (
         UniqueConstraint("evenement_id", "debut", "fin", name="uq_occurrence_event_time"),
+        Index("ix_occurrences_evenement_debut", "evenement_id", "debut"),
     )
 
     evenement = relationship("Evenement", back_populates="occurrences")
@@ -119,7 +136,7 @@ class Utilisateur(Base):
     available_days = Column(JSONB)
     mobility = Column(String(8))
 
-    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False, index=True)
 
     role = Column(String, nullable=False, default="user")
     is_abonne = Column(Boolean, nullable=False, default=False)
@@ -127,12 +144,18 @@ class Utilisateur(Base):
 
     events = relationship("Evenement", back_populates="owner")
 
+    __table_args__ = (
+        # /admin/users : ORDER BY created_at DESC, id DESC (curseur)
+        # index trigrammes de recherche : migrations/003_admin_search_trgm.sql
+        Index("ix_utilisateurs_created_id", "created_at", "id"),
+    )
+
 class EmailVerificationToken(Base):
     __tablename__ = "email_verif_tokens"
     id = Column(Integer, primary_key=True)
     user_id = Column(Integer, ForeignKey("utilisateurs.id"), nullable=False, index=True)
     token_hash = Column(String(128), nullable=False, unique=True)  # SHA-256 hex
-    expires_at = Column(DateTime(timezone=True), nullable=False)
+    expires_at = Column(DateTime(timezone=True), nullable=False, index=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
 
     user = relationship("Utilisateur")
@@ -144,7 +167,7 @@ class Participation(Base):
     user_id = Column(Integer, ForeignKey("utilisateurs.id", ondelete="CASCADE"), nullable=False, index=True)
     occurrence_id = Column(Integer, ForeignKey("occurrences.id", ondelete="CASCADE"), nullable=False, index=True)
     status = Column(String(20), nullable=False, default="going")  
-    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False, index=True)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
 
     user = relationship("Utilisateur", backref="participations")
@@ -152,6 +175,8 @@ class Participation(Base):
 
     __table_args__ = (
         UniqueConstraint("user_id", "occurrence_id", name="uq_participation_user_occurrence"),
+        Index("ix_participations_user_status", "user_id", "status"),
+        Index("ix_participations_occurrence_status", "occurrence_id", "status"),
     )
 
 class UserKeywordPref(Base):
@@ -168,4 +193,23 @@ class UserKeywordPref(Base):
     __table_args__ = (UniqueConstraint("user_id", "keyword", name="uq_user_keyword"),)
 
 
-    
+class DailyStat(Base):
+    """Rollup quotidien (jour UTC) des séries admin, alimenté par app/tasks/daily_rollup.py."""
+    __tablename__ = "daily_stats"
+
+    day = Column(Date, primary_key=True)
+    users = Column(Integer, nullable=False, default=0)           # inscriptions
+    events = Column(Integer, nullable=False, default=0)          # événements ayant une occurrence ce jour
+    participations = Column(Integer, nullable=False, default=0)
+    ratings = Column(Integer, nullable=False, default=0)
+    computed_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+
+
+class EventCard(Base):
+    """Carte JSON pré-rendue d'un événement pour les listes, entretenue par app/event_cards.py."""
+    __tablename__ = "event_cards"
+
+    evenement_id = Column(Integer, ForeignKey("evenements.id", ondelete="CASCADE"), primary_key=True)
+    version = Column(Integer, nullable=False)        # evenements.version au rendu
+    body = Column(LargeBinary, nullable=False)       # EvenementResponse sans les champs dynamiques
+    rendered_at = Column(DateTime, nullable=False, default=datetime.utcnow)
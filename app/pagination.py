@@ -0,0 +1,26 @@
+# app/pagination.py
+"""Curseurs opaques pour la pagination par clé (keyset).
+
+La route renvoie X-Next-Cursor quand la page est pleine ; le client le repasse
+tel quel dans ?cursor=. Le contenu (valeurs de la clé de tri) n'est pas signé :
+il ne sert qu'à positionner la page suivante.
+"""
+import base64
+
+from fastapi import HTTPException
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+def encode_cursor(*parts) -> str:
+    return base64.urlsafe_b64encode("|".join(str(p) for p in parts).encode()).decode()
+
+
+def decode_cursor(cursor: str, n: int) -> list[str]:
+    try:
+        parts = base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+    except (ValueError, UnicodeDecodeError):
+        parts = []
+    if len(parts) != n:
+        raise HTTPException(400, "Curseur invalide")
+    return parts
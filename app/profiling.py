@@ -0,0 +1,184 @@
+# app/profiling.py
+"""Profilage à la demande d'une requête (admin uniquement).
+
+    curl -H "Authorization: Bearer <token admin>" -H "X-Profile: 1" /evenements?limit=50
+
+La requête est exécutée sous pyinstrument (échantillonnage, dépendance optionnelle :
+`pip install pyinstrument`). La réponse porte X-Profile-Id ; le profil est stocké
+dans PROFILE_DIR au format speedscope (https://www.speedscope.app) avec un résumé :
+temps par catégorie (driver DB, ORM, SQLAlchemy core, sérialisation/Pydantic,
+code de l'app) et compteurs SQL de la requête. Récupération via
+/admin/profiles et /admin/profiles/{id}.
+
+Sans en-tête X-Profile, le middleware se contente d'un parcours des en-têtes :
+aucun profiler n'est chargé ni démarré. Limite : pyinstrument suit la tâche
+asyncio, les routes sync exécutées dans le threadpool n'apparaissent que comme
+un bloc d'attente ; les routes chaudes (feeds) sont async.
+"""
+import json, logging, os, time, uuid
+from collections import defaultdict
+
+from starlette.datastructures import MutableHeaders
+
+from app.query_stats import _current
+
+log = logging.getLogger(__name__)
+
+PROFILE_DIR = os.getenv("PROFILE_DIR", "/tmp/cultureradar-profiles")
+PROFILE_INTERVAL_MS = float(os.getenv("PROFILE_INTERVAL_MS", "1"))
+PROFILE_KEEP = int(os.getenv("PROFILE_KEEP", "50"))
+
+# (catégorie, fragments de chemin) : la frame la plus interne qui matche gagne
+CATEGORIES = [
+    ("db_driver", ("/psycopg2/", "/asyncpg/")),
+    ("orm", ("/sqlalchemy/orm/",)),
+    ("sqlalchemy_core", ("/sqlalchemy/",)),
+    ("serialization", ("/pydantic/", "/pydantic_core/", "/fastapi/encoders.py", "/json/")),
+    ("app", ("/app/",)),
+]
+
+
+def _category(frame_id: str) -> str | None:
+    # identifiant pyinstrument : "fonction\x00chemin\x00ligne[\x01attributs]"
+    parts = frame_id.split("\x00")
+    path = parts[1] if len(parts) > 1 else ""
+    for name, fragments in CATEGORIES:
+        if any(f in path for f in fragments):
+            return name
+    return None
+
+
+def breakdown(session) -> dict:
+    totals = defaultdict(float)
+    for stack, duration in session.frame_records:
+        for frame_id in reversed(stack):
+            cat = _category(frame_id)
+            if cat:
+                totals[cat] += duration
+                break
+        else:
+            totals["other"] += duration
+    return {k: round(v * 1000, 2) for k, v in sorted(totals.items(), key=lambda kv: -kv[1])}
+
+
+def _wants_profile(scope) -> bool:
+    for k, v in scope["headers"]:
+        if k == b"x-profile":
+            return v not in (b"", b"0")
+    return False
+
+
+def _bearer(scope) -> str | None:
+    for k, v in scope["headers"]:
+        if k == b"authorization" and v[:7].lower() == b"bearer ":
+            return v[7:].decode("latin-1")
+    return None
+
+
+async def _is_admin(scope) -> bool:
+    from app.auth import decode_token
+    from app.database import AsyncSessionLocal
+    from app.models import Utilisateur
+
+    token = _bearer(scope)
+    if not token:
+        return False
+    try:
+        user_id = int(decode_token(token).get("sub"))
+    except Exception:
+        return False
+    async with AsyncSessionLocal() as db:
+        user = await db.get(Utilisateur, user_id)
+    return bool(user and user.role == "admin")
+
+
+def _prune():
+    files = sorted((f for f in os.listdir(PROFILE_DIR) if f.endswith(".json")),
+                   key=lambda f: os.path.getmtime(os.path.join(PROFILE_DIR, f)))
+    for f in files[:max(0, len(files) - 2 * PROFILE_KEEP)]:
+        os.remove(os.path.join(PROFILE_DIR, f))
+
+
+def _store(profile_id: str, profiler, summary: dict):
+    from pyinstrument.renderers import SpeedscopeRenderer
+
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    with open(os.path.join(PROFILE_DIR, f"{profile_id}.speedscope.json"), "w") as f:
+        f.write(profiler.output(SpeedscopeRenderer()))
+    with open(os.path.join(PROFILE_DIR, f"{profile_id}.summary.json"), "w") as f:
+        json.dump(summary, f)
+    _prune()
+
+
+def list_profiles() -> list[dict]:
+    if not os.path.isdir(PROFILE_DIR):
+        return []
+    out = []
+    for f in os.listdir(PROFILE_DIR):
+        if f.endswith(".summary.json"):
+            with open(os.path.join(PROFILE_DIR, f)) as fh:
+                out.append(json.load(fh))
+    return sorted(out, key=lambda s: s["at"], reverse=True)
+
+
+def profile_path(profile_id: str) -> str | None:
+    try:
+        uuid.UUID(profile_id)   # pas de chemin arbitraire
+    except ValueError:
+        return None
+    path = os.path.join(PROFILE_DIR, f"{profile_id}.speedscope.json")
+    return path if os.path.exists(path) else None
+
+
+class ProfilerMiddleware:
+    """Middleware ASGI pur, à placer sous QueryStatsMiddleware (compteurs SQL)."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not _wants_profile(scope):
+            return await self.app(scope, receive, send)
+        if not await _is_admin(scope):
+            return await self.app(scope, receive, send)
+        try:
+            from pyinstrument import Profiler
+        except ImportError:
+            log.warning("X-Profile demandé mais pyinstrument n'est pas installé")
+            return await self.app(scope, receive, send)
+
+        profile_id = str(uuid.uuid4())
+        status = {}
+
+        async def send_with_id(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+                MutableHeaders(scope=message)["X-Profile-Id"] = profile_id
+            await send(message)
+
+        stats = _current.get()
+        q0, t0_db = (stats.count, stats.time_s) if stats else (0, 0.0)
+        profiler = Profiler(interval=PROFILE_INTERVAL_MS / 1000, async_mode="enabled")
+        t0 = time.perf_counter()
+        profiler.start()
+        try:
+            await self.app(scope, receive, send_with_id)
+        finally:
+            profiler.stop()
+            wall = time.perf_counter() - t0
+            summary = {
+                "id": profile_id,
+                "at": time.time(),
+                "method": scope.get("method"),
+                "path": scope.get("path"),
+                "query_string": scope.get("query_string", b"").decode("latin-1"),
+                "status": status.get("code"),
+                "wall_ms": round(wall * 1000, 2),
+                "db_queries": (stats.count - q0) if stats else None,
+                "db_time_ms": round((stats.time_s - t0_db) * 1000, 2) if stats else None,
+                "breakdown_ms": breakdown(profiler.last_session),
+            }
+            try:
+                _store(profile_id, profiler, summary)
+            except Exception:
+                log.exception("écriture du profil %s impossible", profile_id)
@@ -0,0 +1,312 @@
+# app/query_stats.py
+"""Compteur de requêtes SQL par requête HTTP, détection N+1 et slow-query log.
+
+Les events SQLAlchemy (toutes engines, sync et async) alimentent un objet
+QueryStats porté par un ContextVar : le middleware en crée un par requête, le
+contexte est copié dans le threadpool pour les routes sync.
+
+- DB_QUERY_HEADERS=1 : en-têtes X-DB-Queries / X-DB-Time-ms sur chaque réponse (debug) ;
+- toujours : histogrammes Prometheus par route (nombre de requêtes, temps DB,
+  latence de chaque requête) ;
+- par empreinte (SQL normalisé) : histogramme de latence (bornes de
+  DB_STATEMENT_BUCKETS, p50/p95/p99) dans le worker, hors Prometheus car les
+  empreintes ne sont pas bornées ; DB_FINGERPRINT_MAX empreintes au plus (LRU) ;
+- DB_NPLUS1_THRESHOLD : warning si une même forme de requête est exécutée plus de N fois ;
+- DB_SLOW_QUERY_MS / DB_SLOW_LOG_SIZE : les N requêtes les plus lentes au-dessus du
+  seuil sont gardées (paramètres masqués), avec leur plan si DB_SLOW_EXPLAIN=1.
+  Servi par /admin/stats/queries (données du worker courant). L'EXPLAIN tourne
+  après la réponse, dans un thread, sur une connexion du pool : jamais dans la
+  transaction de la requête (un échec l'aurait mise en état "aborted").
+
+Pour les tests : `with count_queries() as stats: …` puis `stats.count`.
+"""
+import bisect, contextvars, hashlib, heapq, itertools, json, logging, os, re, threading, time
+from collections import Counter, OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime
+from functools import lru_cache
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from starlette.datastructures import MutableHeaders
+
+from app.metrics import (
+    REQUEST_DB_QUERIES, REQUEST_DB_TIME, NPLUS1_WARNINGS, DB_STATEMENT_SECONDS, DB_STATEMENT_BUCKETS,
+    route_label,
+)
+
+log = logging.getLogger(__name__)
+
+DB_QUERY_HEADERS = os.getenv("DB_QUERY_HEADERS", "0") == "1"
+DB_NPLUS1_THRESHOLD = int(os.getenv("DB_NPLUS1_THRESHOLD", "10"))
+DB_SLOW_QUERY_MS = float(os.getenv("DB_SLOW_QUERY_MS", "200"))
+DB_SLOW_LOG_SIZE = int(os.getenv("DB_SLOW_LOG_SIZE", "50"))
+DB_SLOW_EXPLAIN = os.getenv("DB_SLOW_EXPLAIN", "0") == "1"
+DB_FINGERPRINT_MAX = int(os.getenv("DB_FINGERPRINT_MAX", "500"))
+DB_SLOW_EXPLAIN_TIMEOUT_MS = int(os.getenv("DB_SLOW_EXPLAIN_TIMEOUT_MS", "2000"))
+
+
+# --- Empreintes -------------------------------------------------------------
+_STRING_RE = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_RE = re.compile(r"\b\d+(?:\.\d+)?\b")
+_PARAM_RE = re.compile(r"%\(\w+\)s|%s|\$\d+")  # psycopg2 / asyncpg
+_IN_LIST_RE = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_SPACES_RE = re.compile(r"\s+")
+
+
+@lru_cache(maxsize=4096)
+def fingerprint(statement: str) -> tuple[str, str]:
+    """(id court, SQL normalisé) : littéraux et paramètres → ?, listes IN repliées."""
+    sql = _STRING_RE.sub("?", statement)
+    sql = _PARAM_RE.sub("?", sql)
+    sql = _NUMBER_RE.sub("?", sql)
+    sql = _IN_LIST_RE.sub("(?…)", sql)
+    sql = _SPACES_RE.sub(" ", sql).strip()
+    return hashlib.sha1(sql.encode()).hexdigest()[:12], sql
+
+
+def _redact(parameters):
+    # on ne garde que la forme des paramètres, jamais leurs valeurs
+    if isinstance(parameters, dict):
+        return {k: type(v).__name__ for k, v in parameters.items()}
+    if isinstance(parameters, (list, tuple)):
+        return [type(v).__name__ for v in parameters]
+    return type(parameters).__name__
+
+
+def _quantile_ms(buckets: list[int], count: int, q: float, max_ms: float) -> float:
+    """Quantile estimé d'un histogramme à bornes DB_STATEMENT_BUCKETS (interpolation linéaire)."""
+    rank, seen = q * count, 0
+    for i, n in enumerate(buckets):
+        if n and seen + n >= rank:
+            lo = DB_STATEMENT_BUCKETS[i - 1] * 1000 if i else 0.0
+            hi = DB_STATEMENT_BUCKETS[i] * 1000 if i < len(DB_STATEMENT_BUCKETS) else max_ms
+            return round(min(lo + (hi - lo) * (rank - seen) / n, max_ms), 2)
+        seen += n
+    return round(max_ms, 2)
+
+
+class SlowQueryLog:
+    """Top-N des requêtes les plus lentes (min-heap) + histogrammes par empreinte (LRU bornée)."""
+
+    def __init__(self, size: int, max_fingerprints: int):
+        self.size, self.max_fingerprints = size, max_fingerprints
+        self._heap: list = []
+        self._seq = itertools.count()
+        self._lock = threading.Lock()
+        self.fingerprints: OrderedDict[str, dict] = OrderedDict()
+        self.evicted = 0
+
+    def observe(self, fp_id: str, sql: str, route: str, duration: float):
+        with self._lock:
+            agg = self.fingerprints.get(fp_id)
+            if agg is None:
+                agg = self.fingerprints[fp_id] = {"id": fp_id, "sql": sql, "count": 0,
+                                                  "total_ms": 0.0, "max_ms": 0.0, "routes": Counter(),
+                                                  "buckets": [0] * (len(DB_STATEMENT_BUCKETS) + 1)}
+                while len(self.fingerprints) > self.max_fingerprints:
+                    self.fingerprints.popitem(last=False)
+                    self.evicted += 1
+            else:
+                self.fingerprints.move_to_end(fp_id)
+            agg["count"] += 1
+            agg["total_ms"] += duration * 1000
+            agg["max_ms"] = max(agg["max_ms"], duration * 1000)
+            agg["routes"][route] += 1
+            # bornes "le" comme Prometheus ; dernier compartiment = +Inf
+            agg["buckets"][bisect.bisect_left(DB_STATEMENT_BUCKETS, duration)] += 1
+
+    def would_keep(self, duration: float) -> bool:
+        return duration * 1000 >= DB_SLOW_QUERY_MS and (
+            len(self._heap) < self.size or duration > self._heap[0][0])
+
+    def add(self, duration: float, entry: dict):
+        with self._lock:
+            item = (duration, next(self._seq), entry)
+            if len(self._heap) < self.size:
+                heapq.heappush(self._heap, item)
+            elif duration > self._heap[0][0]:
+                heapq.heapreplace(self._heap, item)
+
+    def snapshot(self, limit: int) -> dict:
+        with self._lock:
+            slowest = [e for _, _, e in sorted(self._heap, key=lambda x: x[0], reverse=True)]
+            fps = sorted(self.fingerprints.values(), key=lambda a: a["total_ms"], reverse=True)[:limit]
+            fps = [{**{k: v for k, v in a.items() if k != "buckets"},
+                    "total_ms": round(a["total_ms"], 2), "max_ms": round(a["max_ms"], 2),
+                    "mean_ms": round(a["total_ms"] / a["count"], 2), "routes": dict(a["routes"]),
+                    **{f"p{int(q * 100)}_ms": _quantile_ms(a["buckets"], a["count"], q, a["max_ms"])
+                       for q in (0.5, 0.95, 0.99)},
+                    "buckets": {str(le): n for le, n in zip((*DB_STATEMENT_BUCKETS, "+Inf"), a["buckets"])}}
+                   for a in fps]
+            tracked, evicted = len(self.fingerprints), self.evicted
+        return {"threshold_ms": DB_SLOW_QUERY_MS, "slowest": slowest, "fingerprints": fps,
+                "fingerprints_tracked": tracked, "fingerprints_max": self.max_fingerprints,
+                "fingerprints_evicted": evicted}
+
+    def reset(self):
+        with self._lock:
+            self._heap.clear()
+            self.fingerprints.clear()
+            self.evicted = 0
+
+
+slow_log = SlowQueryLog(DB_SLOW_LOG_SIZE, DB_FINGERPRINT_MAX)
+
+
+# --- Stats par requête HTTP ---------------------------------------------------
+class QueryStats:
+    __slots__ = ("count", "time_s", "shapes", "timings", "scope", "explains")
+
+    def __init__(self, scope=None):
+        self.count = 0
+        self.time_s = 0.0
+        self.shapes = Counter()
+        self.timings: list[tuple[str, float]] = []
+        self.scope = scope
+        self.explains: list[tuple] = []   # (entrée du slow log, statement, paramètres, engine)
+
+    def record(self, statement: str, duration: float):
+        self.count += 1
+        self.time_s += duration
+        self.shapes[statement] += 1
+        self.timings.append((statement, duration))
+
+    def repeated(self, threshold: int) -> list[tuple[str, int]]:
+        return [(s, n) for s, n in self.shapes.most_common() if n > threshold]
+
+    @property
+    def route(self) -> str:
+        return route_label(self.scope) if self.scope is not None else "script"
+
+
+_current: contextvars.ContextVar[QueryStats | None] = contextvars.ContextVar("query_stats", default=None)
+
+
+_DOLLAR_PARAM_RE = re.compile(r"\$(\d+)")
+_explainer: ThreadPoolExecutor | None = None
+_explainer_lock = threading.Lock()
+
+
+def _explain_target(engine, statement: str, parameters):
+    """(engine sync, statement, paramètres) exécutables depuis un thread ordinaire."""
+    if not engine.dialect.is_async:
+        return engine, statement, parameters
+    # asyncpg ($1…, tuple) : pas d'appel sync possible hors greenlet, on passe par
+    # l'engine psycopg2 du primaire (même schéma ; plan du primaire)
+    from app.database import engine as primary
+
+    positions = [int(n) - 1 for n in _DOLLAR_PARAM_RE.findall(statement)]
+    sql = _DOLLAR_PARAM_RE.sub("%s", statement.replace("%", "%%"))
+    return primary, sql, tuple(parameters[i] for i in positions)
+
+
+def _run_explains(items: list[tuple]):
+    for entry, statement, parameters, engine in items:
+        try:
+            engine, statement, parameters = _explain_target(engine, statement, parameters)
+            with engine.connect() as conn:
+                conn.exec_driver_sql(f"SET LOCAL statement_timeout = {DB_SLOW_EXPLAIN_TIMEOUT_MS}")
+                plan = conn.exec_driver_sql("EXPLAIN (FORMAT JSON) " + statement, parameters).scalar()
+                conn.rollback()
+            entry["plan"] = json.loads(plan) if isinstance(plan, str) else plan
+        except Exception as e:
+            entry["plan"] = {"error": str(e)[:200]}
+
+
+def _explain_later(items: list[tuple]):
+    """Après la réponse : EXPLAIN des requêtes lentes retenues, thread dédié du worker."""
+    global _explainer
+    if _explainer is None:
+        with _explainer_lock:
+            if _explainer is None:
+                _explainer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="slow-explain")
+    _explainer.submit(_run_explains, items)
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _current.get() is not None:
+        conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    stats = _current.get()
+    if stats is None:
+        return
+    starts = conn.info.get("query_start")
+    if not starts:
+        return
+    duration = time.perf_counter() - starts.pop()
+    stats.record(statement, duration)
+
+    if slow_log.would_keep(duration):
+        fp_id, sql = fingerprint(statement)
+        entry = {
+            "fingerprint": fp_id, "sql": sql, "route": stats.route,
+            "duration_ms": round(duration * 1000, 2), "at": datetime.utcnow().isoformat() + "Z",
+            "params": _redact(parameters) if not executemany else "executemany",
+        }
+        if DB_SLOW_EXPLAIN and not executemany and sql.lstrip().upper().startswith(("SELECT", "WITH")):
+            # pas ici : l'EXPLAIN partagerait la transaction (et le temps) de la requête
+            entry["plan"] = "pending"
+            stats.explains.append((entry, statement, parameters, conn.engine))
+        slow_log.add(duration, entry)
+
+
+@contextmanager
+def count_queries():
+    """Active le comptage dans le bloc (budgets de requêtes dans les tests, scripts)."""
+    stats = QueryStats()
+    token = _current.set(stats)
+    try:
+        yield stats
+    finally:
+        _current.reset(token)
+        if stats.explains:
+            _explain_later(stats.explains)
+
+
+class QueryStatsMiddleware:
+    """Middleware ASGI pur (pas de BaseHTTPMiddleware : une tâche de moins par requête)."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        stats = QueryStats(scope)
+        token = _current.set(stats)
+
+        async def send_with_headers(message):
+            if DB_QUERY_HEADERS and message["type"] == "http.response.start":
+                headers = MutableHeaders(scope=message)
+                headers["X-DB-Queries"] = str(stats.count)
+                headers["X-DB-Time-ms"] = f"{stats.time_s * 1000:.1f}"
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_headers)
+        finally:
+            _current.reset(token)
+            self._report(scope, stats)
+            if stats.explains:
+                _explain_later(stats.explains)
+
+    @staticmethod
+    def _report(scope, stats: QueryStats):
+        route = route_label(scope)
+        REQUEST_DB_QUERIES.labels(route).observe(stats.count)
+        REQUEST_DB_TIME.labels(route).observe(stats.time_s)
+        for statement, duration in stats.timings:
+            fp_id, sql = fingerprint(statement)
+            DB_STATEMENT_SECONDS.labels(route).observe(duration)
+            slow_log.observe(fp_id, sql, route, duration)
+        for statement, n in stats.repeated(DB_NPLUS1_THRESHOLD):
+            NPLUS1_WARNINGS.labels(route).inc()
+            log.warning("N+1 probable sur %s %s : %d× %s", scope.get("method"), route, n,
+                        " ".join(statement.split())[:300])
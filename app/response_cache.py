@@ -0,0 +1,242 @@
+# app/response_cache.py
+"""Cache de réponses des flux anonymes (/evenements/home, /evenements sans filtre).
+
+Clé = route + paramètres normalisés ; valeur = corps JSON déjà sérialisé et son
+ETag : un hit ne touche ni la base ni Pydantic. Backends :
+- memory (défaut) : LRU par worker, bornée en entrées et en octets ;
+- redis : partagé entre workers et machines (RESPONSE_CACHE_URL, paquet `redis`
+  optionnel) ;
+- off.
+
+Invalidation : les écritures du catalogue (import, création, suppression,
+promotion, notes, suppression d'un utilisateur) appellent notify_catalogue_changed(db) dans leur transaction ;
+Postgres délivre le NOTIFY au COMMIT à chaque worker abonné (thread
+catalogue-listener, LISTEN sur une connexion hors pool). Chaque notification
+porte une génération : les clés sont préfixées par la génération courante, le
+backend mémoire est vidé, les entrées redis des générations précédentes
+expirent par TTL. RESPONSE_CACHE_TTL_S borne l'obsolescence si une
+notification est perdue (listener en reconnexion) et pour ce qui ne notifie
+pas (passage de l'heure de début).
+
+Le même thread écoute calendar_changed (flux .ics, app/calendar_feed.py) : il
+tourne même avec RESPONSE_CACHE_BACKEND=off.
+"""
+import logging, os, select, threading, time, uuid
+from collections import OrderedDict
+
+from sqlalchemy import text
+
+from app import calendar_feed
+from app.database import engine
+
+log = logging.getLogger(__name__)
+
+RESPONSE_CACHE_BACKEND = os.getenv("RESPONSE_CACHE_BACKEND", "memory")   # memory | redis | off
+RESPONSE_CACHE_URL = os.getenv("RESPONSE_CACHE_URL", "redis://localhost:6379/0")
+RESPONSE_CACHE_TTL_S = int(os.getenv("RESPONSE_CACHE_TTL_S", "30"))
+RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "512"))
+RESPONSE_CACHE_MAX_BYTES = int(os.getenv("RESPONSE_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+CATALOGUE_CHANNEL = "catalogue_changed"
+
+
+class MemoryBackend:
+    def __init__(self, max_entries: int, max_bytes: int):
+        self.max_entries, self.max_bytes = max_entries, max_bytes
+        self._entries: OrderedDict[str, tuple[float, bytes, str]] = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> tuple[bytes, str] | None:
+        with self._lock:
+            e = self._entries.get(key)
+            if e is None:
+                return None
+            if e[0] < time.monotonic():
+                self._drop(key)
+                return None
+            self._entries.move_to_end(key)
+            return e[1], e[2]
+
+    def set(self, key: str, body: bytes, etag: str, ttl_s: int):
+        if len(body) > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._drop(key)
+            self._entries[key] = (time.monotonic() + ttl_s, body, etag)
+            self._bytes += len(body)
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                self._drop(next(iter(self._entries)))
+
+    def _drop(self, key: str):
+        _, body, _ = self._entries.pop(key)
+        self._bytes -= len(body)
+
+    def clear(self, generation: str):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def generation(self) -> str:
+        return uuid.uuid4().hex   # cache propre au worker : nouvelle génération locale
+
+
+class RedisBackend:
+    def __init__(self, url: str):
+        import redis  # dépendance optionnelle
+
+        self.r = redis.Redis.from_url(url, socket_timeout=0.2, socket_connect_timeout=0.2)
+
+    def get(self, key: str) -> tuple[bytes, str] | None:
+        try:
+            e = self.r.hmget(key, "body", "etag")
+        except Exception:
+            log.warning("cache redis indisponible", exc_info=True)
+            return None
+        if e[0] is None:
+            return None
+        return e[0], e[1].decode()
+
+    def set(self, key: str, body: bytes, etag: str, ttl_s: int):
+        try:
+            with self.r.pipeline() as p:
+                p.hset(key, mapping={"body": body, "etag": etag})
+                p.expire(key, ttl_s)
+                p.execute()
+        except Exception:
+            log.warning("cache redis indisponible", exc_info=True)
+
+    def clear(self, generation: str):
+        # clés préfixées par génération : les anciennes expirent seules. La génération
+        # courante est publiée pour les workers qui (re)démarrent après la notification.
+        try:
+            self.r.set("rc:generation", generation)
+        except Exception:
+            log.warning("cache redis indisponible", exc_info=True)
+
+    def generation(self) -> str:
+        try:
+            g = self.r.get("rc:generation")
+        except Exception:
+            return "0"
+        return g.decode() if g else "0"
+
+
+def _make_backend():
+    if RESPONSE_CACHE_BACKEND == "off":
+        return None
+    if RESPONSE_CACHE_BACKEND == "redis":
+        try:
+            return RedisBackend(RESPONSE_CACHE_URL)
+        except ImportError:
+            log.warning("RESPONSE_CACHE_BACKEND=redis sans le paquet redis : cache mémoire")
+    return MemoryBackend(RESPONSE_CACHE_MAX_ENTRIES, RESPONSE_CACHE_MAX_BYTES)
+
+
+class ResponseCache:
+    def __init__(self, backend, ttl_s: int):
+        self.backend, self.ttl_s = backend, ttl_s
+        self.generation = "0"
+
+    @property
+    def enabled(self) -> bool:
+        return self.backend is not None
+
+    def key(self, route: str, params: dict) -> str:
+        # génération lue AVANT la requête SQL : une réponse calculée pendant une
+        # invalidation est rangée sous l'ancienne génération, jamais relue
+        return f"rc:{self.generation}:{route}?" + "&".join(f"{k}={params[k]}" for k in sorted(params))
+
+    def get(self, key: str) -> tuple[bytes, str] | None:
+        return self.backend.get(key) if self.backend else None
+
+    def set(self, key: str, body: bytes, etag: str):
+        if self.backend:
+            self.backend.set(key, body, etag, self.ttl_s)
+
+    def invalidate(self, generation: str):
+        self.generation = generation
+        if self.backend:
+            self.backend.clear(generation)
+
+    def resync(self):
+        """(Re)connexion du listener : des notifications ont pu être manquées."""
+        if self.backend:
+            self.invalidate(self.backend.generation())
+
+
+cache = ResponseCache(_make_backend(), RESPONSE_CACHE_TTL_S)
+
+
+def notify_catalogue_changed(db):
+    """À appeler dans la transaction d'écriture : le NOTIFY part au COMMIT (rien si rollback)."""
+    db.execute(text("SELECT pg_notify(:channel, :gen)"), {"channel": CATALOGUE_CHANNEL, "gen": uuid.uuid4().hex})
+
+
+def _on_catalogue_changed(generation: str):
+    # pas les flux .ics : les écritures qui les touchent notifient leurs participants
+    # (calendar_changed), une création ou une promotion ne change aucun flux
+    cache.invalidate(generation)
+
+
+class CatalogueListener:
+    """Thread LISTEN catalogue_changed + calendar_changed du worker, reconnexion automatique."""
+
+    def __init__(self, engine):
+        self.engine = engine
+        self._thread: threading.Thread | None = None
+        self._stop = threading.Event()
+
+    def _connect(self):
+        dialect = self.engine.dialect
+        cargs, cparams = dialect.create_connect_args(self.engine.url)
+        conn = dialect.connect(*cargs, **cparams)   # hors pool : connexion dédiée au LISTEN
+        conn.autocommit = True
+        with conn.cursor() as cur:
+            cur.execute(f"LISTEN {CATALOGUE_CHANNEL}")
+            cur.execute(f"LISTEN {calendar_feed.CALENDAR_CHANNEL}")
+        return conn
+
+    def _loop(self):
+        while not self._stop.is_set():
+            conn = None
+            try:
+                conn = self._connect()
+                # notifications perdues pendant la coupure : on repart d'un cache vide
+                cache.resync()
+                calendar_feed.invalidate_all()
+                while not self._stop.is_set():
+                    if select.select([conn], [], [], 1.0)[0]:
+                        conn.poll()
+                        last = None
+                        while conn.notifies:
+                            n = conn.notifies.pop(0)
+                            if n.channel == calendar_feed.CALENDAR_CHANNEL:
+                                calendar_feed.on_notify(n.payload)
+                            else:
+                                last = n.payload
+                        if last:
+                            _on_catalogue_changed(last)
+            except Exception:
+                log.warning("listener %s : reconnexion", CATALOGUE_CHANNEL, exc_info=True)
+                self._stop.wait(5)
+            finally:
+                if conn is not None:
+                    try:
+                        conn.close()
+                    except Exception:
+                        pass
+
+    def start(self):
+        # même sans cache de réponses : invalidation des flux .ics entre workers
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, name="catalogue-listener", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+
+listener = CatalogueListener(engine)
@@ -1,16 +1,23 @@
 # app/routes/admin.py
 from datetime import datetime, timedelta
-from typing import List, Optional
+from typing import List, Literal, Optional
 
-from fastapi import APIRouter, Depends, HTTPException, Query
-from fastapi.responses import StreamingResponse
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from fastapi.responses import StreamingResponse, FileResponse
 from sqlalchemy.orm import Session
-from sqlalchemy import func, case, desc, and_, or_, text
-from io import BytesIO, StringIO
-import zipfile, csv
-
-from app.database import SessionLocal
-from app import models, schemas
+from sqlalchemy import func, desc, and_, or_, select, tuple_
+
+from app.database import get_db, pool_status
+from app.db_router import get_read_db, read_router, pin_primary
+from app.query_stats import slow_log
+from app.profiling import list_profiles, profile_path
+from app.export import stream_zip, format_available, EXPORT_MAX_PARALLEL
+from app import models, schemas, admin_stats
+from app.tasks import daily_rollup
+from app.engagement import release_user
+from app import calendar_feed
+from app.response_cache import notify_catalogue_changed
+from app.pagination import encode_cursor, decode_cursor, NEXT_CURSOR_HEADER
 from app.auth import get_current_user  # on s'appuie dessus
 
 router = APIRouter(prefix="/admin", tags=["Admin"])
@@ -26,12 +33,6 @@ EXPORT_TABLES = [
     "weather_snapshots",
 ]
 
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
 
 def require_admin(me: models.Utilisateur = Depends(get_current_user)) -> models.Utilisateur:
     if not me or me.role != "admin":
@@ -40,133 +41,106 @@ def require_admin(me: models.Utilisateur = Depends(get_current_user)) -> models.
 
 @router.get("/stats/overview", response_model=schemas.AdminOverview)
 def admin_overview(
-    db: Session = Depends(get_db),
+    refresh: bool = Query(False, description="recalcule au lieu de servir le snapshot"),
+    db: Session = Depends(get_read_db),
     me: models.Utilisateur = Depends(require_admin),
 ):
-    now = datetime.utcnow()
-    d7  = now - timedelta(days=7)
-    d30 = now - timedelta(days=30)
+    return admin_stats.snapshot.get(db, force=refresh)["overview"]
 
-    users_total = db.query(func.count(models.Utilisateur.id)).scalar() or 0
-    users_new_7d = db.query(func.count(models.Utilisateur.id)).filter(models.Utilisateur.created_at >= d7).scalar() or 0
-    organizers = db.query(func.count(models.Utilisateur.id)).filter(models.Utilisateur.role == "organizer").scalar() or 0
-    admins     = db.query(func.count(models.Utilisateur.id)).filter(models.Utilisateur.role == "admin").scalar() or 0
-    premium_active = db.query(func.count(models.Utilisateur.id)).filter(models.Utilisateur.is_abonne == True).scalar() or 0
+@router.get("/stats/db-pool")
+def admin_db_pool(me: models.Utilisateur = Depends(require_admin)):
+    # état du pool de CE worker (chaque worker gunicorn a son propre pool)
+    return pool_status()
 
-    events_total = db.query(func.count(models.Evenement.id)).scalar() or 0
+@router.get("/stats/queries")
+def admin_query_stats(
+    limit: int = Query(50, ge=1, le=500),
+    me: models.Utilisateur = Depends(require_admin),
+):
+    # empreintes triées par temps cumulé + requêtes les plus lentes (worker courant)
+    return slow_log.snapshot(limit)
 
-    # prochain créneau (min(debut))
-    next_occ_sub = (
-        db.query(models.Occurrence.evenement_id, func.min(models.Occurrence.debut).label("next_debut"))
-          .group_by(models.Occurrence.evenement_id).subquery()
-    )
-    events_upcoming = (
-        db.query(func.count(models.Evenement.id))
-          .join(next_occ_sub, next_occ_sub.c.evenement_id == models.Evenement.id)
-          .filter(next_occ_sub.c.next_debut >= now)
-          .scalar() or 0
-    )
-    events_past = events_total - events_upcoming
-
-    # complétude contenu
-    with_img = db.query(func.count(models.Evenement.id)).filter(models.Evenement.image_url.isnot(None)).scalar() or 0
-    with_geo = db.query(func.count(models.Evenement.id)).filter(
-        models.Evenement.latitude.isnot(None), models.Evenement.longitude.isnot(None)
-    ).scalar() or 0
-    pct_img = round(100.0 * with_img / events_total, 1) if events_total else 0.0
-    pct_geo = round(100.0 * with_geo / events_total, 1) if events_total else 0.0
-
-    parts_total = db.query(func.count(models.Participation.id)).scalar() or 0
-    parts_7d = db.query(func.count(models.Participation.id)).filter(models.Participation.created_at >= d7).scalar() or 0
-
-    # note moyenne globale
-    row = db.query(func.avg(models.EventRating.rating), func.count(models.EventRating.id)).one()
-    rating_avg = float(row[0]) if row[0] is not None else None
-    rating_count = int(row[1] or 0)
-    rating_avg = round(rating_avg, 2) if rating_avg is not None else None
-
-    return schemas.AdminOverview(
-        users_total=users_total,
-        users_new_7d=users_new_7d,
-        organizers=organizers,
-        admins=admins,
-        premium_active=premium_active,
-        events_total=events_total,
-        events_upcoming=events_upcoming,
-        events_past=events_past,
-        events_with_image_pct=pct_img,
-        events_with_geo_pct=pct_geo,
-        participations_total=parts_total,
-        participations_7d=parts_7d,
-        rating_avg_global=rating_avg,
-        ratings_count=rating_count,
-    )
+@router.delete("/stats/queries")
+def admin_query_stats_reset(me: models.Utilisateur = Depends(require_admin)):
+    slow_log.reset()
+    return {"ok": True}
+
+@router.get("/profiles")
+def admin_profiles(me: models.Utilisateur = Depends(require_admin)):
+    # profils enregistrés via l'en-tête X-Profile (voir app/profiling.py)
+    return list_profiles()
+
+@router.get("/profiles/{profile_id}")
+def admin_profile_download(profile_id: str, me: models.Utilisateur = Depends(require_admin)):
+    path = profile_path(profile_id)
+    if not path:
+        raise HTTPException(status_code=404, detail="Profil introuvable")
+    return FileResponse(path, media_type="application/json",
+                        filename=f"{profile_id}.speedscope.json")
+
+@router.get("/stats/db-replicas")
+def admin_db_replicas(me: models.Utilisateur = Depends(require_admin)):
+    return read_router.status()
 
 @router.get("/stats/time-series", response_model=schemas.AdminTimeSeries)
 def admin_time_series(
-    days: int = Query(30, ge=1, le=180),
-    db: Session = Depends(get_db),
+    days: int = Query(30, ge=1, le=3650),
+    db: Session = Depends(get_read_db),
     me: models.Utilisateur = Depends(require_admin),
 ):
+    # jours clos : table daily_stats (1 ligne/jour) ; au-delà du dernier jour agrégé
+    # (aujourd'hui, nightly en retard, occurrences futures) : calcul direct
     now = datetime.utcnow()
-    since = now - timedelta(days=days)
-
-    def daily_counts(query_col):
-        rows = (
-            db.query(func.date_trunc('day', query_col).label('d'),
-                     func.count('*').label('c'))
-              .filter(query_col >= since)
-              .group_by(func.date_trunc('day', query_col))
-              .order_by('d')
-              .all()
-        )
-        return [{"date": r.d.date().isoformat(), "count": int(r.c)} for r in rows]
-
-    # Inscrits / Participations / Notes
-    users  = daily_counts(models.Utilisateur.created_at)
-    parts  = daily_counts(models.Participation.created_at)
-    ratings = daily_counts(models.EventRating.created_at)
-
-    # Événements : created_at si dispo, sinon approximation via les occurrences (min: leur présence par jour)
-    if hasattr(models.Evenement, "created_at"):
-        events = daily_counts(models.Evenement.created_at)
-    else:
-        rows = (
-            db.query(
-                func.date_trunc('day', models.Occurrence.debut).label('d'),
-                func.count(func.distinct(models.Occurrence.evenement_id)).label('c')
-            )
-            .filter(models.Occurrence.debut >= since)
-            .group_by(func.date_trunc('day', models.Occurrence.debut))
-            .order_by('d')
-            .all()
-        )
-        events = [{"date": r.d.date().isoformat(), "count": int(r.c)} for r in rows]
-
+    since = (now - timedelta(days=days)).date()
+    last = daily_rollup.last_rolled_day(db)
+    live_since = max(since, last + timedelta(days=1)) if last else since
+
+    series = {"users": {}, "events": {}, "participations": {}, "ratings": {}}
+    if last and last >= since:
+        for r in (db.query(models.DailyStat)
+                    .filter(models.DailyStat.day >= since, models.DailyStat.day <= last)
+                    .order_by(models.DailyStat.day)):
+            for key in series:
+                series[key][r.day] = getattr(r, key)
+
+    def live_counts(col, count_expr=None):
+        day = func.date_trunc('day', col)
+        rows = (db.query(day.label('d'), (count_expr if count_expr is not None else func.count('*')).label('c'))
+                  .filter(col >= live_since)
+                  .group_by(day)
+                  .all())
+        return {r.d.date(): int(r.c) for r in rows}
+
+    series["users"].update(live_counts(models.Utilisateur.created_at))
+    series["participations"].update(live_counts(models.Participation.created_at))
+    series["ratings"].update(live_counts(models.EventRating.created_at))
+    # événements : présence par jour via les occurrences (futur inclus)
+    series["events"].update(live_counts(models.Occurrence.debut,
+                                        func.count(func.distinct(models.Occurrence.evenement_id))))
+
+    points = lambda d: [{"date": k.isoformat(), "count": v} for k, v in sorted(d.items()) if v]
     return schemas.AdminTimeSeries(
-        users=users, events=events, participations=parts, ratings=ratings
+        users=points(series["users"]), events=points(series["events"]),
+        participations=points(series["participations"]), ratings=points(series["ratings"]),
     )
 
 
 @router.get("/top/events", response_model=schemas.AdminTopEvents)
 def admin_top_events(
     limit: int = Query(8, ge=1, le=50),
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     me: models.Utilisateur = Depends(require_admin),
 ):
-    # Top par participations
+    # Top par participations "going" : compteur maintenu + index (app/engagement.py)
     top_pop = (
         db.query(
             models.Evenement.id,
             models.Evenement.titre,
             models.Evenement.commune,
             models.Evenement.image_url,
-            func.count(models.Participation.id).label("pcount")
+            models.Evenement.going_count.label("pcount")
         )
-        .join(models.Occurrence, models.Occurrence.evenement_id == models.Evenement.id)
-        .join(models.Participation, models.Participation.occurrence_id == models.Occurrence.id, isouter=True)
-        .group_by(models.Evenement.id)
-        .order_by(desc("pcount"))
+        .order_by(models.Evenement.going_count.desc(), models.Evenement.id.desc())
         .limit(limit).all()
     )
 
@@ -204,88 +178,56 @@ def admin_top_events(
 
 @router.get("/content/quality", response_model=schemas.AdminContentQuality)
 def admin_content_quality(
-    db: Session = Depends(get_db),
+    refresh: bool = Query(False, description="recalcule au lieu de servir le snapshot"),
+    db: Session = Depends(get_read_db),
     me: models.Utilisateur = Depends(require_admin),
 ):
-    total = db.query(func.count(models.Evenement.id)).scalar() or 0
-
-    # image manquante (on compte aussi les vides)
-    missing_img = (
-        db.query(func.count(models.Evenement.id))
-        .filter(or_(
-            models.Evenement.image_url.is_(None),
-            func.length(func.trim(models.Evenement.image_url)) == 0
-        ))
-        .scalar() or 0
-    )
-
-
-    # géoloc manquante
-    missing_geo = (
-        db.query(func.count(models.Evenement.id))
-          .filter(or_(
-              models.Evenement.latitude.is_(None),
-              models.Evenement.longitude.is_(None)
-          ))
-          .scalar() or 0
-    )
-
-    missing_kw = (
-        db.query(func.count(models.Evenement.id))
-        .filter(or_(
-            models.Evenement.keywords.is_(None),
-            # si c'est un array -> on teste sa longueur, sinon on considère 0
-            case(
-                (func.jsonb_typeof(models.Evenement.keywords) == 'array',
-                func.jsonb_array_length(models.Evenement.keywords)),
-                else_=0
-            ) == 0
-        ))
-        .scalar() or 0
-    )
-
-    # événements sans occurrence
-    missing_occ = total - (
-        db.query(func.count(func.distinct(models.Occurrence.evenement_id))).scalar() or 0
-    )
-
-    return schemas.AdminContentQuality(
-        total_events=total,
-        missing_image=missing_img,
-        missing_geo=missing_geo,
-        missing_keywords=missing_kw,
-        missing_occurrences=missing_occ,
-    )
+    # même passage que /stats/overview (app/admin_stats.py)
+    return admin_stats.snapshot.get(db, force=refresh)["content_quality"]
 
 
 def _assert_admin(me: models.Utilisateur):
     if getattr(me, "role", "user") != "admin":
         raise HTTPException(403, "Accès réservé à l’admin")
 
+def _search(q: str, *cols):
+    # ILIKE '%q%' servi par les index trigrammes (migrations/003) ; % et _ pris littéralement
+    like = "%" + q.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+    return or_(*(c.ilike(like, escape="\\") for c in cols))
+
 @router.get("/users", response_model=List[schemas.AdminUserRow])
 def list_users(
+    response: Response,
     q: Optional[str] = Query(None),
     page: int = Query(1, ge=1),
     per_page: int = Query(20, ge=1, le=100),
-    db: Session = Depends(get_db),
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor de la page précédente (remplace page)"),
+    db: Session = Depends(get_read_db),
     me: models.Utilisateur = Depends(get_current_user),
 ):
     _assert_admin(me)
-    qs = db.query(models.Utilisateur)
+    U = models.Utilisateur
+    qs = db.query(U)
     if q:
-        like = f"%{q}%"
-        qs = qs.filter(or_(
-            models.Utilisateur.email.ilike(like),
-            models.Utilisateur.nom.ilike(like),
-            models.Utilisateur.role.ilike(like),
-        ))
-    rows = (qs.order_by(models.Utilisateur.created_at.desc())
-              .offset((page-1)*per_page).limit(per_page).all())
+        qs = qs.filter(_search(q, U.email, U.nom, U.role))
+    qs = qs.order_by(U.created_at.desc(), U.id.desc())
+    if cursor:
+        created_at, last_id = decode_cursor(cursor, 2)
+        try:
+            key = (datetime.fromisoformat(created_at), int(last_id))
+        except ValueError:
+            raise HTTPException(400, "Curseur invalide")
+        rows = qs.filter(tuple_(U.created_at, U.id) < key).limit(per_page).all()
+    else:
+        rows = qs.offset((page-1)*per_page).limit(per_page).all()
+    if len(rows) == per_page:
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor(rows[-1].created_at.isoformat(), rows[-1].id)
     return rows
 
 @router.delete("/users/{user_id}")
 def delete_user(
     user_id: int,
+    response: Response,
     db: Session = Depends(get_db),
     me: models.Utilisateur = Depends(get_current_user),
 ):
@@ -297,44 +239,49 @@ def delete_user(
     # Détacher la propriété des événements pour éviter la contrainte FK
     db.query(models.Evenement).filter(models.Evenement.owner_id == user_id)\
       .update({models.Evenement.owner_id: None})
+    release_user(db, user_id)  # ses participations partent en cascade : compteurs going
     db.delete(user)
+    notify_catalogue_changed(db)   # release_user retire ses notes des agrégats
+    calendar_feed.notify_changed(db, [user_id])
     db.commit()
+    calendar_feed.invalidate_user(user_id)
+    pin_primary(response, me.id)
     return {"ok": True}
 
 @router.get("/events", response_model=List[schemas.AdminEventRow])
 def list_events(
+    response: Response,
     q: Optional[str] = Query(None),
     page: int = Query(1, ge=1),
     per_page: int = Query(20, ge=1, le=100),
-    db: Session = Depends(get_db),
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor de la page précédente (remplace page)"),
+    db: Session = Depends(get_read_db),
     me: models.Utilisateur = Depends(get_current_user),
 ):
     _assert_admin(me)
     now = datetime.utcnow()
-    # Compte des occurrences à venir par événement
-    upcoming_cte = (
-        db.query(
-            models.Occurrence.evenement_id.label("ev_id"),
-            func.count(models.Occurrence.id).label("upcoming")
-        )
-        .filter(models.Occurrence.debut >= now)
-        .group_by(models.Occurrence.evenement_id)
-        .cte("upcoming_cte")
+    E, O = models.Evenement, models.Occurrence
+    # occurrences à venir des seuls événements de la page (index (evenement_id, debut))
+    upcoming = (
+        select(func.count(O.id))
+          .where(O.evenement_id == E.id, O.debut >= now)
+          .correlate(E)
+          .scalar_subquery()
     )
 
-    qs = (db.query(models.Evenement, func.coalesce(upcoming_cte.c.upcoming, 0))
-            .outerjoin(upcoming_cte, upcoming_cte.c.ev_id == models.Evenement.id))
-
+    qs = db.query(E, upcoming.label("upcoming"))
     if q:
-        like = f"%{q}%"
-        qs = qs.filter(or_(
-            models.Evenement.titre.ilike(like),
-            models.Evenement.commune.ilike(like),
-            models.Evenement.lieu.ilike(like),
-        ))
-
-    rows = (qs.order_by(models.Evenement.id.desc())
-              .offset((page-1)*per_page).limit(per_page).all())
+        qs = qs.filter(_search(q, E.titre, E.commune, E.lieu))
+    qs = qs.order_by(E.id.desc())
+    if cursor:
+        (last_id,) = decode_cursor(cursor, 1)
+        if not last_id.isdigit():
+            raise HTTPException(400, "Curseur invalide")
+        rows = qs.filter(E.id < int(last_id)).limit(per_page).all()
+    else:
+        rows = qs.offset((page-1)*per_page).limit(per_page).all()
+    if len(rows) == per_page:
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor(rows[-1][0].id)
 
     out = []
     for ev, upcoming in rows:
@@ -352,6 +299,7 @@ def list_events(
 @router.delete("/events/{event_id}")
 def delete_event(
     event_id: int,
+    response: Response,
     db: Session = Depends(get_db),
     me: models.Utilisateur = Depends(get_current_user),
 ):
@@ -359,46 +307,34 @@ def delete_event(
     ev = db.query(models.Evenement).get(event_id)
     if not ev:
         raise HTTPException(404, "Événement introuvable")
+    users = calendar_feed.participant_ids(db, [event_id])   # avant la cascade
     db.delete(ev)  # Occurrences/ratings/participations ont ondelete('CASCADE') ou cascade ORM
+    notify_catalogue_changed(db)
+    calendar_feed.notify_changed(db, users)
     db.commit()
+    for u in users:
+        calendar_feed.invalidate_user(u)
+    pin_primary(response, me.id)
     return {"ok": True}
 
 
 @router.get("/export.zip")
 def export_zip(
     tables: str | None = Query(None, description="Liste de tables séparées par des virgules"),
-    db: Session = Depends(get_db),
+    parallel: int = Query(1, ge=1, le=EXPORT_MAX_PARALLEL, description="tables lues en parallèle"),
+    format: Literal["csv", "parquet", "arrow"] = Query("csv", description="csv, ou colonnes typées (pyarrow)"),
     me: models.Utilisateur = Depends(get_current_user),
 ):
     # admin only
     if getattr(me, "role", "user") != "admin":
         raise HTTPException(403, "Accès réservé à l’admin")
+    if not format_available(format):
+        raise HTTPException(501, f"Format {format} indisponible : pyarrow n'est pas installé")
+
+    # tables inconnues ignorées (jamais de nom arbitraire dans le SQL)
+    wanted = [t.strip() for t in (tables.split(",") if tables else EXPORT_TABLES) if t.strip() in EXPORT_TABLES]
 
-    wanted = [t.strip() for t in (tables.split(",") if tables else EXPORT_TABLES) if t.strip()]
-    buf = BytesIO()
-
-    with zipfile.ZipFile(buf, "w", zipfile.ZIP_DEFLATED) as zf:
-        conn = db.connection()
-        for tab in wanted:
-            try:
-                res = conn.execute(text(f'SELECT * FROM "{tab}"'))  # guillemets → noms en snake_case OK
-            except Exception:
-                # si table inconnue, on l’ignore silencieusement
-                continue
-
-            cols = list(res.keys())
-            rows = res.fetchall()
-
-            sio = StringIO()
-            w = csv.writer(sio)
-            w.writerow(cols)
-            for r in rows:
-                # r est un Row ; list(r) respecte l’ordre des colonnes
-                w.writerow(list(r))
-            zf.writestr(f"{tab}.csv", sio.getvalue())
-
-    buf.seek(0)
     ts = datetime.utcnow().strftime("%Y%m%d_%H%M%S")
     filename = f"cultureradar_export_{ts}Z.zip"
     headers = {"Content-Disposition": f'attachment; filename="{filename}"'}
-    return StreamingResponse(buf, media_type="application/zip", headers=headers)
+    return StreamingResponse(stream_zip(wanted, format, parallel), media_type="application/zip", headers=headers)
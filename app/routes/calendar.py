@@ -0,0 +1,49 @@
+# app/routes/calendar.py
+import os
+from email.utils import parsedate_to_datetime
+
+from fastapi import APIRouter, Depends, Header, HTTPException, Response
+
+from app import models
+from app.auth import get_current_user
+from app.calendar_feed import feed_token, check_token, get_feed
+from app.database import SessionLocal
+from app.db_router import read_session
+from app.http_cache import etag_matches
+
+router = APIRouter(tags=["Calendrier"])
+API_PUBLIC_URL = os.getenv("API_PUBLIC_URL", "http://localhost:8000")
+
+
+@router.get("/me/calendar")
+def my_calendar_url(me: models.Utilisateur = Depends(get_current_user)):
+    # URL à coller dans Google Agenda / Calendrier Apple / Outlook (abonnement)
+    return {"url": f"{API_PUBLIC_URL}/calendar/{me.id}/{feed_token(me.id)}.ics"}
+
+
+def _not_modified(entry: dict, if_none_match: str | None, if_modified_since: str | None) -> bool:
+    if if_none_match:
+        return etag_matches(if_none_match, entry["etag"])
+    if if_modified_since:
+        try:
+            return int(parsedate_to_datetime(if_modified_since).timestamp()) >= entry["last_modified_ts"]
+        except (TypeError, ValueError):
+            return False
+    return False
+
+
+@router.get("/calendar/{user_id}/{token}.ics", include_in_schema=False)
+def calendar_feed(
+    user_id: int,
+    token: str,
+    if_none_match: str | None = Header(default=None),
+    if_modified_since: str | None = Header(default=None),
+):
+    if not check_token(user_id, token):
+        raise HTTPException(404, "Calendrier introuvable")
+    entry = get_feed(user_id, read_session, SessionLocal)   # cache du worker : pas de SQL si à jour
+    headers = {"ETag": entry["etag"], "Last-Modified": entry["last_modified"],
+               "Cache-Control": "private, max-age=60"}
+    if _not_modified(entry, if_none_match, if_modified_since):
+        return Response(status_code=304, headers=headers)
+    return Response(content=entry["body"], media_type="text/calendar; charset=utf-8", headers=headers)
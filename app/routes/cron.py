@@ -2,9 +2,7 @@
 from fastapi import APIRouter, Depends, Header, HTTPException
 from sqlalchemy.orm import Session
 import os
-from app.auth import get_db
-from import_openagenda import fetch_openagenda_events, upsert_events
-from app.tasks.daily_digest import run as run_digest
+from app.database import get_db
 
 router = APIRouter(prefix="/cron", tags=["Cron"])
 CRON_SECRET = os.getenv("CRON_SECRET")
@@ -15,13 +13,25 @@ def nightly(x_cron_key: str | None = Header(default=None),
     if not CRON_SECRET or x_cron_key != CRON_SECRET:
         raise HTTPException(status_code=401, detail="unauthorized")
 
+    # imports différés : requests/dateutil/smtplib ne pèsent pas sur le boot des workers
+    from import_openagenda import fetch_openagenda_events, upsert_events
+    from app.tasks.daily_digest import run as run_digest
+    from app.tasks.daily_rollup import run as run_rollup
+    from app.tasks.event_cards import run as run_cards
+
     # 1) sync OA
     events = fetch_openagenda_events()
-    sync_res = upsert_events(events)
+    sync_res = upsert_events(events)   # notifie lui-même les flux .ics touchés
 
     # 2) mails jour J (Europe/Paris)
     app_public = os.getenv("APP_PUBLIC_URL", "http://localhost:4200")
     digest_res = run_digest(db, app_public)
 
-    return {"sync": sync_res, "digest": digest_res}
+    # 3) rollup des séries admin (jours clos)
+    rollup_res = run_rollup(db)
+
+    # 4) cartes des listes absentes ou périmées (import, notes…)
+    cards_res = run_cards(db)
+
+    return {"sync": sync_res, "digest": digest_res, "rollup": rollup_res, "cards": cards_res}
 
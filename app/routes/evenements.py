@@ -2,39 +2,28 @@
 from typing import List, Optional
 from datetime import datetime, date, timedelta
 
-from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from fastapi import APIRouter, BackgroundTasks, Depends, Header, HTTPException, Query, Response
 from sqlalchemy.orm import Session, joinedload
-from sqlalchemy import asc, desc, or_, and_, func, case, literal, cast, Float
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import asc, desc, or_, and_, func, case, literal, cast, Float, select, tuple_
 import math
 
 
-from app.database import SessionLocal
+from app.database import get_db
+from app.db_router import get_async_read_db, pin_primary
 from app import models, schemas
-from app.auth import get_current_user  # nécessaire pour /reco
+from app.auth import get_current_user, get_current_user_async  # nécessaire pour /reco
+from app.engagement import upsert_rating
+from app.response_cache import cache as response_cache, notify_catalogue_changed
+from app.pagination import encode_cursor, decode_cursor, NEXT_CURSOR_HEADER
+from app import event_cards
+from app.http_cache import (EVENT_MAX_AGE_S, FEED_MAX_AGE_S, public_cache, is_promoted, event_etag,
+                            list_etag, etag_matches, not_modified, set_cache_headers)
 
 router = APIRouter(prefix="/evenements", tags=["Evenements"])
 
-def rating_stats_cte(db: Session):
-    return (
-        db.query(
-            models.EventRating.evenement_id.label("ev_id"),
-            func.avg(models.EventRating.rating).label("avg"),
-            func.count(models.EventRating.id).label("cnt"),
-        )
-        .group_by(models.EventRating.evenement_id)
-        .cte("rating_stats")
-    )
-
-
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
 @router.post("/", response_model=schemas.EvenementResponse)
-def create_evenement(evenement: schemas.EvenementCreate, db: Session = Depends(get_db)):
+def create_evenement(evenement: schemas.EvenementCreate, response: Response, db: Session = Depends(get_db)):
     ev = models.Evenement(**evenement.model_dump(exclude={"occurrences"}))
     db.add(ev)
     db.flush()  # pour avoir ev.id
@@ -45,12 +34,16 @@ def create_evenement(evenement: schemas.EvenementCreate, db: Session = Depends(g
             fin=occ.fin,
             all_day=occ.all_day,
         ))
+    event_cards.refresh(db, [ev.id])
+    notify_catalogue_changed(db)
     db.commit()
     db.refresh(ev)
+    pin_primary(response)
     return ev
 
 @router.get("", response_model=List[schemas.EvenementResponse])
-def list_evenements(
+async def list_evenements(
+    background_tasks: BackgroundTasks,
     q: Optional[str] = Query(None),
     city: Optional[str] = Query(None),
     date_from: Optional[date] = Query(None),
@@ -71,7 +64,8 @@ def list_evenements(
     per_page: int = Query(20, ge=1, le=100),
     limit: Optional[int] = Query(None, ge=1, le=100),
     offset: Optional[int] = Query(None, ge=0),
-    db: Session = Depends(get_db),
+    if_none_match: Optional[str] = Header(None),
+    db: AsyncSession = Depends(get_async_read_db),
 ):
     now = datetime.utcnow()
 
@@ -83,40 +77,56 @@ def list_evenements(
         offset_val = offset if offset is not None else 0
         limit_val = limit if limit is not None else per_page
 
-    # sous-requête: première occurrence dans la fenêtre
-    base_occ = db.query(
-        models.Occurrence.evenement_id.label("ev_id"),
-        func.min(models.Occurrence.debut).label("first_debut")
-    )
+    # sans filtre : page identique pour tous les anonymes → cache de réponses partagé
+    cache_key = None
+    if not any(v is not None for v in (q, city, date_from, date_to, hour_from, hour_to, lat, lon,
+                                       kw_any, kw_all, kw_none, age_min_lte, age_max_gte)):
+        cache_key = response_cache.key("/evenements", {"order": order, "future_only": future_only,
+                                                       "offset": offset_val, "limit": limit_val})
+        hit = response_cache.get(cache_key)
+        if hit:
+            return _cached_response(hit, if_none_match)
+
+    # fenêtre d'occurrences : sélection des événements ET occurrences renvoyées
+    occ_filters = []
     if date_from or date_to:
         start_dt = datetime.combine(date_from or date.today(), datetime.min.time())
         end_dt   = datetime.combine(date_to   or date.max,   datetime.max.time())
-        base_occ = base_occ.filter(models.Occurrence.debut >= start_dt,
-                                   models.Occurrence.debut <= end_dt)
+        occ_filters += [models.Occurrence.debut >= start_dt, models.Occurrence.debut <= end_dt]
     elif future_only:
-        base_occ = base_occ.filter(models.Occurrence.debut >= now)
+        occ_filters.append(models.Occurrence.debut >= now)
 
     # filtre heures locales
     if hour_from is not None and hour_to is not None:
         local_ts = func.timezone('Europe/Paris', func.timezone('UTC', models.Occurrence.debut))
         hr = func.extract("hour", local_ts)
         if hour_from <= hour_to:
-            base_occ = base_occ.filter(and_(hr >= hour_from, hr <= hour_to))
+            occ_filters.append(and_(hr >= hour_from, hr <= hour_to))
         else:
-            base_occ = base_occ.filter(or_(hr >= hour_from, hr <= hour_to))
+            occ_filters.append(or_(hr >= hour_from, hr <= hour_to))
 
-    occ_sub = base_occ.group_by(models.Occurrence.evenement_id).subquery()
+    # sous-requête: première occurrence dans la fenêtre
+    occ_sub = (
+        select(
+            models.Occurrence.evenement_id.label("ev_id"),
+            func.min(models.Occurrence.debut).label("first_debut")
+        )
+        .where(*occ_filters)
+        .group_by(models.Occurrence.evenement_id)
+        .subquery()
+    )
 
+    # colonnes + carte pré-rendue (app/event_cards.py) : pas d'entité ORM à hydrater
     qs = (
-        db.query(models.Evenement)
+        select(*event_cards.columns())
+          .select_from(models.Evenement)
           .join(occ_sub, occ_sub.c.ev_id == models.Evenement.id)
-          .options(joinedload(models.Evenement.occurrences))
     )
 
     # texte
     if q:
         like = f"%{q}%"
-        qs = qs.filter(
+        qs = qs.where(
             models.Evenement.titre.ilike(like) |
             models.Evenement.description.ilike(like) |
             models.Evenement.longdescription.ilike(like) |
@@ -128,7 +138,7 @@ def list_evenements(
     # ville
     if city:
         like_city = f"%{city}%"
-        qs = qs.filter(
+        qs = qs.where(
             or_(
                 models.Evenement.commune.ilike(like_city),
                 models.Evenement.lieu.ilike(like_city),
@@ -146,7 +156,7 @@ def list_evenements(
     if kw_all:
         kws = [_norm_kw(x) for x in kw_all if x]
         if kws:
-            qs = qs.filter(models.Evenement.keywords.contains(kws))
+            qs = qs.where(models.Evenement.keywords.contains(kws))
 
     if kw_any:
         cond = None
@@ -154,17 +164,17 @@ def list_evenements(
             clause = models.Evenement.keywords.contains([k])
             cond = clause if cond is None else (cond | clause)
         if cond is not None:
-            qs = qs.filter(cond)
+            qs = qs.where(cond)
 
     if kw_none:
         for k in ([_norm_kw(x) for x in kw_none if x] or []):
-            qs = qs.filter(~models.Evenement.keywords.contains([k]))
+            qs = qs.where(~models.Evenement.keywords.contains([k]))
 
     # tranche d’âge
     if age_min_lte is not None:
-        qs = qs.filter((models.Evenement.age_min == None) | (models.Evenement.age_min <= age_min_lte))
+        qs = qs.where((models.Evenement.age_min == None) | (models.Evenement.age_min <= age_min_lte))
     if age_max_gte is not None:
-        qs = qs.filter((models.Evenement.age_max == None) | (models.Evenement.age_max >= age_max_gte))
+        qs = qs.where((models.Evenement.age_max == None) | (models.Evenement.age_max >= age_max_gte))
 
     # distance (si lat/lon)
     if lat is not None and lon is not None:
@@ -173,7 +183,7 @@ def list_evenements(
         denom = max(0.00001, math.cos(math.radians(lat)) * 111.0)
         delta_lon = radius / denom
 
-        qs = qs.filter(
+        qs = qs.where(
             models.Evenement.latitude.isnot(None),
             models.Evenement.longitude.isnot(None),
             models.Evenement.latitude.between(lat - delta_lat, lat + delta_lat),
@@ -191,7 +201,7 @@ def list_evenements(
              math.cos(lat1) * func.cos(lat2) * func.pow(func.sin(dlon/2.0), 2))
         a_clamped = func.least(literal(1.0), func.greatest(literal(0.0), a))
         distance_km = 2.0 * R * func.asin(func.sqrt(a_clamped))
-        qs = qs.filter(distance_km <= radius)
+        qs = qs.where(distance_km <= radius)
 
     # ----- TRI: promus d'abord, puis date -----
     promo_flag = case(
@@ -202,35 +212,61 @@ def list_evenements(
     date_order = occ_sub.c.first_debut.desc().nulls_last() if order == "date_desc" \
                  else occ_sub.c.first_debut.asc().nulls_last()
 
-    # notes
-    stats = rating_stats_cte(db)
-    qs = qs.outerjoin(stats, stats.c.ev_id == models.Evenement.id) \
-           .order_by(desc(promo_flag), date_order)
+    qs = event_cards.join(qs).order_by(desc(promo_flag), date_order)
+    rows = (await db.execute(qs.offset(offset_val).limit(limit_val))).all()
+    return await _cards_response(db, rows, now, occ_filters, background_tasks, if_none_match, cache_key)
+
 
-    rows = qs.add_columns(stats.c.avg, stats.c.cnt) \
-             .offset(offset_val).limit(limit_val).all()
+async def _cards_response(db: AsyncSession, rows, now: datetime, occ_filters: list,
+                          background_tasks: BackgroundTasks, if_none_match: Optional[str],
+                          cache_key: Optional[str] = None, cache_control: Optional[str] = None) -> Response:
+    items, body, missing = await event_cards.assemble(db, rows, now, occ_filters)
+    if missing:
+        background_tasks.add_task(event_cards.refresh_ids, missing)
+    # page identique (mêmes événements, mêmes versions) → 304
+    etag = list_etag(items)
+    cache_control = cache_control or public_cache(FEED_MAX_AGE_S)
+    if cache_key:
+        response_cache.set(cache_key, body, etag)
+    if etag_matches(if_none_match, etag):
+        return not_modified(etag, cache_control)
+    return Response(content=body, media_type="application/json",
+                    headers={"ETag": etag, "Cache-Control": cache_control})
 
-    out = []
-    for ev, avg, cnt in rows:
-        ev.rating_average = float(avg) if avg is not None else None
-        ev.rating_count = int(cnt or 0)
-        ev.is_promoted = bool(getattr(ev, "promoted_until", None) and ev.promoted_until >= now)
-        out.append(ev)
-    return out
+
+def _cached_response(hit: tuple[bytes, str], if_none_match: Optional[str]) -> Response:
+    body, etag = hit
+    cache_control = public_cache(FEED_MAX_AGE_S)
+    if etag_matches(if_none_match, etag):
+        return not_modified(etag, cache_control)
+    return Response(content=body, media_type="application/json",
+                    headers={"ETag": etag, "Cache-Control": cache_control})
 
 
 
 # ---------- HOME 
 @router.get("/home", response_model=List[schemas.EvenementResponse])
-def home_events(limit: int = 20, offset: int = 0, db: Session = Depends(get_db)):
+async def home_events(
+    background_tasks: BackgroundTasks,
+    limit: int = 20,
+    offset: int = 0,
+    if_none_match: Optional[str] = Header(None),
+    db: AsyncSession = Depends(get_async_read_db),
+):
+    cache_key = None
+    if limit <= 100:
+        cache_key = response_cache.key("/evenements/home", {"limit": limit, "offset": offset})
+        hit = response_cache.get(cache_key)
+        if hit:
+            return _cached_response(hit, if_none_match)
+
     now = datetime.utcnow()
     next_occ = (
-        db.query(models.Occurrence.evenement_id, func.min(models.Occurrence.debut).label("next_debut"))
-        .filter(models.Occurrence.debut >= now)
+        select(models.Occurrence.evenement_id, func.min(models.Occurrence.debut).label("next_debut"))
+        .where(models.Occurrence.debut >= now)
         .group_by(models.Occurrence.evenement_id)
         .subquery()
     )
-    stats = rating_stats_cte(db)
 
     promo_flag = case(
         (and_(models.Evenement.promoted_until.isnot(None),
@@ -238,41 +274,37 @@ def home_events(limit: int = 20, offset: int = 0, db: Session = Depends(get_db))
         else_=0
     )
 
-    rows = (
-        db.query(models.Evenement, next_occ.c.next_debut, stats.c.avg, stats.c.cnt, promo_flag.label("pf"))
+    qs = (
+        select(*event_cards.columns())
+          .select_from(models.Evenement)
           .join(next_occ, next_occ.c.evenement_id == models.Evenement.id)
-          .outerjoin(stats, stats.c.ev_id == models.Evenement.id)
-          .options(joinedload(models.Evenement.occurrences))
+    )
+    rows = (await db.execute(
+        event_cards.join(qs)
           .order_by(desc(promo_flag), next_occ.c.next_debut.asc())
           .offset(offset).limit(limit)
-          .all()
-    )
-    out = []
-    for ev, _, avg, cnt, _pf in rows:
-        ev.rating_average = float(avg) if avg is not None else None
-        ev.rating_count = int(cnt or 0)
-        ev.is_promoted = bool(getattr(ev, "promoted_until", None) and ev.promoted_until >= now)
-        out.append(ev)
-    return out
+    )).all()
+    return await _cards_response(db, rows, now, [models.Occurrence.debut >= now], background_tasks,
+                                 if_none_match, cache_key)
 
 
 @router.get("/reco", response_model=List[schemas.EvenementResponse])
-def recommended_events(
+async def recommended_events(
+    background_tasks: BackgroundTasks,
     limit: int = 20,
     offset: int = 0,
-    db: Session = Depends(get_db),
-    me: models.Utilisateur = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_read_db),
+    me: models.Utilisateur = Depends(get_current_user_async),
 ):
     now = datetime.utcnow()
 
-    top_prefs = (
-        db.query(models.UserKeywordPref)
-          .filter(models.UserKeywordPref.user_id == me.id)
+    top_prefs = (await db.scalars(
+        select(models.UserKeywordPref)
+          .where(models.UserKeywordPref.user_id == me.id)
           .order_by(models.UserKeywordPref.score.desc(),
                     models.UserKeywordPref.updated_at.desc())
           .limit(20)
-          .all()
-    )
+    )).all()
     total_weight = sum((p.score or 1) for p in top_prefs) or 1
     score_expr = literal(0, type_=Float)
     for pref in top_prefs:
@@ -283,29 +315,29 @@ def recommended_events(
         )
 
     next_occ = (
-        db.query(models.Occurrence.evenement_id,
-                 func.min(models.Occurrence.debut).label("next_debut"))
-        .filter(models.Occurrence.debut >= now)
+        select(models.Occurrence.evenement_id,
+               func.min(models.Occurrence.debut).label("next_debut"))
+        .where(models.Occurrence.debut >= now)
         .group_by(models.Occurrence.evenement_id)
         .subquery()
     )
 
     qs = (
-        db.query(models.Evenement, next_occ.c.next_debut)
+        select(*event_cards.columns())
+          .select_from(models.Evenement)
           .join(next_occ, next_occ.c.evenement_id == models.Evenement.id)
     )
 
     going_ev_ids = (
-        db.query(models.Occurrence.evenement_id)
+        select(models.Occurrence.evenement_id)
           .join(models.Participation, models.Participation.occurrence_id == models.Occurrence.id)
-          .filter(models.Participation.user_id == me.id,
-                  models.Participation.status == "going")
-          .subquery()
+          .where(models.Participation.user_id == me.id,
+                 models.Participation.status == "going")
     )
-    qs = qs.filter(~models.Evenement.id.in_(going_ev_ids))
+    qs = qs.where(~models.Evenement.id.in_(going_ev_ids))
 
     if getattr(me, "age", None) is not None:
-        qs = qs.filter(
+        qs = qs.where(
             or_(models.Evenement.age_min == None, models.Evenement.age_min <= me.age),
             or_(models.Evenement.age_max == None, models.Evenement.age_max >= me.age),
         )
@@ -331,11 +363,10 @@ def recommended_events(
 
     distance_km_expr = literal(None, type_=Float)
     distance_score   = literal(0.0)
-    ctx = (
-        db.query(models.UserContext)
-          .filter(models.UserContext.user_id == me.id)
-          .first()
-    )
+    ctx = (await db.scalars(
+        select(models.UserContext)
+          .where(models.UserContext.user_id == me.id)
+    )).first()
     if ctx and ctx.home_lat is not None and ctx.home_lon is not None and getattr(me, "mobility", None):
         radius_by_mode = {"walk": 2.0, "bike": 8.0, "car": 40.0}
         radius = radius_by_mode.get(me.mobility, 40.0)
@@ -344,7 +375,7 @@ def recommended_events(
         denom = max(0.00001, math.cos(math.radians(ctx.home_lat)) * 111.0)
         delta_lon = radius / denom
 
-        qs = qs.filter(
+        qs = qs.where(
             models.Evenement.latitude.isnot(None),
             models.Evenement.longitude.isnot(None),
             models.Evenement.latitude.between(ctx.home_lat - delta_lat, ctx.home_lat + delta_lat),
@@ -368,21 +399,10 @@ def recommended_events(
     days_to = seconds_to / 86400.0
     decay = func.exp(-0.15 * func.greatest(0.0, days_to))
 
-    rating_cte = (
-        db.query(
-            models.EventRating.evenement_id.label("ev_id"),
-            func.avg(models.EventRating.rating).label("avg"),
-            func.count(models.EventRating.id).label("cnt"),
-        )
-        .group_by(models.EventRating.evenement_id)
-        .cte("rating_stats")
-    )
-    qs = qs.outerjoin(rating_cte, rating_cte.c.ev_id == models.Evenement.id)
-
-    score_rating = (
-        (func.coalesce(rating_cte.c.cnt, 0.0) / (func.coalesce(rating_cte.c.cnt, 0.0) + 10.0))
-        * (func.coalesce(rating_cte.c.avg, 0.0) / 5.0)
-    )
+    # agrégats de notes maintenus sur evenements (app/engagement.py)
+    r_cnt = cast(models.Evenement.rating_count, Float)
+    r_avg = cast(models.Evenement.rating_sum, Float) / func.nullif(r_cnt, 0.0)
+    score_rating = (r_cnt / (r_cnt + 10.0)) * (func.coalesce(r_avg, 0.0) / 5.0)
 
     # Bonus “promu”
     promo_flag = case(
@@ -402,61 +422,125 @@ def recommended_events(
         + (promo_flag * W_PROMO)       # 👈 prend la priorité
     )
 
-    rows = (
-        qs.add_columns(rating_cte.c.avg, rating_cte.c.cnt)
-          .options(joinedload(models.Evenement.occurrences))
+    rows = (await db.execute(
+        event_cards.join(qs)
           .order_by(desc(total_score), asc(next_occ.c.next_debut))
           .offset(offset).limit(limit)
-          .all()
-    )
-
-    out = []
-    for ev, _, avg, cnt in rows:
-        ev.rating_average = float(avg) if avg is not None else None
-        ev.rating_count = int(cnt or 0)
-        ev.is_promoted = bool(getattr(ev, "promoted_until", None) and ev.promoted_until >= now)
-        out.append(ev)
-    return out
+    )).all()
+    # personnalisé : pas de cache partagé
+    return await _cards_response(db, rows, now, [models.Occurrence.debut >= now], background_tasks, None,
+                                 cache_control="private, no-store")
 
 
 
 # ---------- PAR ID (paramétrique) ----------
 @router.get("/{event_id}", response_model=schemas.EvenementResponse)
-def get_evenement(event_id: int, db: Session = Depends(get_db)):
-    ev = (
-        db.query(models.Evenement)
+async def get_evenement(
+    event_id: int,
+    response: Response,
+    if_none_match: Optional[str] = Header(None),
+    db: AsyncSession = Depends(get_async_read_db),
+):
+    # version seule (PK) : 304 sans charger l'événement ni ses occurrences
+    head = (await db.execute(
+        select(models.Evenement.version, models.Evenement.promoted_until)
+          .where(models.Evenement.id == event_id)
+    )).first()
+    if not head:
+        raise HTTPException(404, "Événement introuvable")
+    etag = event_etag(event_id, head.version, is_promoted(head.promoted_until))
+    cache_control = public_cache(EVENT_MAX_AGE_S)
+    if etag_matches(if_none_match, etag):
+        return not_modified(etag, cache_control)
+
+    ev = (await db.scalars(
+        select(models.Evenement)
           .options(joinedload(models.Evenement.occurrences))
-          .filter(models.Evenement.id == event_id)
-          .first()
-    )
+          .where(models.Evenement.id == event_id)
+    )).unique().first()
     if not ev:
         raise HTTPException(404, "Événement introuvable")
+    ev.occurrences_total = len(ev.occurrences)
+    set_cache_headers(response, etag, cache_control)
     return ev
 
+
+@router.get("/{event_id}/occurrences", response_model=List[schemas.OccurrenceOut])
+async def list_event_occurrences(
+    event_id: int,
+    response: Response,
+    future_only: bool = Query(True),
+    limit: int = Query(50, ge=1, le=200),
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor de la page précédente"),
+    db: AsyncSession = Depends(get_async_read_db),
+):
+    """Planning complet d'un événement (les listes n'en renvoient que les premières dates)."""
+    exists = await db.scalar(select(models.Evenement.id).where(models.Evenement.id == event_id))
+    if not exists:
+        raise HTTPException(404, "Événement introuvable")
+
+    O = models.Occurrence
+    q = (select(O.id, O.debut, O.fin, O.all_day)
+           .where(O.evenement_id == event_id)
+           .order_by(O.debut.asc(), O.id.asc()))
+    if future_only:
+        q = q.where(O.debut >= datetime.utcnow())
+    if cursor:
+        debut, last_id = decode_cursor(cursor, 2)
+        try:
+            key = (datetime.fromisoformat(debut), int(last_id))
+        except ValueError:
+            raise HTTPException(400, "Curseur invalide")
+        q = q.where(tuple_(O.debut, O.id) > key)
+    rows = (await db.execute(q.limit(limit))).all()
+    if len(rows) == limit:
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor(rows[-1].debut.isoformat(), rows[-1].id)
+    return [dict(r._mapping) for r in rows]
+
+def _rating_average(rating_sum: int, rating_count: int) -> schemas.RatingAverage:
+    avg = rating_sum / rating_count if rating_count else None
+    return schemas.RatingAverage(average=round(avg, 3) if avg is not None else None, count=rating_count)
+
+
 @router.get("/{event_id}/ratings/avg", response_model=schemas.RatingAverage)
-def get_event_rating_average(event_id: int, db: Session = Depends(get_db)):
-    row = (
-        db.query(func.avg(models.EventRating.rating).label("avg"), func.count(models.EventRating.id))
-          .filter(models.EventRating.evenement_id == event_id)
-          .one()
+async def get_event_rating_average(event_id: int, db: AsyncSession = Depends(get_async_read_db)):
+    # agrégats maintenus par upsert_rating (app/engagement.py) : lecture d'une ligne
+    row = (await db.execute(
+        select(models.Evenement.rating_sum, models.Evenement.rating_count)
+          .where(models.Evenement.id == event_id)
+    )).first()
+    return _rating_average(row.rating_sum, row.rating_count) if row else schemas.RatingAverage()
+
+
+@router.get("/{event_id}/ratings/summary", response_model=schemas.RatingSummary)
+async def get_event_rating_summary(event_id: int, db: AsyncSession = Depends(get_async_read_db)):
+    """Moyenne, nombre d'avis, avis commentés et histogramme des étoiles en une requête."""
+    R = models.EventRating
+    stars = [func.count().filter(R.rating == i).label(f"s{i}") for i in range(1, 6)]
+    row = (await db.execute(
+        select(func.avg(R.rating).label("avg"), func.count().label("cnt"),
+               func.count().filter(func.length(func.trim(R.commentaire)) > 0).label("with_comments"), *stars)
+          .where(R.evenement_id == event_id)
+    )).one()
+    return schemas.RatingSummary(
+        average=round(float(row.avg), 3) if row.avg is not None else None,
+        count=row.cnt,
+        with_comments=row.with_comments,
+        histogram={i: row._mapping[f"s{i}"] for i in range(1, 6)},
     )
-    avg = float(row[0]) if row[0] is not None else None
-    count = int(row[1] or 0)
-    return schemas.RatingAverage(average=round(avg, 3) if avg is not None else None, count=count)
 
 
 @router.get("/{event_id}/ratings/me", responses={204: {"description": "No rating yet"}})
-def get_my_event_rating(
+async def get_my_event_rating(
     event_id: int,
-    db: Session = Depends(get_db),
-    me: models.Utilisateur = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_read_db),
+    me: models.Utilisateur = Depends(get_current_user_async),
 ):
-    r = (
-        db.query(models.EventRating)
-          .filter(models.EventRating.evenement_id == event_id,
-                  models.EventRating.user_id == me.id)
-          .first()
-    )
+    r = (await db.scalars(
+        select(models.EventRating)
+          .where(models.EventRating.evenement_id == event_id,
+                 models.EventRating.user_id == me.id)
+    )).first()
     if not r:
         return Response(status_code=204)   # 👈 pas d’erreur, juste “pas de contenu”
     return {"rating": r.rating, "commentaire": r.commentaire}
@@ -467,49 +551,34 @@ def get_my_event_rating(
 def upsert_my_event_rating(
     event_id: int,
     payload: schemas.RatingSet,
+    response: Response,
     db: Session = Depends(get_db),
     me: models.Utilisateur = Depends(get_current_user),
 ):
     # ⬅️ plus de vérification "événement passé + participation"
     # Seule l'authentification est requise.
 
-    existing = (
-        db.query(models.EventRating)
-          .filter(models.EventRating.user_id == me.id,
-                  models.EventRating.evenement_id == event_id)
-          .first()
-    )
-    if existing:
-        existing.rating = int(payload.rating)
-        existing.commentaire = payload.commentaire
-        existing.updated_at = datetime.utcnow()
-    else:
-        db.add(models.EventRating(
-            user_id=me.id,
-            evenement_id=event_id,
-            rating=int(payload.rating),
-            commentaire=payload.commentaire,
-        ))
+    # INSERT … ON CONFLICT DO UPDATE + mise à jour des agrégats de l'événement, RETURNING
+    agg = upsert_rating(db, me.id, event_id, int(payload.rating), payload.commentaire)
+    if agg is None:
+        db.rollback()
+        raise HTTPException(404, "Événement introuvable")
+    event_cards.refresh(db, [event_id])   # version bumpée par les agrégats
+    notify_catalogue_changed(db)   # moyennes / nombres de notes des flux en cache
     db.commit()
-
-    row = (
-        db.query(func.avg(models.EventRating.rating).label("avg"),
-                 func.count(models.EventRating.id))
-          .filter(models.EventRating.evenement_id == event_id)
-          .one()
-    )
-    avg = float(row[0]) if row[0] is not None else None
-    count = int(row[1] or 0)
-    return schemas.RatingAverage(average=round(avg, 3) if avg is not None else None, count=count)
+    pin_primary(response, me.id)
+    return _rating_average(agg.rating_sum, agg.rating_count)
 
 
 @router.get("/{event_id}/ratings", response_model=List[schemas.RatingPublicOut])
-def list_event_reviews(
+async def list_event_reviews(
     event_id: int,
+    response: Response,
     page: int = Query(1, ge=1),
     per_page: int = Query(20, ge=1, le=100),
     include_empty: bool = Query(False, description="Inclure aussi les notes sans commentaire"),
-    db: Session = Depends(get_db),
+    if_none_match: Optional[str] = Header(None),
+    db: AsyncSession = Depends(get_async_read_db),
 ):
     """
     Retourne les avis (commentaire + note) d'un événement, avec le nom de l'utilisateur.
@@ -518,13 +587,18 @@ def list_event_reviews(
     - Pagination: page/per_page.
     """
 
-    # Vérifier existence de l'événement (optionnel mais propre)
-    exists = db.query(models.Evenement.id).filter(models.Evenement.id == event_id).first()
-    if not exists:
+    # Vérifier existence de l'événement ; sa version couvre aussi les avis (ETag)
+    version = await db.scalar(select(models.Evenement.version).where(models.Evenement.id == event_id))
+    if version is None:
         raise HTTPException(404, "Événement introuvable")
+    etag = event_etag(event_id, version, kind="ratings")
+    cache_control = public_cache(EVENT_MAX_AGE_S)
+    if etag_matches(if_none_match, etag):
+        return not_modified(etag, cache_control)
+    set_cache_headers(response, etag, cache_control)
 
     q = (
-        db.query(
+        select(
             models.EventRating.id.label("id"),
             models.EventRating.user_id.label("user_id"),
             models.Utilisateur.nom.label("user_nom"),
@@ -533,12 +607,12 @@ def list_event_reviews(
             models.EventRating.created_at.label("created_at"),
         )
         .join(models.Utilisateur, models.Utilisateur.id == models.EventRating.user_id)
-        .filter(models.EventRating.evenement_id == event_id)
+        .where(models.EventRating.evenement_id == event_id)
     )
 
     if not include_empty:
         # seulement les avis avec un commentaire non nul et non vide
-        q = q.filter(
+        q = q.where(
             models.EventRating.commentaire.isnot(None),
             func.length(func.trim(models.EventRating.commentaire)) > 0
         )
@@ -548,7 +622,7 @@ def list_event_reviews(
 
     # Pagination
     offset = (page - 1) * per_page
-    rows = q.offset(offset).limit(per_page).all()
+    rows = (await db.execute(q.offset(offset).limit(per_page))).all()
 
     # On retourne une liste de dicts prêts pour Pydantic
     return [
@@ -564,30 +638,23 @@ def list_event_reviews(
     ]
 
 @router.get("/{event_id}/ratings/counts")
-def count_event_reviews(
+async def count_event_reviews(
     event_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_read_db),
 ):
-    total = (
-        db.query(func.count(models.EventRating.id))
-          .filter(models.EventRating.evenement_id == event_id)
-          .scalar()
-    )
-    total_with_comments = (
-        db.query(func.count(models.EventRating.id))
-          .filter(
-              models.EventRating.evenement_id == event_id,
-              models.EventRating.commentaire.isnot(None),
-              func.length(func.trim(models.EventRating.commentaire)) > 0
-          )
-          .scalar()
-    )
-    return {"total": int(total or 0), "total_with_comments": int(total_with_comments or 0)}
+    row = (await db.execute(
+        select(models.Evenement.rating_count, models.Evenement.rating_comment_count)
+          .where(models.Evenement.id == event_id)
+    )).first()
+    if not row:
+        return {"total": 0, "total_with_comments": 0}
+    return {"total": row.rating_count, "total_with_comments": row.rating_comment_count}
 
 
 @router.post("/{event_id}/promote/boost30")
 def promote_boost30(
     event_id: int,
+    response: Response,
     db: Session = Depends(get_db),
     me: models.Utilisateur = Depends(get_current_user),
 ):
@@ -606,7 +673,11 @@ def promote_boost30(
     # Activer l’offre: 7 jours de boost, plan 'BOOST30'
     ev.promoted_until = datetime.utcnow() + timedelta(days=7)
     ev.promoted_plan = "BOOST30"
-    db.add(ev); db.commit(); db.refresh(ev)
+    db.add(ev)
+    event_cards.refresh(db, [ev.id])
+    notify_catalogue_changed(db)   # tri "promus d'abord" des flux
+    db.commit(); db.refresh(ev)
+    pin_primary(response, me.id)
 
     # Pour confort front: renvoyer un flag
     return {
@@ -3,16 +3,12 @@ from fastapi import APIRouter, Depends, Query
 from sqlalchemy.orm import Session, joinedload
 from sqlalchemy import func, case, desc, asc
 from datetime import datetime, timedelta
-from app.database import SessionLocal
+from app.database import get_db
 from app import models
 from app.auth import get_current_user
 
 router = APIRouter(prefix="/evenements", tags=["Evenements"])
 
-def get_db():
-    db = SessionLocal()
-    try: yield db
-    finally: db.close()
 
 def haversine_km(lat1, lon1, lat2, lon2):
     # approx SQL-friendly: 111km/deg + cos(lat) pour la lon
@@ -3,10 +3,10 @@ import secrets, hashlib, os
 from fastapi import APIRouter, Depends, HTTPException, status, Query
 from sqlalchemy.orm import Session
 
-from app.database import SessionLocal
+from app.database import get_db
 from app.models import Utilisateur,EmailVerificationToken
 from app.schemas import LoginRequest
-from app.auth import get_db, verify_password, create_access_token, get_current_user
+from app.auth import verify_password, create_access_token, get_current_user
 
 from datetime import datetime, timedelta, timezone
 from app.utils.email import send_email
@@ -0,0 +1,16 @@
+# app/routes/metrics.py
+import os, secrets
+
+from fastapi import APIRouter, Header, HTTPException, Response
+
+from app.metrics import render_latest
+
+router = APIRouter(tags=["Metrics"])
+METRICS_TOKEN = os.getenv("METRICS_TOKEN")  # optionnel : protège /metrics si exposé publiquement
+
+@router.get("/metrics", include_in_schema=False)
+async def metrics(authorization: str | None = Header(default=None)):
+    if METRICS_TOKEN and not secrets.compare_digest(authorization or "", f"Bearer {METRICS_TOKEN}"):
+        raise HTTPException(status_code=401, detail="unauthorized")
+    body, content_type = render_latest()
+    return Response(content=body, media_type=content_type)
@@ -1,19 +1,19 @@
 # app/routes/organizer.py
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from datetime import datetime
+
+from fastapi import APIRouter, Depends, HTTPException, Response, status
+from sqlalchemy.orm import Session, selectinload
 from sqlalchemy import func
-from app.database import SessionLocal
+from app.database import get_db
+from app.db_router import pin_primary
+from app import calendar_feed
+from app.response_cache import notify_catalogue_changed
+from app import event_cards
 from app import models, schemas
 from app.auth import require_organizer
 
 router = APIRouter(prefix="/organizer", tags=["Organisateur"])
 
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
 
 @router.get("/events", response_model=list[schemas.EvenementResponse])
 def list_my_events(
@@ -33,13 +33,60 @@ def list_my_events(
         db.query(models.Evenement)
           .join(sub, sub.c.evenement_id == models.Evenement.id)
           .filter(models.Evenement.owner_id == me.id)
+          .options(selectinload(models.Evenement.occurrences))  # sinon 1 SELECT par event à la sérialisation
           .order_by(sub.c.first_debut.asc().nulls_last())
           .all()
     )
 
 
+@router.get("/events/stats", response_model=list[schemas.OrganizerEventStats])
+def my_events_stats(
+    db: Session = Depends(get_db),
+    me: models.Utilisateur = Depends(require_organizer),
+):
+    # une requête : compteurs going maintenus + agrégats occurrences / avis des events du compte
+    now = datetime.utcnow()
+    E, O, R = models.Evenement, models.Occurrence, models.EventRating
+    occ = (
+        db.query(O.evenement_id.label("ev_id"),
+                 func.count(O.id).label("n"),
+                 func.min(O.debut).filter(O.debut >= now).label("next_debut"))
+          .join(E, E.id == O.evenement_id)
+          .filter(E.owner_id == me.id)
+          .group_by(O.evenement_id)
+          .subquery()
+    )
+    rat = (
+        db.query(R.evenement_id.label("ev_id"),
+                 func.avg(R.rating).label("avg"),
+                 func.count(R.id).label("cnt"))
+          .join(E, E.id == R.evenement_id)
+          .filter(E.owner_id == me.id)
+          .group_by(R.evenement_id)
+          .subquery()
+    )
+    rows = (
+        db.query(E.id, E.titre, E.commune, E.image_url, E.going_count,
+                 occ.c.n, occ.c.next_debut, rat.c.avg, rat.c.cnt)
+          .outerjoin(occ, occ.c.ev_id == E.id)
+          .outerjoin(rat, rat.c.ev_id == E.id)
+          .filter(E.owner_id == me.id)
+          .order_by(occ.c.next_debut.asc().nulls_last(), E.id)
+          .all()
+    )
+    return [
+        schemas.OrganizerEventStats(
+            id=r.id, titre=r.titre, commune=r.commune, image_url=r.image_url,
+            occurrences_total=int(r.n or 0), next_debut=r.next_debut, going_count=r.going_count,
+            rating_average=round(float(r.avg), 2) if r.avg is not None else None,
+            rating_count=int(r.cnt or 0),
+        ) for r in rows
+    ]
+
+
 @router.post("/events", response_model=schemas.EvenementResponse, status_code=201)
 def create_event(body: schemas.EvenementCreate,
+                 response: Response,
                  db: Session = Depends(get_db),
                  me: models.Utilisateur = Depends(require_organizer)):
     ev = models.Evenement(**body.model_dump(exclude={"occurrences"}), owner_id=me.id)
@@ -51,13 +98,17 @@ def create_event(body: schemas.EvenementCreate,
             fin=occ.fin,
             all_day=occ.all_day,
         ))
+    event_cards.refresh(db, [ev.id])
+    notify_catalogue_changed(db)
     db.commit(); db.refresh(ev)
+    pin_primary(response, me.id)
     return ev
 
 
 
 @router.delete("/events/{event_id}", status_code=204)
 def delete_event(event_id: int,
+                 response: Response,
                  db: Session = Depends(get_db),
                  me: models.Utilisateur = Depends(require_organizer)):
     ev = (db.query(models.Evenement)
@@ -66,5 +117,12 @@ def delete_event(event_id: int,
             .first())
     if not ev:
         raise HTTPException(404, "Événement introuvable")
-    db.delete(ev); db.commit()
+    users = calendar_feed.participant_ids(db, [ev.id])   # avant la cascade
+    db.delete(ev)
+    notify_catalogue_changed(db)
+    calendar_feed.notify_changed(db, users)
+    db.commit()
+    for u in users:
+        calendar_feed.invalidate_user(u)
+    pin_primary(response, me.id)
 
@@ -2,13 +2,17 @@
 from datetime import datetime, timedelta, timezone
 from typing import List, Optional
 
-from fastapi import APIRouter, Depends, HTTPException, Query, status
-from sqlalchemy.orm import Session, joinedload
-from sqlalchemy import and_, or_
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
+from sqlalchemy.orm import Session
+from sqlalchemy import and_, or_, text, func, tuple_, literal_column
 
-from app.database import SessionLocal
+from app.database import get_db
+from app.db_router import pin_primary
 from app.auth import get_current_user
 from app import models, schemas
+from app.engagement import bump_going, bump_going_many
+from app.calendar_feed import invalidate_user as invalidate_calendar, notify_changed as notify_calendar
+from app.pagination import encode_cursor, decode_cursor, NEXT_CURSOR_HEADER
 
 router = APIRouter(prefix="/me/participations", tags=["Participations"])
 
@@ -17,53 +21,38 @@ def _as_naive_utc(dt):
         return None
     return dt.astimezone(timezone.utc).replace(tzinfo=None) if dt.tzinfo else dt
 
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
 
 def _norm_kw(s: str) -> str:
     return (s or "").strip().lower()
 
+# +1 par mot-clé (dédoublonné) si c'est la 1re participation du user à l'événement :
+# un seul aller-retour, sans course sur uq_user_keyword
+FIRST_TIME_KEYWORDS_SQL = text("""
+    INSERT INTO user_keyword_prefs (user_id, keyword, score, updated_at)
+    SELECT :user_id, kw, 1, now() AT TIME ZONE 'utc'
+    FROM unnest(CAST(:keywords AS text[])) AS kw
+    WHERE NOT EXISTS (
+        SELECT 1 FROM participations p JOIN occurrences o ON o.id = p.occurrence_id
+        WHERE p.user_id = :user_id AND o.evenement_id = :evenement_id
+    )
+    ON CONFLICT (user_id, keyword) DO UPDATE
+        SET score = user_keyword_prefs.score + 1, updated_at = EXCLUDED.updated_at
+""")
+
 def _increment_first_time_keywords(db: Session, user_id: int, event: models.Evenement):
     """
     Incrémente les compteurs de mots-clés UNIQUEMENT à la première participation
-    du user à CET événement.
+    du user à CET événement. À appeler avant d'écrire la participation.
     """
     if not event:
         return
-
-    
-    already = (
-        db.query(models.Participation)
-          .join(models.Occurrence, models.Occurrence.id == models.Participation.occurrence_id)
-          .filter(models.Participation.user_id == user_id,
-                  models.Occurrence.evenement_id == event.id)
-          .first()
-    )
-    if already:
-        return
-
     kws = event.keywords or []
     if not isinstance(kws, list) or not kws:
         return
-
-    # incrémenter chaque mot-clé
-    for kw in kws:
-        k = _norm_kw(kw)
-        if not k:
-            continue
-        pref = (db.query(models.UserKeywordPref)
-                  .filter(models.UserKeywordPref.user_id == user_id,
-                          models.UserKeywordPref.keyword == k)
-                  .first())
-        if pref:
-            pref.score = (pref.score or 0) + 1
-        else:
-            pref = models.UserKeywordPref(user_id=user_id, keyword=k, score=1)
-            db.add(pref)
+    keywords = list(dict.fromkeys(k for k in (_norm_kw(kw) for kw in kws) if k))
+    if keywords:
+        db.execute(FIRST_TIME_KEYWORDS_SQL,
+                   {"user_id": user_id, "evenement_id": event.id, "keywords": keywords})
 
 def _is_premium_active(u: models.Utilisateur) -> bool:
     if not getattr(u, "is_abonne", False):
@@ -73,47 +62,68 @@ def _is_premium_active(u: models.Utilisateur) -> bool:
         return False
     return datetime.utcnow() < (since + timedelta(days=30))
 
+def _mine_query(db: Session, user_id: int, future: bool, now: datetime):
+    P, O, E = models.Participation, models.Occurrence, models.Evenement
+    q = (
+        db.query(P)
+          .join(O, O.id == P.occurrence_id)
+          .join(E, E.id == O.evenement_id)
+          .filter(P.user_id == user_id, P.status == "going")
+    )
+    return q.filter(O.debut >= now) if future else q.filter(O.debut < now)
+
 @router.get("", response_model=List[schemas.ParticipationOut])
 def list_mine(
+    response: Response,
     future: bool = Query(True),
+    limit: Optional[int] = Query(None, ge=1, le=500, description="taille de page (sans : tout)"),
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor de la page précédente"),
     db: Session = Depends(get_db),
     me: models.Utilisateur = Depends(get_current_user),
 ):
     if not _is_premium_active(me):
         raise HTTPException(status_code=403, detail="subscription_required")
-    now = datetime.utcnow()
-    q = (
-        db.query(models.Participation)
-          .join(models.Occurrence, models.Occurrence.id == models.Participation.occurrence_id)
-          .join(models.Evenement, models.Evenement.id == models.Occurrence.evenement_id)
-          .options(
-              joinedload(models.Participation.occurrence)
-              .joinedload(models.Occurrence.evenement)
-          )
-          .filter(models.Participation.user_id == me.id,
-                  models.Participation.status == "going")
-    )
-    q = q.filter(models.Occurrence.debut >= now) if future else q.filter(models.Occurrence.debut < now)
-    rows = q.order_by(models.Occurrence.debut.asc()).all()
-
-    out: List[schemas.ParticipationOut] = []
-    for p in rows:
-        ev = p.occurrence.evenement
-        out.append(schemas.ParticipationOut(
-            id=p.id, status=p.status, created_at=p.created_at, updated_at=p.updated_at,
-            occurrence_id=p.occurrence.id,
-            occurrence_debut=p.occurrence.debut,
-            occurrence_fin=p.occurrence.fin,
-            occurrence_all_day=p.occurrence.all_day,
-            evenement_id=ev.id, evenement_titre=ev.titre,
-            evenement_commune=ev.commune, evenement_lieu=ev.lieu, image_url=ev.image_url,
-            evenement_keywords=ev.keywords or [],
-        ))
-    return out
+    P, O, E = models.Participation, models.Occurrence, models.Evenement
+    # projection étroite, libellés = champs de ParticipationOut (pas de graphe ORM,
+    # ni longdescription / accessibility…)
+    q = _mine_query(db, me.id, future, datetime.utcnow()).with_entities(
+        P.id, P.status, P.created_at, P.updated_at,
+        O.id.label("occurrence_id"), O.debut.label("occurrence_debut"),
+        O.fin.label("occurrence_fin"), O.all_day.label("occurrence_all_day"),
+        E.id.label("evenement_id"), E.titre.label("evenement_titre"),
+        E.commune.label("evenement_commune"), E.lieu.label("evenement_lieu"), E.image_url,
+        func.coalesce(E.keywords, literal_column("'[]'::jsonb")).label("evenement_keywords"),
+    ).order_by(O.debut.asc(), P.id.asc())
+
+    if cursor:
+        debut, last_id = decode_cursor(cursor, 2)
+        try:
+            key = (datetime.fromisoformat(debut), int(last_id))
+        except ValueError:
+            raise HTTPException(400, "Curseur invalide")
+        q = q.filter(tuple_(O.debut, P.id) > key)
+    if limit:
+        q = q.limit(limit)
+    rows = q.all()
+    if limit and len(rows) == limit:
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor(rows[-1].occurrence_debut.isoformat(), rows[-1].id)
+    return [dict(r._mapping) for r in rows]
+
+@router.get("/count")
+def count_mine(
+    future: bool = Query(True),
+    db: Session = Depends(get_db),
+    me: models.Utilisateur = Depends(get_current_user),
+):
+    if not _is_premium_active(me):
+        raise HTTPException(status_code=403, detail="subscription_required")
+    q = _mine_query(db, me.id, future, datetime.utcnow())
+    return {"count": q.with_entities(func.count(models.Participation.id)).scalar() or 0}
 
 @router.post("", status_code=status.HTTP_201_CREATED, response_model=schemas.ParticipationOut)
 def create_participation(
     body: schemas.ParticipationCreate,
+    response: Response,
     db: Session = Depends(get_db),
     me: models.Utilisateur = Depends(get_current_user),
 ):
@@ -121,25 +131,32 @@ def create_participation(
     if not occ:
         raise HTTPException(404, "Occurrence introuvable")
 
-    # upsert participation
+    # +1 mots-clés si 1re participation à cet EVÈNEMENT (avant l'écriture de la participation)
+    ev = db.query(models.Evenement).filter(models.Evenement.id == occ.evenement_id).first()
+    _increment_first_time_keywords(db, me.id, ev)
+
+    # upsert participation (ligne verrouillée : la transition de statut pilote les compteurs)
     p = (
         db.query(models.Participation)
           .filter(models.Participation.user_id == me.id,
                   models.Participation.occurrence_id == occ.id)
+          .with_for_update()
           .first()
     )
     if p:
+        delta = 0 if p.status == "going" else 1
         p.status = "going"
         db.add(p)
     else:
+        delta = 1
         p = models.Participation(user_id=me.id, occurrence_id=occ.id, status="going")
         db.add(p)
-
-    # +1 mots-clés si 1re participation à cet EVÈNEMENT
-    ev = db.query(models.Evenement).filter(models.Evenement.id == occ.evenement_id).first()
-    _increment_first_time_keywords(db, me.id, ev)
+    bump_going(db, occ.id, occ.evenement_id, delta)
+    notify_calendar(db, [me.id])   # flux .ics des autres workers
 
     db.commit(); db.refresh(p)
+    invalidate_calendar(me.id)
+    pin_primary(response, me.id)
 
     return schemas.ParticipationOut(
         id=p.id, status=p.status, created_at=p.created_at, updated_at=p.updated_at,
@@ -149,9 +166,101 @@ def create_participation(
         evenement_keywords=ev.keywords or [],
     )
 
+# mots-clés des événements touchés pour la 1re fois : +n par mot-clé (n = nb d'événements)
+BATCH_KEYWORDS_SQL = text("""
+    INSERT INTO user_keyword_prefs (user_id, keyword, score, updated_at)
+    SELECT :user_id, k.keyword, k.inc, now() AT TIME ZONE 'utc'
+    FROM unnest(CAST(:keywords AS text[]), CAST(:incs AS integer[])) AS k(keyword, inc)
+    ON CONFLICT (user_id, keyword) DO UPDATE
+        SET score = user_keyword_prefs.score + EXCLUDED.score, updated_at = EXCLUDED.updated_at
+""")
+
+# statut précédent lu par l'upsert lui-même (et non par un SELECT … FOR UPDATE, qui ne
+# verrouille pas les lignes encore absentes) : deux lots concurrents sur le même
+# (user, occurrence) sont sérialisés par ON CONFLICT, un seul voit la création.
+# - ligne renvoyée avec inserted (xmax = 0) : création, pas de statut précédent ;
+# - ligne renvoyée sinon : le statut a changé (clause WHERE), donc précédent = l'autre
+#   statut (going / cancelled) ;
+# - ligne non renvoyée : statut déjà à jour, ou annulation sans participation.
+BATCH_UPSERT_SQL = text("""
+    INSERT INTO participations (user_id, occurrence_id, status, created_at, updated_at)
+    SELECT :user_id, u.occurrence_id, u.status, now() AT TIME ZONE 'utc', now() AT TIME ZONE 'utc'
+    FROM unnest(CAST(:occurrence_ids AS integer[]), CAST(:statuses AS text[])) AS u(occurrence_id, status)
+    WHERE u.status = 'going' OR EXISTS (
+        SELECT 1 FROM participations p WHERE p.user_id = :user_id AND p.occurrence_id = u.occurrence_id)
+    ON CONFLICT (user_id, occurrence_id) DO UPDATE
+        SET status = EXCLUDED.status, updated_at = EXCLUDED.updated_at
+        WHERE participations.status IS DISTINCT FROM EXCLUDED.status
+    RETURNING id, occurrence_id, (xmax = 0) AS inserted
+""")
+
+@router.post("/batch", response_model=List[schemas.ParticipationBatchResult])
+def batch_participations(
+    body: schemas.ParticipationBatch,
+    response: Response,
+    db: Session = Depends(get_db),
+    me: models.Utilisateur = Depends(get_current_user),
+):
+    """Applique N statuts (going / cancelled) en une transaction, requêtes ensemblistes."""
+    P, O, E = models.Participation, models.Occurrence, models.Evenement
+    wanted = {it.occurrence_id: it.status for it in body.items}   # doublons : le dernier gagne
+    ids = list(wanted)
+
+    occ_event = dict(db.query(O.id, O.evenement_id).filter(O.id.in_(ids)).all())
+
+    # 1re participation à un événement (tous statuts confondus, comme la route unitaire)
+    going_events = {occ_event[o] for o, st in wanted.items() if o in occ_event and st == "going"}
+    if going_events:
+        known = {ev_id for (ev_id,) in
+                 db.query(O.evenement_id).join(P, P.occurrence_id == O.id)
+                   .filter(P.user_id == me.id, O.evenement_id.in_(list(going_events)))
+                   .distinct().all()}
+        incs: dict[str, int] = {}
+        for (kws,) in db.query(E.keywords).filter(E.id.in_(list(going_events - known))).all():
+            if isinstance(kws, list):
+                for k in dict.fromkeys(k for k in (_norm_kw(kw) for kw in kws) if k):
+                    incs[k] = incs.get(k, 0) + 1
+        if incs:
+            db.execute(BATCH_KEYWORDS_SQL, {"user_id": me.id, "keywords": list(incs), "incs": list(incs.values())})
+
+    results: dict[int, dict] = {o: {"occurrence_id": o, "result": "not_found"} for o in ids if o not in occ_event}
+    to_write = {o: st for o, st in wanted.items() if o in occ_event}
+    occ_deltas, ev_deltas = {}, {}
+    if to_write:
+        written = db.execute(BATCH_UPSERT_SQL, {"user_id": me.id, "occurrence_ids": list(to_write),
+                                                "statuses": list(to_write.values())}).all()
+        for pid, occ_id, inserted in written:
+            st = to_write[occ_id]
+            # insert : +1 si going ; update : le statut a basculé, ±1
+            delta = (1 if st == "going" else 0) if inserted else (1 if st == "going" else -1)
+            occ_deltas[occ_id] = delta
+            ev_deltas[occ_event[occ_id]] = ev_deltas.get(occ_event[occ_id], 0) + delta
+            results[occ_id] = {"occurrence_id": occ_id, "result": "created" if inserted else "updated",
+                               "participation_id": pid, "status": st}
+        bump_going_many(db, occ_deltas, ev_deltas)
+
+        unchanged = [o for o in to_write if o not in results]
+        current = {
+            occ_id: (pid, st) for pid, occ_id, st in
+            db.query(P.id, P.occurrence_id, P.status)
+              .filter(P.user_id == me.id, P.occurrence_id.in_(unchanged)).all()
+        } if unchanged else {}
+        for occ_id in unchanged:
+            pid, st = current.get(occ_id, (None, None))
+            results[occ_id] = {"occurrence_id": occ_id, "result": "unchanged", "participation_id": pid, "status": st}
+
+    if occ_deltas:
+        notify_calendar(db, [me.id])
+    db.commit()
+    if occ_deltas:
+        invalidate_calendar(me.id)
+        pin_primary(response, me.id)
+    return [results[o] for o in ids]
+
 @router.delete("/{participation_id}", status_code=204)
 def cancel_participation(
     participation_id: int,
+    response: Response,
     db: Session = Depends(get_db),
     me: models.Utilisateur = Depends(get_current_user),
 ):
@@ -159,12 +268,18 @@ def cancel_participation(
         db.query(models.Participation)
           .filter(models.Participation.id == participation_id,
                   models.Participation.user_id == me.id)
+          .with_for_update()
           .first()
     )
     if not p:
         raise HTTPException(404, "Participation introuvable")
+    if p.status == "going":
+        bump_going(db, p.occurrence_id, p.occurrence.evenement_id, -1)
     p.status = "cancelled"
+    notify_calendar(db, [me.id])
     db.add(p); db.commit()
+    invalidate_calendar(me.id)
+    pin_primary(response, me.id)
 
 
 
@@ -10,7 +10,7 @@ from sqlalchemy.exc import IntegrityError
 from app.auth import get_current_user, hash_password
 from app.utils.email import send_email
 from app.utils.verification import make_verif_token, verification_email_html
-from app.database import SessionLocal
+from app.database import get_db
 from app import models, schemas
 
 APP_PUBLIC_URL = os.getenv("APP_PUBLIC_URL", "http://localhost:4200")
@@ -23,12 +23,6 @@ def _as_naive_utc(dt):
     # si aware -> convertir UTC puis enlever tzinfo
     return dt.astimezone(timezone.utc).replace(tzinfo=None) if dt.tzinfo else dt
 
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
 
 @router.get("/me", response_model=schemas.UtilisateurOut)
 def get_me(current_user: models.Utilisateur = Depends(get_current_user)):
@@ -1,8 +1,8 @@
 # app/routes/utils.py
 from fastapi import APIRouter, HTTPException, Query
-import requests
 from pydantic import BaseModel, EmailStr
 from app.utils.email import send_email
+from app.metrics import track_outbound
 import os
 
 router = APIRouter(prefix="/utils", tags=["Utils"])
@@ -17,13 +17,15 @@ class ContactIn(BaseModel):
 
 @router.get("/geocode")
 def geocode(q: str = Query(..., min_length=3)):
+    import requests  # différé (coût d'import au démarrage)
     url = "https://nominatim.openstreetmap.org/search"
     params = {"q": q, "format": "json", "limit": 1}
     headers = {"User-Agent": "CultureRadar/1.0"}
     try:
-        r = requests.get(url, params=params, headers=headers, timeout=6)
-        r.raise_for_status()
-        data = r.json()
+        with track_outbound("nominatim"):
+            r = requests.get(url, params=params, headers=headers, timeout=6)
+            r.raise_for_status()
+            data = r.json()
         if not data:
             raise HTTPException(404, "Adresse introuvable")
         item = data[0]
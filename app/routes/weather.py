@@ -1,15 +1,11 @@
 # app/routes/weather.py
 from fastapi import APIRouter, Depends, Query, HTTPException
 from sqlalchemy.orm import Session
-from app.database import SessionLocal
+from app.database import get_db
 from app.weather_client import fetch_and_cache_weather
 
 router = APIRouter(prefix="/weather", tags=["Weather"])
 
-def get_db():
-    db = SessionLocal()
-    try: yield db
-    finally: db.close()
 
 @router.get("")
 async def get_weather(lat: float = Query(..., ge=-90, le=90),
@@ -96,6 +96,11 @@ class RatingAverage(BaseModel):
     count: int = 0
 
 
+class RatingSummary(RatingAverage):
+    with_comments: int = 0
+    histogram: dict[int, int] = Field(default_factory=lambda: {i: 0 for i in range(1, 6)})  # étoiles -> nombre
+
+
 class RatingPublicOut(BaseModel):
     id: int
     user_id: int
@@ -139,6 +144,7 @@ class EvenementResponse(EvenementBase):
     id: int
     owner_id: Optional[int] = None
     occurrences: list[OccurrenceOut] = Field(default_factory=list)
+    occurrences_total: Optional[int] = None  # listes : occurrences bornées, total de la fenêtre ici
     rating_average: Optional[float] = None   # ← calculé côté service
     rating_count: int = 0                    # ← calculé côté service
 
@@ -154,6 +160,29 @@ class ParticipationBase(BaseModel):
 class ParticipationCreate(ParticipationBase):
     pass
 
+class ParticipationBatchItem(ParticipationBase):
+    status: Literal['going', 'cancelled'] = 'going'
+
+class ParticipationBatch(BaseModel):
+    items: List[ParticipationBatchItem] = Field(..., min_length=1, max_length=500)
+
+class ParticipationBatchResult(BaseModel):
+    occurrence_id: int
+    result: Literal['created', 'updated', 'unchanged', 'not_found']
+    participation_id: Optional[int] = None
+    status: Optional[str] = None
+
+class OrganizerEventStats(BaseModel):
+    id: int
+    titre: str
+    commune: Optional[str] = None
+    image_url: Optional[str] = None
+    occurrences_total: int = 0
+    next_debut: Optional[datetime] = None
+    going_count: int = 0
+    rating_average: Optional[float] = None
+    rating_count: int = 0
+
 class ParticipationOut(BaseModel):
     id: int
     status: str
@@ -195,6 +224,7 @@ class AdminOverview(BaseModel):
 
     rating_avg_global: Optional[float] = None
     ratings_count: int
+    computed_at: Optional[datetime] = None
 
 class AdminTimePoint(BaseModel):
     date: str
@@ -223,6 +253,7 @@ class AdminContentQuality(BaseModel):
     missing_geo: int
     missing_keywords: int
     missing_occurrences: int
+    computed_at: Optional[datetime] = None
 
 class AdminUserRow(BaseModel):
     id: int
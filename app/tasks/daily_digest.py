@@ -5,6 +5,7 @@ from collections import defaultdict
 from sqlalchemy.orm import Session
 from app.models import Participation, Occurrence, Evenement, Utilisateur
 from app.utils.email import send_email
+from app.metrics import track_job, count_job_items
 
 PARIS = ZoneInfo("Europe/Paris")
 
@@ -40,6 +41,12 @@ def _build_email(user: Utilisateur, items: list[tuple[Occurrence, Evenement]], a
     """
 
 def run(db: Session, app_public_url: str) -> dict:
+    with track_job("daily_digest"):
+        res = _run(db, app_public_url)
+    count_job_items("daily_digest", users_notified=res["users_notified"])
+    return res
+
+def _run(db: Session, app_public_url: str) -> dict:
     start_utc, end_utc, today_local = _paris_today_window_utc()
 
     q = (db.query(Participation, Occurrence, Evenement, Utilisateur)
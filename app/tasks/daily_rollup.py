@@ -0,0 +1,124 @@
+# app/tasks/daily_rollup.py
+"""Rollup quotidien des séries admin (table daily_stats, jours UTC).
+
+    python -m app.tasks.daily_rollup                         # nightly : jusqu'à hier
+    python -m app.tasks.daily_rollup backfill                # tout l'historique
+    python -m app.tasks.daily_rollup backfill --since 2023-01-01
+    python -m app.tasks.daily_rollup recompute --from 2024-03-01 --to 2024-03-31
+
+Chaque jour est recalculé en entier (INSERT … ON CONFLICT DO UPDATE) : relancer
+une plage est sans risque. Le nightly reprend REWIND_DAYS jours avant le dernier
+jour agrégé pour absorber les écritures tardives ; aujourd'hui (et le futur pour
+les occurrences) reste calculé en direct par /admin/stats/time-series.
+"""
+import argparse, sys
+from datetime import date, datetime, timedelta
+
+from sqlalchemy import text, func
+from sqlalchemy.orm import Session
+
+from app.models import DailyStat
+from app.metrics import track_job, count_job_items
+
+REWIND_DAYS = 2
+CHUNK_DAYS = 31   # transactions courtes pour les backfills de plusieurs années
+
+ROLLUP_SQL = text("""
+    INSERT INTO daily_stats (day, users, events, participations, ratings, computed_at)
+    SELECT d.day, COALESCE(u.c, 0), COALESCE(e.c, 0), COALESCE(p.c, 0), COALESCE(r.c, 0), now() AT TIME ZONE 'utc'
+    FROM (SELECT generate_series(CAST(:start AS date), CAST(:end AS date), interval '1 day')::date AS day) d
+    LEFT JOIN (SELECT created_at::date AS day, count(*) AS c FROM utilisateurs
+               WHERE created_at >= :start AND created_at < :end_excl GROUP BY 1) u ON u.day = d.day
+    LEFT JOIN (SELECT debut::date AS day, count(DISTINCT evenement_id) AS c FROM occurrences
+               WHERE debut >= :start AND debut < :end_excl GROUP BY 1) e ON e.day = d.day
+    LEFT JOIN (SELECT created_at::date AS day, count(*) AS c FROM participations
+               WHERE created_at >= :start AND created_at < :end_excl GROUP BY 1) p ON p.day = d.day
+    LEFT JOIN (SELECT created_at::date AS day, count(*) AS c FROM event_ratings
+               WHERE created_at >= :start AND created_at < :end_excl GROUP BY 1) r ON r.day = d.day
+    ON CONFLICT (day) DO UPDATE SET
+        users = EXCLUDED.users, events = EXCLUDED.events,
+        participations = EXCLUDED.participations, ratings = EXCLUDED.ratings,
+        computed_at = EXCLUDED.computed_at
+""")
+
+EARLIEST_SQL = text("""
+    SELECT min(d) FROM (
+        SELECT min(created_at) AS d FROM utilisateurs
+        UNION ALL SELECT min(debut) FROM occurrences
+        UNION ALL SELECT min(created_at) FROM participations
+        UNION ALL SELECT min(created_at) FROM event_ratings
+    ) x
+""")
+
+
+def _yesterday() -> date:
+    return datetime.utcnow().date() - timedelta(days=1)
+
+
+def rollup_range(db: Session, start: date, end: date) -> int:
+    """Recalcule [start, end] (inclus) par tranches de CHUNK_DAYS ; renvoie le nombre de jours."""
+    days = 0
+    cur = start
+    while cur <= end:
+        chunk_end = min(end, cur + timedelta(days=CHUNK_DAYS - 1))
+        db.execute(ROLLUP_SQL, {"start": cur, "end": chunk_end, "end_excl": chunk_end + timedelta(days=1)})
+        db.commit()
+        days += (chunk_end - cur).days + 1
+        cur = chunk_end + timedelta(days=1)
+    return days
+
+
+def last_rolled_day(db: Session) -> date | None:
+    return db.query(func.max(DailyStat.day)).scalar()
+
+
+def backfill(db: Session, since: date | None = None) -> dict:
+    if since is None:
+        earliest = db.execute(EARLIEST_SQL).scalar()
+        since = earliest.date() if earliest else _yesterday()
+    end = _yesterday()
+    return {"from": str(since), "to": str(end), "days": rollup_range(db, since, end) if since <= end else 0}
+
+
+def run(db: Session) -> dict:
+    """Nightly : agrège les jours manquants jusqu'à hier (backfill complet si la table est vide)."""
+    with track_job("daily_rollup"):
+        last = last_rolled_day(db)
+        if last is None:
+            res = backfill(db)
+        else:
+            start, end = last - timedelta(days=REWIND_DAYS), _yesterday()
+            res = {"from": str(start), "to": str(end), "days": rollup_range(db, start, end) if start <= end else 0}
+    count_job_items("daily_rollup", days=res["days"])
+    return res
+
+
+def main(argv=None):
+    from app.database import SessionLocal
+
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = ap.add_subparsers(dest="cmd")
+    b = sub.add_parser("backfill", help="agrège l'historique (depuis la 1re donnée par défaut)")
+    b.add_argument("--since", type=date.fromisoformat)
+    r = sub.add_parser("recompute", help="recalcule une plage de jours (incluse)")
+    r.add_argument("--from", dest="start", type=date.fromisoformat, required=True)
+    r.add_argument("--to", dest="end", type=date.fromisoformat, default=None)
+    args = ap.parse_args(argv)
+
+    db = SessionLocal()
+    try:
+        if args.cmd == "backfill":
+            res = backfill(db, args.since)
+        elif args.cmd == "recompute":
+            end = args.end or _yesterday()
+            res = {"from": str(args.start), "to": str(end), "days": rollup_range(db, args.start, end)}
+        else:
+            res = run(db)
+    finally:
+        db.close()
+    print(res)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
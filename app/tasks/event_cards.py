@@ -0,0 +1,44 @@
+# app/tasks/event_cards.py
+"""(Re)construit les cartes absentes ou périmées (app/event_cards.py).
+
+    python -m app.tasks.event_cards          # après déploiement / en nightly
+
+Par lots de REFRESH_BATCH événements, une transaction par lot. Sans ce passage
+les listes rendent les cartes manquantes à la volée : il évite seulement ce
+surcoût sur les premières requêtes.
+"""
+import sys
+
+from sqlalchemy.orm import Session
+
+from app.event_cards import refresh, stale_ids, REFRESH_BATCH
+from app.metrics import track_job, count_job_items
+
+
+def run(db: Session) -> dict:
+    n, last = 0, 0
+    with track_job("event_cards"):
+        while True:
+            ids = stale_ids(db, last, REFRESH_BATCH)
+            if not ids:
+                break
+            n += refresh(db, ids)
+            db.commit()
+            last = ids[-1]
+    count_job_items("event_cards", cards=n)
+    return {"cards": n}
+
+
+def main(argv=None):
+    from app.database import SessionLocal
+
+    db = SessionLocal()
+    try:
+        print(run(db))
+    finally:
+        db.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -2,7 +2,9 @@
 import smtplib, ssl
 from email.mime.text import MIMEText
 from email.utils import formataddr
-import os
+import logging, os
+
+from app.metrics import track_outbound
 
 SMTP_HOST = os.getenv("SMTP_HOST")
 SMTP_PORT = int(os.getenv("SMTP_PORT", "587"))
@@ -10,6 +12,9 @@ SMTP_USER = os.getenv("SMTP_USER")
 SMTP_PASS = os.getenv("SMTP_PASS")
 FROM_NAME = os.getenv("MAIL_FROM_NAME", "CultureRadar")
 FROM_EMAIL = os.getenv("MAIL_FROM_EMAIL", SMTP_USER)
+EMAIL_BACKEND = os.getenv("EMAIL_BACKEND", "smtp")  # "null" : aucun envoi (bench, dev)
+
+log = logging.getLogger(__name__)
 
 def send_email(to: str, subject: str, html: str):
     msg = MIMEText(html, "html", "utf-8")
@@ -17,8 +22,12 @@ def send_email(to: str, subject: str, html: str):
     msg["From"] = formataddr((FROM_NAME, FROM_EMAIL))
     msg["To"] = to
 
+    if EMAIL_BACKEND == "null":
+        log.debug("EMAIL_BACKEND=null, mail non envoyé à %s : %s", to, subject)
+        return
+
     context = ssl.create_default_context()
-    with smtplib.SMTP(SMTP_HOST, SMTP_PORT) as server:
+    with track_outbound("smtp"), smtplib.SMTP(SMTP_HOST, SMTP_PORT) as server:
         server.starttls(context=context)
         server.login(SMTP_USER, SMTP_PASS)
         server.sendmail(FROM_EMAIL, [to], msg.as_string())
@@ -1,11 +1,12 @@
 # app/services/weather_client.py
-import math
+import math, os
 from datetime import datetime, timezone
-import httpx
 from sqlalchemy.orm import Session
 from app import models
+from app.metrics import track_outbound
 
-OPEN_METEO_ENDPOINT = "https://api.open-meteo.com/v1/forecast"
+# surchargeable (bench : stub local, cf. bench/stubs.py)
+OPEN_METEO_ENDPOINT = os.getenv("OPEN_METEO_ENDPOINT", "https://api.open-meteo.com/v1/forecast")
 HOURLY = ["temperature_2m","precipitation","precipitation_probability","windspeed_10m"]
 
 def _round_to_hour_utc(dt: datetime) -> datetime:
@@ -32,10 +33,12 @@ async def fetch_and_cache_weather(db: Session, lat: float, lon: float) -> models
         "forecast_days": 1,
         "models": "meteofrance_arome,meteofrance_arpege"  # hints: FR high-res where dispo
     }
-    async with httpx.AsyncClient(timeout=10) as client:
-        r = await client.get(OPEN_METEO_ENDPOINT, params=params)
-        r.raise_for_status()
-        data = r.json()
+    import httpx  # différé : seul /weather en a besoin
+    with track_outbound("open_meteo"):
+        async with httpx.AsyncClient(timeout=10) as client:
+            r = await client.get(OPEN_METEO_ENDPOINT, params=params)
+            r.raise_for_status()
+            data = r.json()
 
     # on prend l’index correspondant à l’heure “courante” en Europe/Paris,
     # puis on enregistre la valeur (fallback index 0 si non trouvé).
@@ -0,0 +1,203 @@
+# bench/check_plans.py
+"""Garde-fou sur les plans d'exécution : échoue si une requête principale
+repasse en Seq Scan sur une table volumineuse.
+
+    python -m bench.check_plans --seed      # base VIDE dédiée : insère un gros jeu synthétique puis vérifie
+    python -m bench.check_plans             # vérifie sur la base courante (déjà peuplée)
+
+Code de sortie 1 si au moins une requête régresse (utilisable en CI).
+Les requêtes reprennent les filtres des routes (prochaine occurrence, exclusion
+/reco, digest, avis, promus, keywords, séries admin, tokens de vérification).
+"""
+import argparse, json, sys
+from datetime import datetime, timedelta
+
+from sqlalchemy import text
+
+from app.database import engine
+
+SEED_SQL = [
+    "SELECT setseed(0.42)",
+    """
+    INSERT INTO utilisateurs (nom, email, is_email_verified, mot_de_passe, created_at, role, is_abonne)
+    SELECT 'user ' || g, 'plan-user' || g || '@example.test', true, 'x',
+           now() - random() * interval '730 days',
+           CASE WHEN g % 50 = 0 THEN 'organizer' ELSE 'user' END, g % 10 = 0
+    FROM generate_series(1, :users) g
+    """,
+    """
+    INSERT INTO evenements (titre, description, source, keywords, latitude, longitude, commune, promoted_until)
+    SELECT 'Événement ' || g, 'description', 'plan-check',
+           CASE WHEN g % 1000 = 0 THEN jsonb_build_array(kw[1 + g % 12], 'harpe')
+                ELSE jsonb_build_array(kw[1 + g % 12], kw[1 + (g * 7) % 12]) END,
+           48.5 + random() * 0.6, 2.0 + random() * 0.8, 'Paris',
+           CASE WHEN g % 500 = 0 THEN now() + interval '3 days' END
+    FROM generate_series(1, :events) g,
+         (SELECT ARRAY['concert','exposition','theatre','cinema','danse','conference',
+                       'atelier','jazz','enfants','gratuit','musee','festival'] AS kw) k
+    """,
+    # ~8 % des occurrences dans le futur, comme un catalogue qui vit depuis 2 ans
+    """
+    INSERT INTO occurrences (evenement_id, debut, fin, all_day)
+    SELECT e.id, d, d + interval '2 hours', false
+    FROM evenements e,
+         LATERAL (SELECT now() - interval '700 days' + random() * interval '760 days' + s * interval '1 minute' AS d
+                  FROM generate_series(1, 3) s) x
+    """,
+    """
+    INSERT INTO participations (user_id, occurrence_id, status, created_at, updated_at)
+    SELECT u.min_id + floor(random() * u.n)::int, o.min_id + floor(random() * o.n)::int,
+           CASE WHEN random() < 0.85 THEN 'going' ELSE 'cancelled' END,
+           now() - random() * interval '730 days', now()
+    FROM generate_series(1, :participations) g,
+         (SELECT min(id) AS min_id, count(*) AS n FROM utilisateurs) u,
+         (SELECT min(id) AS min_id, count(*) AS n FROM occurrences) o
+    ON CONFLICT DO NOTHING
+    """,
+    """
+    INSERT INTO event_ratings (user_id, evenement_id, rating, commentaire, created_at, updated_at)
+    SELECT u.min_id + floor(random() * u.n)::int, e.min_id + floor(random() * e.n)::int,
+           1 + floor(random() * 5)::int, CASE WHEN random() < 0.3 THEN 'Super !' END,
+           now() - random() * interval '730 days', now()
+    FROM generate_series(1, :ratings) g,
+         (SELECT min(id) AS min_id, count(*) AS n FROM utilisateurs) u,
+         (SELECT min(id) AS min_id, count(*) AS n FROM evenements) e
+    ON CONFLICT DO NOTHING
+    """,
+    """
+    INSERT INTO email_verif_tokens (user_id, token_hash, expires_at)
+    SELECT u.min_id + (g % u.n), md5(g::text) || md5((g + 1)::text),
+           now() + CASE WHEN g % 20 = 0 THEN interval '-1 day' ELSE interval '1 day' END
+    FROM generate_series(1, :tokens) g, (SELECT min(id) AS min_id, count(*) AS n FROM utilisateurs) u
+    """,
+    "ANALYZE",
+]
+
+# nom -> (sql, tables qui ne doivent pas être lues en Seq Scan)
+QUERIES = {
+    "next_occurrence": (
+        "SELECT evenement_id, min(debut) FROM occurrences WHERE debut >= :now GROUP BY evenement_id",
+        {"occurrences"},
+    ),
+    "event_occurrences": (
+        "SELECT id, debut, fin FROM occurrences WHERE evenement_id = :ev_id ORDER BY debut",
+        {"occurrences"},
+    ),
+    "reco_going_exclusion": (
+        "SELECT o.evenement_id FROM occurrences o JOIN participations p ON p.occurrence_id = o.id "
+        "WHERE p.user_id = :user_id AND p.status = 'going'",
+        {"participations", "occurrences"},
+    ),
+    "daily_digest": (
+        "SELECT p.user_id, o.id FROM participations p JOIN occurrences o ON o.id = p.occurrence_id "
+        "WHERE p.status = 'going' AND o.debut >= :day_start AND o.debut < :day_end",
+        {"participations", "occurrences"},
+    ),
+    "event_reviews_page": (
+        "SELECT id, rating, commentaire FROM event_ratings WHERE evenement_id = :ev_id "
+        "ORDER BY created_at DESC LIMIT 20",
+        {"event_ratings"},
+    ),
+    "promoted_events": (
+        "SELECT id FROM evenements WHERE promoted_until >= :now",
+        {"evenements"},
+    ),
+    "keywords_contains": (
+        """SELECT id FROM evenements WHERE keywords @> '["harpe"]'::jsonb""",
+        {"evenements"},
+    ),
+    "admin_series_users": (
+        "SELECT date_trunc('day', created_at), count(*) FROM utilisateurs WHERE created_at >= :since GROUP BY 1",
+        {"utilisateurs"},
+    ),
+    "admin_series_participations": (
+        "SELECT date_trunc('day', created_at), count(*) FROM participations WHERE created_at >= :since GROUP BY 1",
+        {"participations"},
+    ),
+    "admin_series_ratings": (
+        "SELECT date_trunc('day', created_at), count(*) FROM event_ratings WHERE created_at >= :since GROUP BY 1",
+        {"event_ratings"},
+    ),
+    "admin_user_search": (
+        "SELECT id FROM utilisateurs WHERE email ILIKE '%user1234%' OR nom ILIKE '%user1234%' "
+        "OR role ILIKE '%user1234%'",
+        {"utilisateurs"},
+    ),
+    "admin_event_search": (
+        "SELECT id FROM evenements WHERE titre ILIKE '%nement 1234%' OR commune ILIKE '%nement 1234%' "
+        "OR lieu ILIKE '%nement 1234%'",
+        {"evenements"},
+    ),
+    "expired_verif_tokens": (
+        "SELECT id FROM email_verif_tokens WHERE expires_at < :now",
+        {"email_verif_tokens"},
+    ),
+}
+
+
+def seed(conn, events: int):
+    counts = {
+        "events": events,
+        "users": max(1000, events // 4),
+        "participations": events * 2,
+        "ratings": events,
+        "tokens": max(1000, events // 10),
+    }
+    for sql in SEED_SQL:
+        conn.execute(text(sql), {k: v for k, v in counts.items() if f":{k}" in sql})
+    conn.commit()
+
+
+def _seq_scans(plan: dict) -> set[str]:
+    found = set()
+    if plan.get("Node Type") == "Seq Scan":
+        found.add(plan.get("Relation Name"))
+    for child in plan.get("Plans", []) or []:
+        found |= _seq_scans(child)
+    return found
+
+
+def check(conn) -> dict:
+    now = datetime.utcnow()
+    ev_id = conn.execute(text("SELECT id FROM evenements ORDER BY id LIMIT 1 OFFSET 100")).scalar()
+    user_id = conn.execute(text("SELECT user_id FROM participations ORDER BY id LIMIT 1")).scalar()
+    params = {
+        "now": now, "ev_id": ev_id, "user_id": user_id,
+        "day_start": now.replace(hour=0, minute=0, second=0, microsecond=0),
+        "day_end": now.replace(hour=0, minute=0, second=0, microsecond=0) + timedelta(days=1),
+        "since": now - timedelta(days=30),
+    }
+    report = {}
+    for name, (sql, watched) in QUERIES.items():
+        plan = conn.execute(text("EXPLAIN (FORMAT JSON) " + sql),
+                            {k: v for k, v in params.items() if f":{k}" in sql}).scalar()
+        plan = plan if isinstance(plan, list) else json.loads(plan)
+        bad = sorted(_seq_scans(plan[0]["Plan"]) & watched)
+        report[name] = {"ok": not bad, "seq_scans": bad}
+    return report
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--seed", action="store_true", help="insère le jeu synthétique (base vide dédiée)")
+    ap.add_argument("--events", type=int, default=200_000)
+    args = ap.parse_args(argv)
+
+    with engine.connect() as conn:
+        if args.seed:
+            if conn.execute(text("SELECT count(*) FROM evenements")).scalar():
+                print("❌ --seed attend une base vide", file=sys.stderr)
+                return 2
+            seed(conn, args.events)
+        report = check(conn)
+
+    print(json.dumps(report, indent=2))
+    failed = [k for k, v in report.items() if not v["ok"]]
+    if failed:
+        print(f"❌ Seq Scan sur : {', '.join(failed)}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,90 @@
+# bench/export_formats.py
+"""Compare les formats de l'export admin : taille, temps d'export, temps de rechargement.
+
+    python -m bench.export_formats --tables evenements,occurrences --out export.json
+
+Exporte en process (app.export.stream_zip, même chemin que /admin/export.zip)
+dans un fichier temporaire pour chaque format, puis recharge chaque entrée avec
+pyarrow (csv.read_csv / parquet.read_table / ipc.open_file) : le rechargement
+mesuré est celui d'un analyste qui charge le zip dans un dataframe.
+"""
+import argparse, io, json, os, sys, tempfile, time, zipfile
+
+from app.export import stream_zip, format_available
+
+FORMATS = ["csv", "parquet", "arrow"]
+
+
+def _reload(path: str, fmt: str) -> dict:
+    import pyarrow as pa
+    import pyarrow.csv as pacsv
+    import pyarrow.parquet as pq
+
+    rows = {}
+    with zipfile.ZipFile(path) as zf:
+        for info in zf.infolist():
+            data = zf.read(info)
+            if fmt == "csv":
+                t = pacsv.read_csv(io.BytesIO(data))
+            elif fmt == "parquet":
+                t = pq.read_table(io.BytesIO(data))
+            else:
+                t = pa.ipc.open_file(pa.BufferReader(data)).read_all()
+            rows[info.filename] = t.num_rows
+    return rows
+
+
+def bench_format(tables: list[str], fmt: str, parallel: int) -> dict:
+    fd, path = tempfile.mkstemp(suffix=f".{fmt}.zip")
+    try:
+        t0 = time.perf_counter()
+        first_byte = None
+        with os.fdopen(fd, "wb") as f:
+            for chunk in stream_zip(tables, fmt, parallel):
+                if first_byte is None and chunk:
+                    first_byte = time.perf_counter() - t0
+                f.write(chunk)
+        export_s = time.perf_counter() - t0
+        size = os.path.getsize(path)
+        t0 = time.perf_counter()
+        rows = _reload(path, fmt)
+        reload_s = time.perf_counter() - t0
+    finally:
+        os.remove(path)
+    return {"size_bytes": size, "size_mb": round(size / 1e6, 2), "export_s": round(export_s, 3),
+            "first_byte_s": round(first_byte, 3) if first_byte is not None else None,
+            "reload_s": round(reload_s, 3), "rows": rows}
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--tables", default="evenements,occurrences,participations,event_ratings")
+    ap.add_argument("--format", action="append", choices=FORMATS)
+    ap.add_argument("--parallel", type=int, default=1)
+    ap.add_argument("--out")
+    args = ap.parse_args(argv)
+
+    if not format_available("parquet"):
+        print("❌ pyarrow requis (pip install pyarrow)", file=sys.stderr)
+        return 2
+    tables = [t.strip() for t in args.tables.split(",") if t.strip()]
+    report = {"tables": tables, "parallel": args.parallel, "formats": {}}
+    for fmt in args.format or FORMATS:
+        report["formats"][fmt] = bench_format(tables, fmt, args.parallel)
+        print(f"  {fmt:8s} {report['formats'][fmt]['size_mb']:>9} Mo  export={report['formats'][fmt]['export_s']}s"
+              f"  reload={report['formats'][fmt]['reload_s']}s", file=sys.stderr)
+
+    base = report["formats"].get("csv")
+    if base:
+        for fmt, res in report["formats"].items():
+            res["vs_csv"] = {k: round(res[k] / base[k], 3) if base[k] else None
+                             for k in ("size_bytes", "export_s", "reload_s")}
+    txt = json.dumps(report, indent=2)
+    if args.out:
+        open(args.out, "w").write(txt)
+    print(txt)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
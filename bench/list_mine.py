@@ -0,0 +1,131 @@
+# bench/list_mine.py
+"""Latence et mémoire de /me/participations pour un gros historique.
+
+    python -m bench.seed --scale 100k
+    python -m bench.list_mine --participations 5000 --out list_mine.json
+
+Complète les participations "going" de l'utilisateur de bench jusqu'à
+--participations (moitié passées, moitié à venir, compteurs going tenus à jour),
+l'active en premium, puis appelle la route en process (TestClient) :
+- full : tout l'historique d'un coup (comportement sans ?limit) ;
+- page : première page de --page-size ;
+- walk : toutes les pages via X-Next-Cursor.
+Pour chaque scénario : p50/p95/p99 sur --repeat appels et pic mémoire
+Python (tracemalloc) d'un appel.
+"""
+import argparse, json, sys, time, tracemalloc
+
+from sqlalchemy import text
+
+from bench.loadtest import summarize
+from bench.seed import BENCH_USER_EMAIL
+
+TOP_UP_SQL = text("""
+    WITH picked AS (
+        (SELECT id FROM occurrences WHERE debut >= now() AT TIME ZONE 'utc' ORDER BY random() LIMIT :half)
+        UNION
+        (SELECT id FROM occurrences WHERE debut < now() AT TIME ZONE 'utc' ORDER BY random() LIMIT :half)
+    ), ins AS (
+        INSERT INTO participations (user_id, occurrence_id, status, created_at, updated_at)
+        SELECT :user_id, id, 'going', now() AT TIME ZONE 'utc', now() AT TIME ZONE 'utc' FROM picked
+        ON CONFLICT (user_id, occurrence_id) DO NOTHING
+        RETURNING occurrence_id
+    ), occ AS (
+        UPDATE occurrences o SET going_count = o.going_count + 1
+        FROM ins WHERE o.id = ins.occurrence_id
+        RETURNING o.evenement_id
+    )
+    UPDATE evenements e SET going_count = e.going_count + x.n
+    FROM (SELECT evenement_id, count(*) AS n FROM occ GROUP BY evenement_id) x
+    WHERE e.id = x.evenement_id
+""")
+
+
+def prepare(engine, target: int) -> int:
+    with engine.begin() as conn:
+        user_id = conn.execute(text("SELECT id FROM utilisateurs WHERE email = :e"),
+                               {"e": BENCH_USER_EMAIL}).scalar()
+        if not user_id:
+            raise SystemExit("❌ base non seedée : lancer d'abord python -m bench.seed")
+        conn.execute(text("UPDATE utilisateurs SET is_abonne = true, premium_since = now() AT TIME ZONE 'utc' "
+                          "WHERE id = :id"), {"id": user_id})
+        have = conn.execute(text("SELECT count(*) FROM participations WHERE user_id = :id AND status = 'going'"),
+                            {"id": user_id}).scalar()
+        if have < target:
+            conn.execute(TOP_UP_SQL, {"user_id": user_id, "half": (target - have) // 2 + 1})
+    return user_id
+
+
+def _measure(call, repeat: int) -> dict:
+    tracemalloc.start()
+    call()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    latencies = []
+    t0 = time.perf_counter()
+    for _ in range(repeat):
+        tb = time.perf_counter()
+        rows = call()
+        latencies.append(time.perf_counter() - tb)
+    res = summarize(latencies, 0, time.perf_counter() - t0)
+    res.update({"rows": rows, "peak_mem_mb": round(peak / 1e6, 2)})
+    return res
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--participations", type=int, default=5000)
+    ap.add_argument("--page-size", type=int, default=50)
+    ap.add_argument("--repeat", type=int, default=20)
+    ap.add_argument("--out")
+    args = ap.parse_args(argv)
+
+    from fastapi.testclient import TestClient
+    from app.auth import create_access_token
+    from app.database import engine
+    from app.main import app
+
+    user_id = prepare(engine, args.participations)
+    headers = {"Authorization": f"Bearer {create_access_token(user_id)}"}
+
+    with TestClient(app) as client:
+        def get(params):
+            r = client.get("/me/participations", params=params, headers=headers)
+            r.raise_for_status()
+            return r
+
+        def full():
+            return sum(len(get({"future": f}).json()) for f in ("true", "false"))
+
+        def page():
+            return len(get({"future": "false", "limit": args.page_size}).json())
+
+        def walk():
+            n, cursor = 0, None
+            for f in ("true", "false"):
+                while True:
+                    params = {"future": f, "limit": args.page_size, **({"cursor": cursor} if cursor else {})}
+                    r = get(params)
+                    n += len(r.json())
+                    cursor = r.headers.get("X-Next-Cursor")
+                    if not cursor:
+                        break
+            return n
+
+        counts = {f: client.get("/me/participations/count", params={"future": f}, headers=headers).json()["count"]
+                  for f in ("true", "false")}
+        report = {"user_id": user_id, "counts": counts, "page_size": args.page_size, "scenarios": {
+            "full": _measure(full, args.repeat),
+            "page": _measure(page, args.repeat),
+            "walk": _measure(walk, max(1, args.repeat // 5)),
+        }}
+
+    txt = json.dumps(report, indent=2)
+    if args.out:
+        open(args.out, "w").write(txt)
+    print(txt)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,110 @@
+# bench/loadtest.py
+"""Charge HTTP simple : N clients concurrents, débit et latences (p50/p95/p99).
+
+    python -m bench.loadtest --base http://localhost:8000 --concurrency 500 \
+        --duration 30 --path /evenements --path /evenements/home --out async.json
+    python -m bench.loadtest --compare threadpool.json async.json
+
+Pour comparer au chemin threadpool, lancer le même scénario contre un serveur
+démarré sur une révision antérieure (routes sync) et passer les deux JSON à --compare.
+"""
+import argparse, asyncio, itertools, json, statistics, sys, time
+
+import httpx
+
+
+def percentile(values: list[float], p: float) -> float | None:
+    if not values:
+        return None
+    values = sorted(values)
+    k = max(0, min(len(values) - 1, int(round(p / 100.0 * (len(values) - 1)))))
+    return values[k]
+
+
+def summarize(latencies: list[float], errors: int, elapsed: float) -> dict:
+    n = len(latencies)
+    ms = lambda v: round(v * 1000, 2) if v is not None else None
+    return {
+        "requests": n,
+        "errors": errors,
+        "elapsed_s": round(elapsed, 3),
+        "rps": round(n / elapsed, 1) if elapsed else 0.0,
+        "p50_ms": ms(percentile(latencies, 50)),
+        "p95_ms": ms(percentile(latencies, 95)),
+        "p99_ms": ms(percentile(latencies, 99)),
+        "mean_ms": ms(statistics.fmean(latencies)) if latencies else None,
+    }
+
+
+async def run_load(base: str, paths: list[str], concurrency: int, duration: float,
+                   headers: dict | None = None, timeout: float = 30.0) -> dict:
+    """Envoie des GET en boucle sur `paths` (round-robin) pendant `duration` secondes."""
+    latencies: list[float] = []
+    errors = 0
+    cycle = itertools.cycle(paths)
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base, limits=limits, timeout=timeout, headers=headers) as client:
+        deadline = time.perf_counter() + duration
+
+        async def worker():
+            nonlocal errors
+            while time.perf_counter() < deadline:
+                path = next(cycle)
+                t0 = time.perf_counter()
+                try:
+                    r = await client.get(path)
+                    ok = r.status_code < 400
+                except httpx.HTTPError:
+                    ok = False
+                if ok:
+                    latencies.append(time.perf_counter() - t0)
+                else:
+                    errors += 1
+
+        t_start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - t_start
+    return summarize(latencies, errors, elapsed)
+
+
+def compare(a_path: str, b_path: str) -> dict:
+    return compare_summaries(json.load(open(a_path)), json.load(open(b_path)))
+
+
+def compare_summaries(a: dict, b: dict) -> dict:
+    out = {}
+    for key in ("rps", "p50_ms", "p95_ms", "p99_ms", "errors"):
+        va, vb = a.get(key), b.get(key)
+        ratio = round(vb / va, 3) if va and vb is not None else None
+        out[key] = {"a": va, "b": vb, "b_over_a": ratio}
+    return out
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--base", default="http://localhost:8000")
+    ap.add_argument("--path", action="append", default=[])
+    ap.add_argument("--concurrency", type=int, default=500)
+    ap.add_argument("--duration", type=float, default=30.0)
+    ap.add_argument("--token", help="Bearer token (routes authentifiées, ex. /evenements/reco)")
+    ap.add_argument("--out")
+    ap.add_argument("--compare", nargs=2, metavar=("A.json", "B.json"))
+    args = ap.parse_args(argv)
+
+    if args.compare:
+        print(json.dumps(compare(*args.compare), indent=2))
+        return 0
+
+    headers = {"Authorization": f"Bearer {args.token}"} if args.token else None
+    paths = args.path or ["/evenements", "/evenements/home"]
+    res = asyncio.run(run_load(args.base, paths, args.concurrency, args.duration, headers))
+    res.update({"paths": paths, "concurrency": args.concurrency})
+    txt = json.dumps(res, indent=2)
+    if args.out:
+        open(args.out, "w").write(txt)
+    print(txt)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
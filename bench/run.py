@@ -0,0 +1,265 @@
+# bench/run.py
+"""Suite de bench : scénarios HTTP + jobs (import OpenAgenda, digest), sortie JSON.
+
+    python -m bench.seed --scale 100k                 # une fois, base dédiée
+    python -m bench.run --out run-100k.json           # lance stub météo + uvicorn
+    python -m bench.run --base http://localhost:8000 --only evenements_mixed --only home
+    python -m bench.run --compare avant.json apres.json
+
+Chaque scénario rapporte débit (rps), p50/p95/p99, moyenne et erreurs (cf.
+bench/loadtest.summarize). Sans --base, le runner démarre le stub Open-Meteo
+(bench/stubs.py) et uvicorn avec OPEN_METEO_ENDPOINT pointé dessus. Les jobs
+tournent dans ce process, avec EMAIL_BACKEND=null (aucun mail envoyé) ; les
+événements importés par le bench sont supprimés à la fin.
+"""
+import argparse, asyncio, json, os, random, socket, subprocess, sys, threading, time
+from datetime import datetime
+
+# avant tout import de app.* : le digest ne doit jamais envoyer de mail
+os.environ.setdefault("EMAIL_BACKEND", "null")
+
+import httpx
+from sqlalchemy import text
+
+from bench.loadtest import compare_summaries, run_load, summarize
+from bench.seed import BENCH_ADMIN_EMAIL, BENCH_USER_EMAIL, KW_NAMES, COMMUNES, make_event, oa_payload
+from bench.stubs import serve as serve_weather_stub
+
+IMPORT_UID_PREFIX = "bench-import-"
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _dataset(conn) -> dict:
+    q = lambda sql: conn.execute(text(sql)).scalar()
+    return {
+        "events": q("SELECT count(*) FROM evenements"),
+        "max_event_id": q("SELECT max(id) FROM evenements") or 1,
+        "occurrences": q("SELECT count(*) FROM occurrences"),
+        "users": q("SELECT count(*) FROM utilisateurs"),
+        "admin_id": q(f"SELECT id FROM utilisateurs WHERE email = '{BENCH_ADMIN_EMAIL}'"),
+        "user_id": q(f"SELECT id FROM utilisateurs WHERE email = '{BENCH_USER_EMAIL}'"),
+    }
+
+
+def _evenements_paths(rng: random.Random, n: int) -> list[str]:
+    """Mélange des filtres de /evenements (texte, ville, dates, rayon, mots-clés, pagination)."""
+    paths = []
+    for _ in range(n):
+        params = []
+        r = rng.random()
+        if r < 0.2:
+            params.append(("q", rng.choice(["concert", "expo", "jazz", "atelier", "danse"])))
+        if rng.random() < 0.3:
+            params.append(("city", rng.choice(COMMUNES)[0]))
+        if rng.random() < 0.3:
+            d = datetime.utcnow().date()
+            params += [("date_from", d.isoformat()), ("date_to", d.replace(day=28).isoformat())]
+        if rng.random() < 0.25:
+            c = rng.choice(COMMUNES)
+            params += [("lat", c[2]), ("lon", c[3]), ("radius_km", rng.choice([2, 5, 10]))]
+        if rng.random() < 0.3:
+            params += [("kw_any", k) for k in rng.sample(KW_NAMES, 2)]
+        if rng.random() < 0.1:
+            params.append(("kw_all", rng.choice(KW_NAMES)))
+        if rng.random() < 0.1:
+            params.append(("kw_none", rng.choice(KW_NAMES)))
+        if rng.random() < 0.15:
+            params += [("hour_from", 18), ("hour_to", 23)]
+        params.append(("page", rng.choice([1, 1, 1, 2, 3, 10])))
+        params.append(("per_page", rng.choice([20, 50])))
+        paths.append("/evenements?" + str(httpx.QueryParams(params)))
+    return paths
+
+
+def scenarios(ds: dict, rng: random.Random) -> dict:
+    """nom -> {paths, auth (None/"user"/"admin"), concurrency (facteur), duration (facteur)}"""
+    ev = lambda: rng.randint(1, ds["max_event_id"])
+    coords = [(round(c[2] + rng.uniform(-0.02, 0.02), 3), round(c[3] + rng.uniform(-0.02, 0.02), 3))
+              for c in COMMUNES for _ in range(10)]
+    return {
+        "evenements_mixed": {"paths": _evenements_paths(rng, 200)},
+        "home": {"paths": [f"/evenements/home?offset={o}" for o in (0, 0, 0, 20, 40)]},
+        "event_detail": {"paths": [f"/evenements/{ev()}" for _ in range(200)]},
+        "reco": {"paths": ["/evenements/reco", "/evenements/reco?offset=20"], "auth": "user"},
+        "reco_context": {"paths": [f"/evenements/reco/context?lat={la}&lon={lo}" for la, lo in coords[:40]],
+                         "auth": "user"},
+        "weather": {"paths": [f"/weather?lat={la}&lon={lo}" for la, lo in coords]},
+        "ratings": {"paths": [p for _ in range(100) for p in
+                              (f"/evenements/{ev()}/ratings/avg", f"/evenements/{ev()}/ratings",
+                               f"/evenements/{ev()}/ratings/counts")]},
+        "ratings_me": {"paths": [f"/evenements/{ev()}/ratings/me" for _ in range(100)], "auth": "user"},
+        "admin_stats": {"paths": ["/admin/stats/overview", "/admin/stats/time-series?days=30",
+                                  "/admin/top/events", "/admin/content/quality"],
+                        "auth": "admin", "concurrency": 0.1},
+        "admin_export": {"paths": ["/admin/export.zip?tables=evenements,occurrences"],
+                         "auth": "admin", "concurrency": 0.02, "duration": 2.0},
+    }
+
+
+async def _http_scenarios(base: str, ds: dict, args) -> dict:
+    from app.auth import create_access_token
+
+    tokens = {"user": create_access_token(ds["user_id"]), "admin": create_access_token(ds["admin_id"])}
+    rng = random.Random(args.seed)
+    out = {}
+    for name, sc in scenarios(ds, rng).items():
+        if args.only and name not in args.only:
+            continue
+        auth = sc.get("auth")
+        headers = {"Authorization": f"Bearer {tokens[auth]}"} if auth else None
+        concurrency = max(1, int(args.concurrency * sc.get("concurrency", 1.0)))
+        duration = args.duration * sc.get("duration", 1.0)
+        res = await run_load(base, sc["paths"], concurrency, duration, headers, timeout=120.0)
+        res.update({"concurrency": concurrency, "distinct_paths": len(set(sc["paths"]))})
+        out[name] = res
+        print(f"  {name:18s} {res['rps']:>8} rps  p50={res['p50_ms']}  p95={res['p95_ms']}  "
+              f"p99={res['p99_ms']}  err={res['errors']}", file=sys.stderr)
+    return out
+
+
+def bench_importer(n_events: int, batch: int, seed_value: int) -> dict:
+    """Import de payloads OpenAgenda synthétiques : 1er passage (insert), 2e (mise à jour)."""
+    from import_openagenda import upsert_events
+
+    rng = random.Random(seed_value)
+    payloads = [oa_payload(make_event(rng, f"{IMPORT_UID_PREFIX}{i}")) for i in range(n_events)]
+    out = {}
+    for phase in ("importer_insert", "importer_update"):
+        latencies = []
+        t0 = time.perf_counter()
+        for i in range(0, len(payloads), batch):
+            tb = time.perf_counter()
+            upsert_events(payloads[i:i + batch])
+            latencies.append(time.perf_counter() - tb)
+        res = summarize(latencies, 0, time.perf_counter() - t0)
+        res.update({"batch": batch, "events": n_events,
+                    "events_per_s": round(n_events / res["elapsed_s"], 1) if res["elapsed_s"] else None})
+        out[phase] = res
+    return out
+
+
+def bench_digest(runs: int) -> dict:
+    from app.database import SessionLocal
+    from app.tasks.daily_digest import run as run_digest
+
+    latencies, notified = [], 0
+    t0 = time.perf_counter()
+    for _ in range(runs):
+        db = SessionLocal()
+        try:
+            tb = time.perf_counter()
+            notified = run_digest(db, "http://bench.invalid")["users_notified"]
+            latencies.append(time.perf_counter() - tb)
+        finally:
+            db.close()
+    res = summarize(latencies, 0, time.perf_counter() - t0)
+    res["users_notified"] = notified
+    return {"digest": res}
+
+
+def _cleanup_import(engine):
+    with engine.begin() as conn:
+        conn.execute(text("DELETE FROM evenements WHERE external_uid LIKE :p"), {"p": IMPORT_UID_PREFIX + "%"})
+
+
+def _spawn_server(workers: int, stub_latency_ms: float):
+    stub_port, app_port = _free_port(), _free_port()
+    stub = serve_weather_stub(stub_port, stub_latency_ms)
+    threading.Thread(target=stub.serve_forever, daemon=True).start()
+    env = {**os.environ, "OPEN_METEO_ENDPOINT": f"http://127.0.0.1:{stub_port}/v1/forecast"}
+    proc = subprocess.Popen([sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(app_port),
+                             "--workers", str(workers), "--log-level", "warning"], env=env)
+    base = f"http://127.0.0.1:{app_port}"
+    deadline = time.perf_counter() + 60
+    while time.perf_counter() < deadline:
+        try:
+            if httpx.get(base + "/ping", timeout=0.5).status_code == 200:
+                return base, proc, stub
+        except httpx.HTTPError:
+            pass
+        if proc.poll() is not None:
+            break
+        time.sleep(0.1)
+    proc.terminate()
+    stub.shutdown()
+    raise RuntimeError("uvicorn n'a pas démarré")
+
+
+def compare_runs(a: dict, b: dict) -> dict:
+    sa, sb = a.get("scenarios", {}), b.get("scenarios", {})
+    return {name: compare_summaries(sa[name], sb[name]) for name in sa if name in sb}
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--base", help="serveur existant (sinon uvicorn + stub météo lancés par le runner)")
+    ap.add_argument("--workers", type=int, default=1)
+    ap.add_argument("--concurrency", type=int, default=50)
+    ap.add_argument("--duration", type=float, default=15.0)
+    ap.add_argument("--only", action="append", help="scénario à lancer (répétable)")
+    ap.add_argument("--skip-jobs", action="store_true")
+    ap.add_argument("--import-events", type=int, default=2000)
+    ap.add_argument("--import-batch", type=int, default=200)
+    ap.add_argument("--digest-runs", type=int, default=5)
+    ap.add_argument("--stub-latency-ms", type=float, default=30.0)
+    ap.add_argument("--seed", type=int, default=42)
+    ap.add_argument("--out")
+    ap.add_argument("--compare", nargs=2, metavar=("A.json", "B.json"))
+    args = ap.parse_args(argv)
+
+    if args.compare:
+        a, b = (json.load(open(p)) for p in args.compare)
+        print(json.dumps(compare_runs(a, b), indent=2))
+        return 0
+
+    from app.database import engine
+
+    with engine.connect() as conn:
+        ds = _dataset(conn)
+    if not ds["user_id"] or not ds["admin_id"]:
+        print("❌ base non seedée : lancer d'abord python -m bench.seed", file=sys.stderr)
+        return 2
+
+    git_rev = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True).stdout.strip()
+    report = {
+        "meta": {"started_at": datetime.utcnow().isoformat() + "Z", "git_rev": git_rev or None,
+                 "dataset": {k: ds[k] for k in ("events", "occurrences", "users")},
+                 "concurrency": args.concurrency, "duration_s": args.duration, "workers": args.workers},
+        "scenarios": {},
+    }
+
+    proc = stub = None
+    base = args.base
+    if not base:
+        base, proc, stub = _spawn_server(args.workers, args.stub_latency_ms)
+    try:
+        report["scenarios"].update(asyncio.run(_http_scenarios(base, ds, args)))
+    finally:
+        if proc:
+            proc.terminate()
+            proc.wait(timeout=10)
+            stub.shutdown()
+
+    jobs_wanted = lambda *names: not args.skip_jobs and (not args.only or any(n in args.only for n in names))
+    if jobs_wanted("importer", "importer_insert", "importer_update"):
+        try:
+            report["scenarios"].update(bench_importer(args.import_events, args.import_batch, args.seed))
+        finally:
+            _cleanup_import(engine)
+    if jobs_wanted("digest"):
+        report["scenarios"].update(bench_digest(args.digest_runs))
+
+    txt = json.dumps(report, indent=2)
+    if args.out:
+        open(args.out, "w").write(txt)
+    print(txt)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
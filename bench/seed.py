@@ -0,0 +1,280 @@
+# bench/seed.py
+"""Jeu de données synthétique réaliste, à l'échelle (base VIDE dédiée).
+
+    python migrate.py                                   # schéma
+    python -m bench.seed --scale 100k --seed 42
+    python -m app.tasks.event_cards                    # cartes des listes (sinon rendues à la volée)
+
+Échelles : 10k / 100k / 1m événements. Pour chaque échelle :
+- événements façon OpenAgenda (mots-clés normalisés, lieux et coordonnées
+  en Île-de-France, âge, prix, ~2 % promus) ;
+- 1 à 12 occurrences par événement (date unique, série hebdomadaire ou
+  festival sur plusieurs jours), réparties de -1 an à +6 mois ;
+- utilisateurs (1 pour 4 événements) avec préférences mots-clés et, pour 60 %,
+  un contexte (domicile, mobilité) ; un admin et un user de bench fixes ;
+- participations (~2 par événement) et avis (~1 par événement).
+
+Chargement par COPY (psycopg2), ids explicites puis recalage des séquences.
+Même --seed ⇒ même jeu de données.
+"""
+import argparse, csv, io, json, random, sys, time
+from datetime import datetime, timedelta
+
+from app.database import engine
+
+SCALES = {"10k": 10_000, "100k": 100_000, "1m": 1_000_000}
+CHUNK = 50_000
+NOW = datetime.utcnow().replace(minute=0, second=0, microsecond=0)
+
+BENCH_ADMIN_EMAIL = "bench-admin@example.test"
+BENCH_USER_EMAIL = "bench-user@example.test"
+
+# mots-clés normalisés (cf. import_openagenda.norm_kw), poids ≈ fréquence OA
+KEYWORDS = [
+    ("concert", 30), ("exposition", 25), ("spectacle", 22), ("theatre", 18), ("jeune public", 16),
+    ("atelier", 15), ("musique", 14), ("gratuit", 14), ("visite guidee", 12), ("conference", 11),
+    ("famille", 10), ("danse", 9), ("cinema", 9), ("festival", 8), ("patrimoine", 8),
+    ("jazz", 6), ("lecture", 6), ("art contemporain", 6), ("musique classique", 5), ("humour", 5),
+    ("street art", 4), ("photographie", 4), ("marionnettes", 3), ("cirque", 3), ("sport", 3),
+    ("numerique", 3), ("nature", 3), ("opera", 2), ("brocante", 2), ("harpe", 1),
+]
+KW_NAMES = [k for k, _ in KEYWORDS]
+KW_WEIGHTS = [w for _, w in KEYWORDS]
+
+# (commune, code postal, lat, lon, poids)
+COMMUNES = [
+    ("Paris", "75001", 48.8566, 2.3522, 40), ("Boulogne-Billancourt", "92100", 48.8397, 2.2399, 4),
+    ("Saint-Denis", "93200", 48.9362, 2.3574, 4), ("Montreuil", "93100", 48.8638, 2.4485, 4),
+    ("Versailles", "78000", 48.8049, 2.1204, 4), ("Nanterre", "92000", 48.8924, 2.2071, 3),
+    ("Créteil", "94000", 48.7904, 2.4556, 3), ("Argenteuil", "95100", 48.9472, 2.2467, 3),
+    ("Vitry-sur-Seine", "94400", 48.7875, 2.3928, 2), ("Saint-Germain-en-Laye", "78100", 48.8989, 2.0938, 2),
+    ("Évry-Courcouronnes", "91000", 48.6290, 2.4410, 2), ("Cergy", "95000", 49.0364, 2.0761, 2),
+    ("Meaux", "77100", 48.9601, 2.8788, 2), ("Fontainebleau", "77300", 48.4047, 2.7016, 2),
+    ("Rambouillet", "78120", 48.6437, 1.8299, 1), ("Étampes", "91150", 48.4343, 2.1615, 1),
+]
+COMMUNE_WEIGHTS = [c[4] for c in COMMUNES]
+LIEUX = ["Médiathèque", "Salle des fêtes", "Théâtre municipal", "Centre culturel", "Parc",
+         "Musée", "Église", "Conservatoire", "Galerie", "Maison des associations"]
+
+
+def _ts(dt: datetime | None) -> str | None:
+    return dt.isoformat(sep=" ") if dt else None
+
+
+def _location(rng: random.Random) -> dict:
+    commune, cp, lat, lon, _ = rng.choices(COMMUNES, weights=COMMUNE_WEIGHTS)[0]
+    spread = 0.05 if commune == "Paris" else 0.02
+    return {"commune": commune, "code_postal": cp, "lieu": f"{rng.choice(LIEUX)} de {commune}",
+            "latitude": round(lat + rng.uniform(-spread, spread), 6),
+            "longitude": round(lon + rng.uniform(-spread, spread), 6)}
+
+
+def _keywords(rng: random.Random) -> list[str]:
+    return list(dict.fromkeys(rng.choices(KW_NAMES, weights=KW_WEIGHTS, k=rng.randint(1, 4))))
+
+
+def _schedule(rng: random.Random) -> list[tuple[datetime, datetime | None, bool]]:
+    """Une date (60 %), série hebdomadaire (25 %) ou festival sur plusieurs jours (15 %)."""
+    start = NOW - timedelta(days=365) + timedelta(minutes=rng.randrange(0, 545 * 24 * 60, 30))
+    start = start.replace(minute=0 if rng.random() < 0.7 else 30)
+    dur = timedelta(hours=rng.choice([1, 1.5, 2, 2, 3]))
+    kind = rng.random()
+    if kind < 0.6:
+        if rng.random() < 0.1:
+            day = start.replace(hour=0, minute=0)
+            return [(day, None, True)]
+        return [(start, start + dur, False)]
+    if kind < 0.85:
+        return [(start + timedelta(weeks=i), start + timedelta(weeks=i) + dur, False)
+                for i in range(rng.randint(2, 12))]
+    return [(start + timedelta(days=i), start + timedelta(days=i) + dur, False)
+            for i in range(rng.randint(2, 5))]
+
+
+def make_event(rng: random.Random, uid: str) -> dict:
+    """Événement + occurrences (format interne, réutilisé par oa_payload)."""
+    kws = _keywords(rng)
+    loc = _location(rng)
+    age_min = rng.choice([None, None, 0, 3, 6, 12, 18])
+    return {
+        "external_uid": uid,
+        "titre": f"{kws[0].capitalize()} — {loc['lieu']} #{uid.rsplit('-', 1)[-1]}",
+        "description": f"{', '.join(kws)} à {loc['commune']}.",
+        "keywords": kws,
+        "prix": rng.choice([None, 0.0, 0.0, 5.0, 10.0, 12.5, 20.0, 35.0]),
+        "age_min": age_min,
+        "age_max": rng.choice([None, 99]) if age_min is not None else None,
+        "status": 1, "attendance_mode": 1,
+        "pays": "France", "pays_code": "FR",
+        "image_url": f"https://cdn.example.test/{uid}.jpg" if rng.random() < 0.8 else None,
+        "promoted_until": NOW + timedelta(days=rng.randint(1, 30)) if rng.random() < 0.02 else None,
+        "occurrences": _schedule(rng),
+        **loc,
+    }
+
+
+def oa_payload(ev: dict) -> dict:
+    """Même événement au format de l'API OpenAgenda v2 (pour bencher l'import)."""
+    return {
+        "uid": ev["external_uid"],
+        "title": {"fr": ev["titre"]},
+        "description": {"fr": ev["description"]},
+        "keywords": {"fr": ev["keywords"]},
+        "image": {"filename": ev["image_url"]} if ev["image_url"] else None,
+        "location": {"label": {"fr": ev["lieu"]}, "city": ev["commune"], "postalCode": ev["code_postal"],
+                     "latitude": ev["latitude"], "longitude": ev["longitude"],
+                     "country": ev["pays"], "countryCode": ev["pays_code"]},
+        "age": {"min": ev["age_min"], "max": ev["age_max"]},
+        "status": ev["status"], "attendanceMode": ev["attendance_mode"],
+        "timings": [{"begin": d.isoformat() + "+00:00", "end": f.isoformat() + "+00:00" if f else None,
+                     "allDay": all_day} for d, f, all_day in ev["occurrences"]],
+    }
+
+
+class _Copier:
+    """Tampon CSV vidé par COPY … FROM STDIN tous les CHUNK lignes."""
+
+    def __init__(self, cur, table: str, columns: list[str]):
+        self.cur, self.table, self.columns = cur, table, columns
+        self.buf = io.StringIO()
+        self.writer = csv.writer(self.buf)
+        self.pending = 0
+        self.total = 0
+
+    def add(self, row):
+        self.writer.writerow(["\\N" if v is None else v for v in row])
+        self.pending += 1
+        if self.pending >= CHUNK:
+            self.flush()
+
+    def flush(self):
+        if not self.pending:
+            return
+        self.buf.seek(0)
+        self.cur.copy_expert(
+            f"COPY {self.table} ({', '.join(self.columns)}) FROM STDIN WITH (FORMAT csv, NULL '\\N')", self.buf)
+        self.total += self.pending
+        self.buf.seek(0)
+        self.buf.truncate()
+        self.pending = 0
+
+
+def seed(cur, n_events: int, seed_value: int) -> dict:
+    rng = random.Random(seed_value)
+    n_users = max(1000, n_events // 4)
+
+    # triggers de version (migrations/005) : inutiles sur une base vide, coûteux ligne à ligne
+    for table in ("evenements", "occurrences"):
+        cur.execute(f"ALTER TABLE {table} DISABLE TRIGGER USER")
+
+    # --- utilisateurs (id 1 = admin bench, id 2 = user bench) ---
+    users = _Copier(cur, "utilisateurs", ["id", "nom", "email", "is_email_verified", "mot_de_passe",
+                                          "age", "mobility", "created_at", "role", "is_abonne"])
+    # mot_de_passe inutilisable : les jetons de bench sont signés directement (bench/run.py)
+    users.add([1, "Bench admin", BENCH_ADMIN_EMAIL, True, "!", 40, "walk", _ts(NOW - timedelta(days=800)), "admin", False])
+    users.add([2, "Bench user", BENCH_USER_EMAIL, True, "!", 30, "bike", _ts(NOW - timedelta(days=400)), "user", True])
+    for uid in range(3, n_users + 1):
+        role = "organizer" if uid % 50 == 0 else "user"
+        users.add([uid, f"Utilisateur {uid}", f"user{uid}@example.test", rng.random() < 0.9, "!",
+                   rng.randint(16, 80), rng.choice(["walk", "bike", "car"]),
+                   _ts(NOW - timedelta(minutes=rng.randrange(730 * 24 * 60))), role, rng.random() < 0.1])
+    users.flush()
+
+    prefs = _Copier(cur, "user_keyword_prefs", ["user_id", "keyword", "score", "updated_at"])
+    ctx = _Copier(cur, "user_context", ["user_id", "home_lat", "home_lon", "mobility"])
+    for uid in range(1, n_users + 1):
+        for kw in dict.fromkeys(rng.choices(KW_NAMES, weights=KW_WEIGHTS, k=rng.randint(3, 8))):
+            prefs.add([uid, kw, rng.randint(1, 20), _ts(NOW - timedelta(days=rng.randint(0, 180)))])
+        if uid <= 2 or rng.random() < 0.6:
+            loc = _location(rng)
+            ctx.add([uid, loc["latitude"], loc["longitude"], rng.choice(["walk", "bike", "car"])])
+    prefs.flush(); ctx.flush()
+
+    # --- événements + occurrences ---
+    ev_cols = ["id", "external_uid", "source", "titre", "description", "keywords", "prix", "age_min", "age_max",
+               "status", "attendance_mode", "lieu", "code_postal", "commune", "pays", "pays_code",
+               "latitude", "longitude", "image_url", "promoted_until", "promoted_plan", "owner_id"]
+    events = _Copier(cur, "evenements", ev_cols)
+    occs = _Copier(cur, "occurrences", ["id", "evenement_id", "debut", "fin", "all_day"])
+    occ_id = 0
+    organizers = [u for u in range(50, n_users + 1, 50)]
+    for ev_id in range(1, n_events + 1):
+        ev = make_event(rng, f"bench-{ev_id}")
+        owner = rng.choice(organizers) if organizers and rng.random() < 0.05 else None
+        events.add([ev_id, ev["external_uid"], "bench", ev["titre"], ev["description"], json.dumps(ev["keywords"]),
+                    ev["prix"], ev["age_min"], ev["age_max"], ev["status"], ev["attendance_mode"], ev["lieu"],
+                    ev["code_postal"], ev["commune"], ev["pays"], ev["pays_code"], ev["latitude"], ev["longitude"],
+                    ev["image_url"], _ts(ev["promoted_until"]), "boost30" if ev["promoted_until"] else None, owner])
+        for debut, fin, all_day in ev["occurrences"]:
+            occ_id += 1
+            occs.add([occ_id, ev_id, _ts(debut), _ts(fin), all_day])
+    events.flush(); occs.flush()
+    n_occ = occ_id
+
+    # --- participations / avis : tirages distincts par utilisateur ---
+    parts = _Copier(cur, "participations", ["user_id", "occurrence_id", "status", "created_at", "updated_at"])
+    ratings = _Copier(cur, "event_ratings", ["user_id", "evenement_id", "rating", "commentaire", "created_at", "updated_at"])
+    per_user_parts = max(1, 2 * n_events // n_users)
+    per_user_ratings = max(1, n_events // n_users)
+    for uid in range(1, n_users + 1):
+        for o in rng.sample(range(1, n_occ + 1), min(n_occ, rng.randint(0, 2 * per_user_parts))):
+            created = _ts(NOW - timedelta(minutes=rng.randrange(365 * 24 * 60)))
+            parts.add([uid, o, "going" if rng.random() < 0.85 else "cancelled", created, created])
+        for e in rng.sample(range(1, n_events + 1), min(n_events, rng.randint(0, 2 * per_user_ratings))):
+            created = _ts(NOW - timedelta(minutes=rng.randrange(365 * 24 * 60)))
+            comment = rng.choice(["Super !", "Bof.", "À refaire", "Très bien organisé"]) if rng.random() < 0.3 else None
+            ratings.add([uid, e, rng.choices([1, 2, 3, 4, 5], weights=[1, 2, 4, 6, 5])[0], comment, created, created])
+    parts.flush(); ratings.flush()
+
+    # compteurs maintenus par l'app (cf. migrations/002 et 004)
+    cur.execute("""UPDATE occurrences o SET going_count = x.n
+                   FROM (SELECT occurrence_id, count(*) AS n FROM participations
+                         WHERE status = 'going' GROUP BY occurrence_id) x
+                   WHERE x.occurrence_id = o.id""")
+    cur.execute("""UPDATE evenements e SET going_count = x.n
+                   FROM (SELECT o.evenement_id, sum(o.going_count) AS n FROM occurrences o
+                         GROUP BY o.evenement_id) x
+                   WHERE x.evenement_id = e.id""")
+    cur.execute("""UPDATE evenements e SET rating_sum = x.s, rating_count = x.n, rating_comment_count = x.c
+                   FROM (SELECT evenement_id, sum(rating) AS s, count(*) AS n,
+                                count(*) FILTER (WHERE length(trim(commentaire)) > 0) AS c
+                         FROM event_ratings GROUP BY evenement_id) x
+                   WHERE x.evenement_id = e.id""")
+
+    for table in ("utilisateurs", "evenements", "occurrences", "participations", "event_ratings",
+                  "user_keyword_prefs", "user_context"):
+        cur.execute(f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), (SELECT max(id) FROM {table}))")
+    for table in ("evenements", "occurrences"):
+        cur.execute(f"ALTER TABLE {table} ENABLE TRIGGER USER")
+    cur.execute("ANALYZE")
+    return {"events": n_events, "occurrences": n_occ, "users": n_users, "keyword_prefs": prefs.total,
+            "user_context": ctx.total, "participations": parts.total, "ratings": ratings.total}
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--scale", choices=sorted(SCALES), default="10k")
+    ap.add_argument("--events", type=int, help="nombre d'événements (remplace --scale)")
+    ap.add_argument("--seed", type=int, default=42)
+    args = ap.parse_args(argv)
+
+    n_events = args.events or SCALES[args.scale]
+    raw = engine.raw_connection()
+    try:
+        cur = raw.cursor()
+        cur.execute("SELECT count(*) FROM evenements")
+        if cur.fetchone()[0]:
+            print("❌ bench.seed attend une base vide", file=sys.stderr)
+            return 2
+        t0 = time.perf_counter()
+        counts = seed(cur, n_events, args.seed)
+        raw.commit()
+    finally:
+        raw.close()
+    counts["elapsed_s"] = round(time.perf_counter() - t0, 1)
+    print(json.dumps(counts, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
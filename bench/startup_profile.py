@@ -0,0 +1,95 @@
+# bench/startup_profile.py
+"""Profil de démarrage : temps d'import par module et time-to-first-request.
+
+    python -m bench.startup_profile --budget 3.0 --out startup.json
+
+- imports : `python -X importtime -c "import app.main"`, modules triés par temps cumulé ;
+- time-to-first-request : lance uvicorn, mesure jusqu'au premier 200 sur /ping,
+  avec les threads de fond du lifespan actifs (LISTEN des invalidations et check
+  des réplicas : DATABASE_REPLICA_URLS vaut DATABASE_URL s'il n'est pas défini).
+
+Code de sortie 1 si le time-to-first-request dépasse --budget (secondes) ou si
+l'import de app.main dépasse --import-budget. Aucune base joignable n'est requise :
+DATABASE_URL doit seulement être syntaxiquement valide (les threads de fond
+retentent alors leur connexion, ce qui compte dans la mesure).
+"""
+import argparse, json, os, re, socket, subprocess, sys, time
+
+import httpx
+
+IMPORTTIME_RE = re.compile(r"import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)")
+
+
+def import_profile(top: int) -> dict:
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", "import app.main"],
+                          capture_output=True, text=True, check=True)
+    rows = []
+    for line in proc.stderr.splitlines():
+        m = IMPORTTIME_RE.match(line)
+        if m:
+            rows.append({"module": m.group(4), "self_ms": int(m.group(1)) / 1000,
+                         "cumulative_ms": int(m.group(2)) / 1000, "depth": (len(m.group(3)) - 1) // 2})
+    total = next((r["cumulative_ms"] for r in rows if r["module"] == "app.main"), None)
+    rows.sort(key=lambda r: r["cumulative_ms"], reverse=True)
+    return {"app_main_ms": total, "top": rows[:top]}
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def time_to_first_request(timeout: float) -> float | None:
+    port = _free_port()
+    t0 = time.perf_counter()
+    env = dict(os.environ)
+    if env.get("DATABASE_URL"):
+        env.setdefault("DATABASE_REPLICA_URLS", env["DATABASE_URL"])   # thread replica-health actif
+    proc = subprocess.Popen([sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port)],
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, env=env)
+    try:
+        while time.perf_counter() - t0 < timeout:
+            try:
+                if httpx.get(f"http://127.0.0.1:{port}/ping", timeout=0.5).status_code == 200:
+                    return time.perf_counter() - t0
+            except httpx.HTTPError:
+                pass
+            if proc.poll() is not None:
+                return None
+            time.sleep(0.02)
+        return None
+    finally:
+        proc.terminate()
+        proc.wait(timeout=10)
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--budget", type=float, default=float(os.getenv("STARTUP_BUDGET_S", "3.0")))
+    ap.add_argument("--import-budget", type=float, default=float(os.getenv("IMPORT_BUDGET_S", "1.5")))
+    ap.add_argument("--top", type=int, default=25)
+    ap.add_argument("--out")
+    args = ap.parse_args(argv)
+
+    imports = import_profile(args.top)
+    ttfr = time_to_first_request(timeout=max(30.0, args.budget * 5))
+    res = {
+        "import_app_main_s": round(imports["app_main_ms"] / 1000, 3) if imports["app_main_ms"] else None,
+        "time_to_first_request_s": round(ttfr, 3) if ttfr is not None else None,
+        "budget_s": args.budget,
+        "import_budget_s": args.import_budget,
+        "imports_top": imports["top"],
+    }
+    txt = json.dumps(res, indent=2)
+    if args.out:
+        open(args.out, "w").write(txt)
+    print(txt)
+
+    failed = ttfr is None or ttfr > args.budget or \
+        (res["import_app_main_s"] or 0) > args.import_budget
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
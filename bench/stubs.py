@@ -0,0 +1,82 @@
+# bench/stubs.py
+"""Stub Open-Meteo local pour les bench de /weather (aucun appel externe).
+
+    python -m bench.stubs --port 8099
+    OPEN_METEO_ENDPOINT=http://127.0.0.1:8099/v1/forecast uvicorn app.main:app
+
+Répond au format /v1/forecast (hourly) avec des valeurs déterministes dérivées
+des coordonnées ; --latency-ms simule le temps de réponse du fournisseur.
+"""
+import argparse, json, sys, time
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+from zoneinfo import ZoneInfo
+
+PARIS = ZoneInfo("Europe/Paris")
+
+
+def forecast(lat: float, lon: float) -> dict:
+    start = datetime.now(PARIS).replace(hour=0, minute=0, second=0, microsecond=0)
+    times = [(start + timedelta(hours=h)).isoformat(timespec="minutes") for h in range(24)]
+    base = (abs(lat * 100 + lon * 10) % 25) + 2
+    return {
+        "latitude": lat, "longitude": lon, "timezone": "Europe/Paris",
+        "hourly": {
+            "time": times,
+            "temperature_2m": [round(base + 6 * (h in range(12, 18)), 1) for h in range(24)],
+            "precipitation": [round((h * 7 + int(base)) % 10 / 10, 1) for h in range(24)],
+            "precipitation_probability": [(h * 13 + int(base)) % 100 for h in range(24)],
+            "windspeed_10m": [round(5 + (h % 6) * 2.5, 1) for h in range(24)],
+        },
+    }
+
+
+def make_handler(latency_s: float):
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            url = urlparse(self.path)
+            if url.path != "/v1/forecast":
+                self.send_error(404)
+                return
+            qs = parse_qs(url.query)
+            try:
+                lat, lon = float(qs["latitude"][0]), float(qs["longitude"][0])
+            except (KeyError, ValueError):
+                self.send_error(400)
+                return
+            if latency_s:
+                time.sleep(latency_s)
+            body = json.dumps(forecast(lat, lon)).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    return Handler
+
+
+def serve(port: int, latency_ms: float = 0.0) -> ThreadingHTTPServer:
+    return ThreadingHTTPServer(("127.0.0.1", port), make_handler(latency_ms / 1000))
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--port", type=int, default=8099)
+    ap.add_argument("--latency-ms", type=float, default=30.0)
+    args = ap.parse_args(argv)
+    server = serve(args.port, args.latency_ms)
+    print(f"stub Open-Meteo sur http://127.0.0.1:{args.port}/v1/forecast")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,18 @@
+# gunicorn.conf.py — chargé automatiquement par gunicorn depuis la racine du projet
+import os, shutil
+
+worker_class = "uvicorn.workers.UvicornWorker"
+
+
+def on_starting(server):
+    # métriques multi-workers : le dossier doit être vide au démarrage du master
+    path = os.getenv("PROMETHEUS_MULTIPROC_DIR")
+    if path:
+        shutil.rmtree(path, ignore_errors=True)
+        os.makedirs(path, exist_ok=True)
+
+
+def child_exit(server, worker):
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        from prometheus_client import multiprocess
+        multiprocess.mark_process_dead(worker.pid)
@@ -8,6 +8,10 @@ from dateutil.parser import parse
 from dotenv import load_dotenv
 from app.database import SessionLocal
 from app.models import Evenement, Occurrence
+from app.metrics import track_outbound, track_job, count_job_items
+from app import calendar_feed
+from app.response_cache import notify_catalogue_changed
+from app import event_cards
 import unicodedata
 
 load_dotenv()
@@ -35,9 +39,10 @@ def fetch_openagenda_events():
             "key": API_KEY, "limit": limit, "offset": offset,
             "timezone": "Europe/Paris", "detailed": 1, "startsAfter": "2024-01-01",
         }
-        resp = requests.get(url, params=params)
-        resp.raise_for_status()
-        data = resp.json()
+        with track_outbound("openagenda"):
+            resp = requests.get(url, params=params)
+            resp.raise_for_status()
+            data = resp.json()
         page = data.get("events", [])
         if not page: break
         events.extend(page); offset += limit
@@ -50,8 +55,16 @@ def norm_kw(s: str) -> str:
     return s.strip().lower()
 
 def upsert_events(events):
+    with track_job("openagenda_import"):
+        res = _upsert_events(events)
+    count_job_items("openagenda_import", fetched=len(events),
+                    added_events=res["added_events"], added_occurrences=res["added_occurrences"])
+    return res
+
+def _upsert_events(events):
     db: Session = SessionLocal()
     added, touched_occ = 0, 0
+    touched_ids, updated_ids = [], []
 
     for ev in events:
         try:
@@ -128,6 +141,7 @@ def upsert_events(events):
                 if pays_code: db_ev.pays_code = pays_code
                 if latitude is not None: db_ev.latitude = latitude
                 if longitude is not None: db_ev.longitude = longitude
+                updated_ids.append(db_ev.id)
 
             # 3) occurrences : on ajoute celles qui n’existent pas (grâce à l’unique constraint)
             # app/import_openagenda.py
@@ -151,6 +165,7 @@ def upsert_events(events):
 
                 res = db.execute(stmt)
                 touched_occ += (res.rowcount or 0)
+            touched_ids.append(db_ev.id)
 
 
         except Exception as e:
@@ -158,6 +173,10 @@ def upsert_events(events):
             print("Erreur import:", e)
 
 
+    event_cards.refresh(db, touched_ids)
+    notify_catalogue_changed(db)   # caches des flux de tous les workers
+    # flux .ics : seuls les participants des événements mis à jour (descriptions, lieux)
+    calendar_feed.notify_changed(db, calendar_feed.participant_ids(db, updated_ids))
     db.commit(); db.close()
     print(f"✅ Import OA terminé : {added} nouveaux événements, {touched_occ} occurrences ajoutées.")
     return {"added_events": added, "added_occurrences": touched_occ}
@@ -0,0 +1,68 @@
+# migrate.py
+"""Migrations versionnées.
+
+    python migrate.py            # crée les tables manquantes puis applique les migrations en attente
+    python migrate.py --status   # liste les migrations appliquées / en attente
+
+Les fichiers migrations/NNN_nom.sql sont appliqués dans l'ordre, une instruction
+à la fois en autocommit (nécessaire pour CREATE INDEX CONCURRENTLY), puis la
+version est enregistrée dans schema_migrations. Les instructions doivent être
+idempotentes (IF NOT EXISTS…) : une migration interrompue est rejouée en entier.
+Si un CREATE INDEX CONCURRENTLY échoue, l'index reste INVALID : le supprimer
+avant de relancer.
+"""
+import os, re, sys
+
+from sqlalchemy import text
+
+from app.database import engine
+from app.models import Base
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "migrations")
+
+
+def _migration_files():
+    files = sorted(f for f in os.listdir(MIGRATIONS_DIR) if re.match(r"^\d+_.*\.sql$", f))
+    return [(f.split("_", 1)[0], os.path.join(MIGRATIONS_DIR, f)) for f in files]
+
+
+def _statements(sql: str):
+    # retire les commentaires "--" puis découpe sur les ";" de fin de ligne
+    lines = [l for l in sql.splitlines() if not l.strip().startswith("--")]
+    for stmt in re.split(r";\s*$", "\n".join(lines), flags=re.M):
+        if stmt.strip():
+            yield stmt.strip()
+
+
+def _applied(conn) -> set[str]:
+    conn.execute(text(
+        "CREATE TABLE IF NOT EXISTS schema_migrations ("
+        " version VARCHAR(32) PRIMARY KEY,"
+        " applied_at TIMESTAMPTZ NOT NULL DEFAULT now())"
+    ))
+    return {r[0] for r in conn.execute(text("SELECT version FROM schema_migrations"))}
+
+
+def migrate():
+    Base.metadata.create_all(bind=engine)  # tables absentes uniquement (ne modifie pas l'existant)
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        done = _applied(conn)
+        for version, path in _migration_files():
+            if version in done:
+                continue
+            print(f"→ {os.path.basename(path)}")
+            for stmt in _statements(open(path, encoding="utf-8").read()):
+                conn.exec_driver_sql(stmt)
+            conn.execute(text("INSERT INTO schema_migrations (version) VALUES (:v)"), {"v": version})
+    print("✅ Schéma à jour")
+
+
+def status():
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        done = _applied(conn)
+    for version, path in _migration_files():
+        print(f"[{'x' if version in done else ' '}] {os.path.basename(path)}")
+
+
+if __name__ == "__main__":
+    status() if "--status" in sys.argv[1:] else migrate()
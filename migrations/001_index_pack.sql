@@ -0,0 +1,39 @@
+-- 001 : index alignés sur les requêtes réelles (noms identiques à app/models.py)
+-- CONCURRENTLY : pas de verrou d'écriture pendant la construction.
+
+-- prochaine occurrence (home, /evenements, /reco, admin) + occurrences d'un event
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_occurrences_debut
+    ON occurrences (debut);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_occurrences_evenement_debut
+    ON occurrences (evenement_id, debut);
+
+-- exclusion "déjà going" de /reco, list_mine
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_participations_user_status
+    ON participations (user_id, status);
+-- digest quotidien
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_participations_occurrence_status
+    ON participations (occurrence_id, status);
+
+-- pages d'avis (tri created_at desc par événement)
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_event_ratings_evenement_created
+    ON event_ratings (evenement_id, created_at);
+
+-- tri / bonus "promu"
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_evenements_promoted_until
+    ON evenements (promoted_until);
+
+-- séries temporelles admin
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_utilisateurs_created_at
+    ON utilisateurs (created_at);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_participations_created_at
+    ON participations (created_at);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_event_ratings_created_at
+    ON event_ratings (created_at);
+
+-- keywords @> '["…"]'
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_evenements_keywords_gin
+    ON evenements USING gin (keywords jsonb_path_ops);
+
+-- purge / contrôle des liens de vérification expirés
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_email_verif_tokens_expires_at
+    ON email_verif_tokens (expires_at);
@@ -0,0 +1,19 @@
+-- 002 : compteurs "going" maintenus par les routes de participation (app/engagement.py)
+-- Rejouable : ADD COLUMN IF NOT EXISTS, puis recalcul complet des compteurs.
+
+ALTER TABLE occurrences ADD COLUMN IF NOT EXISTS going_count INTEGER NOT NULL DEFAULT 0;
+ALTER TABLE evenements ADD COLUMN IF NOT EXISTS going_count INTEGER NOT NULL DEFAULT 0;
+
+UPDATE occurrences o SET going_count = x.n
+FROM (SELECT occurrence_id, count(*) AS n FROM participations WHERE status = 'going' GROUP BY occurrence_id) x
+WHERE x.occurrence_id = o.id AND o.going_count <> x.n;
+
+UPDATE evenements e SET going_count = x.n
+FROM (SELECT o.evenement_id, count(*) AS n
+      FROM participations p JOIN occurrences o ON o.id = p.occurrence_id
+      WHERE p.status = 'going' GROUP BY o.evenement_id) x
+WHERE x.evenement_id = e.id AND e.going_count <> x.n;
+
+-- top-K admin : ORDER BY going_count DESC, id DESC LIMIT k
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_evenements_going_count
+    ON evenements (going_count, id);
@@ -0,0 +1,25 @@
+-- 003 : recherche admin par sous-chaîne (ILIKE '%q%') indexée en trigrammes
+-- Index hors app/models.py : create_all tourne avant les migrations et
+-- gin_trgm_ops n'existe qu'une fois l'extension créée.
+
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+-- /admin/users?q=
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_utilisateurs_email_trgm
+    ON utilisateurs USING gin (email gin_trgm_ops);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_utilisateurs_nom_trgm
+    ON utilisateurs USING gin (nom gin_trgm_ops);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_utilisateurs_role_trgm
+    ON utilisateurs USING gin (role gin_trgm_ops);
+
+-- /admin/events?q=
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_evenements_titre_trgm
+    ON evenements USING gin (titre gin_trgm_ops);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_evenements_commune_trgm
+    ON evenements USING gin (commune gin_trgm_ops);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_evenements_lieu_trgm
+    ON evenements USING gin (lieu gin_trgm_ops);
+
+-- pagination par curseur de /admin/users : ORDER BY created_at DESC, id DESC
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_utilisateurs_created_id
+    ON utilisateurs (created_at, id);
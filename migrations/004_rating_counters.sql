@@ -0,0 +1,13 @@
+-- 004 : agrégats de notes maintenus par PUT /evenements/{id}/ratings (app/engagement.py)
+-- Rejouable : ADD COLUMN IF NOT EXISTS, puis recalcul complet.
+
+ALTER TABLE evenements ADD COLUMN IF NOT EXISTS rating_sum INTEGER NOT NULL DEFAULT 0;
+ALTER TABLE evenements ADD COLUMN IF NOT EXISTS rating_count INTEGER NOT NULL DEFAULT 0;
+ALTER TABLE evenements ADD COLUMN IF NOT EXISTS rating_comment_count INTEGER NOT NULL DEFAULT 0;
+
+UPDATE evenements e SET rating_sum = x.s, rating_count = x.n, rating_comment_count = x.c
+FROM (SELECT evenement_id, sum(rating) AS s, count(*) AS n,
+             count(*) FILTER (WHERE length(trim(commentaire)) > 0) AS c
+      FROM event_ratings GROUP BY evenement_id) x
+WHERE x.evenement_id = e.id
+  AND (e.rating_sum, e.rating_count, e.rating_comment_count) IS DISTINCT FROM (x.s, x.n, x.c);
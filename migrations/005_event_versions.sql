@@ -0,0 +1,31 @@
+-- 005 : version par événement pour les ETag (GET /evenements/{id}, /ratings, flux)
+-- Incrémentée par triggers sur toute écriture de l'événement, de ses occurrences
+-- ou de ses notes (via les agrégats rating_* de la migration 004). Les mises à jour
+-- des seuls compteurs going (app/engagement.py) ne changent pas la représentation :
+-- elles sont exclues par les clauses WHEN.
+-- migrate.py découpe sur les ";" de fin de ligne : corps plpgsql sur une ligne.
+
+ALTER TABLE evenements ADD COLUMN IF NOT EXISTS version INTEGER NOT NULL DEFAULT 1;
+
+CREATE OR REPLACE FUNCTION evenements_bump_version() RETURNS trigger LANGUAGE plpgsql AS $$
+BEGIN NEW.version := OLD.version + 1; RETURN NEW; END $$;
+
+DROP TRIGGER IF EXISTS trg_evenements_version ON evenements;
+
+CREATE TRIGGER trg_evenements_version BEFORE UPDATE ON evenements
+FOR EACH ROW WHEN (OLD.going_count = NEW.going_count)
+EXECUTE FUNCTION evenements_bump_version();
+
+CREATE OR REPLACE FUNCTION occurrences_bump_event_version() RETURNS trigger LANGUAGE plpgsql AS $$
+BEGIN UPDATE evenements SET version = version + 1 WHERE id IN (OLD.evenement_id, NEW.evenement_id); RETURN NULL; END $$;
+
+DROP TRIGGER IF EXISTS trg_occurrences_version_ins_del ON occurrences;
+
+CREATE TRIGGER trg_occurrences_version_ins_del AFTER INSERT OR DELETE ON occurrences
+FOR EACH ROW EXECUTE FUNCTION occurrences_bump_event_version();
+
+DROP TRIGGER IF EXISTS trg_occurrences_version_upd ON occurrences;
+
+CREATE TRIGGER trg_occurrences_version_upd AFTER UPDATE ON occurrences
+FOR EACH ROW WHEN (OLD.going_count = NEW.going_count)
+EXECUTE FUNCTION occurrences_bump_event_version();